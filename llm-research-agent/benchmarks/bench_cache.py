@@ -0,0 +1,80 @@
+# benchmarks/bench_cache.py
+"""
+Latency of cached-answer hits: in-process LRU tier vs. Redis tier.
+
+Warms one answer into the cache, then times `AnswerCache.get` for the same
+question N times through each path and reports p50/p99 in microseconds.
+
+Uses the Redis at REDIS_HOST:REDIS_PORT when reachable; otherwise falls back to
+an in-memory fakeredis, which has no network round trip and so understates the
+Redis-tier latency.
+
+Usage:
+    python benchmarks/bench_cache.py [--iterations 5000]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import redis
+
+from agent.utils.redis_cache import AnswerCache, redis_client
+
+QUESTION = "Who won the 2022 FIFA World Cup?"
+ANSWER = {
+    "status": "complete",
+    "answer": "Argentina won the 2022 FIFA World Cup, beating France on penalties [1].",
+    "citations": [{"id": 1, "title": "2022 FIFA World Cup final", "url": "https://example.com/final"}]
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(pct) - 1]
+
+
+async def pick_client():
+    try:
+        await redis_client.ping()
+        return redis_client, "redis"
+    except redis.RedisError:
+        import fakeredis
+        return fakeredis.aioredis.FakeRedis(decode_responses=True), "fakeredis (no network)"
+
+
+async def time_hits(cache: AnswerCache, iterations: int, local: bool) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = await cache.get(QUESTION, record_stats=False, local=local)
+        samples.append((time.perf_counter() - start) * 1e6)
+        assert result is not None
+    return samples
+
+
+async def main(iterations: int):
+    client, backend = await pick_client()
+    cache = AnswerCache(client, prefix="bench_cache:")
+    await cache.set(QUESTION, ANSWER)
+
+    print(f"backend: {backend}, iterations: {iterations}")
+    print(f"{'path':>12} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+    for label, local in [("local LRU", True), ("redis", False)]:
+        samples = await time_hits(cache, iterations, local)
+        print(f"{label:>12} {percentile(samples, 50):>10.1f} {percentile(samples, 99):>10.1f}")
+
+    await cache.invalidate(QUESTION)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
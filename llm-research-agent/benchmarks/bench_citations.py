@@ -0,0 +1,107 @@
+# benchmarks/bench_citations.py
+"""
+CPU time of citation normalization per answer, before and after agent.utils.citations.
+
+"before" is what a request used to do: synthesize renumbered the markers with
+uncompiled regexes and matched citations in a nested loop over the model's list,
+then run_pipeline parsed and renumbered the result a second time. "after" is the
+single normalize_citations pass (precompiled patterns, dict lookups).
+
+Answers are synthetic: `--sentences` cited sentences per answer, each citing one or
+two of `--sources` sources at random.
+
+Usage:
+    python benchmarks/bench_citations.py [--answers 2000] [--sentences 4 8 16] [--sources 8]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from agent.utils.citations import normalize_citations
+
+
+def _renumber(text, id_mapping):
+    def repl(match):
+        new_ids = []
+        for part in re.split(r"[,\s]+", match.group(1)):
+            if part.strip().isdigit():
+                old = int(part.strip())
+                if old in id_mapping:
+                    new_ids.append(str(id_mapping[old]))
+        return f"[{', '.join(new_ids)}]"
+    return re.sub(r"\[(.*?)\]", repl, text)
+
+
+def legacy_normalize(answer, raw_citations):
+    # synthesize: collect ids, renumber, nested loop over the citations
+    used_ids = set()
+    for match in re.findall(r"\[(.*?)\]", answer):
+        for part in re.split(r"[,\s]+", match):
+            if part.strip().isdigit():
+                used_ids.add(int(part.strip()))
+    used_ids = sorted(used_ids)
+    id_mapping = {old_id: new_id for new_id, old_id in enumerate(used_ids, 1)}
+    answer = _renumber(answer, id_mapping)
+    citations = []
+    for old_id in used_ids:
+        for c in raw_citations:
+            if c["id"] == old_id:
+                citations.append({"id": id_mapping[old_id], "title": c["title"], "url": c["url"]})
+                break
+
+    # run_pipeline: the same again on the already renumbered answer
+    used_ids = set()
+    for m in re.findall(r"\[(.*?)\]", answer):
+        for part in re.split(r"[,\s]+", m):
+            if part.isdigit():
+                used_ids.add(int(part))
+    id_map = {old: new for new, old in enumerate(sorted(used_ids), 1)}
+    answer = _renumber(answer, id_map)
+    return answer, [{"id": id_map[c["id"]], "title": c["title"], "url": c["url"]} for c in citations if c["id"] in id_map]
+
+
+def make_answers(count: int, sentences: int, sources: int, seed: int = 7):
+    rng = random.Random(seed)
+    citations = [{"id": i, "title": f"Source {i}", "url": f"https://example.com/{i}"} for i in range(1, sources + 1)]
+    answers = []
+    for _ in range(count):
+        parts = []
+        for _ in range(sentences):
+            ids = sorted(rng.sample(range(1, sources + 1), rng.choice((1, 2))))
+            parts.append(f"Argentina beat France on penalties after a 3-3 draw [{', '.join(map(str, ids))}].")
+        answers.append(" ".join(parts))
+    return answers, citations
+
+
+def timed(fn, answers, citations) -> float:
+    started = time.perf_counter()
+    for answer in answers:
+        fn(answer, citations)
+    return (time.perf_counter() - started) / len(answers) * 1e6
+
+
+def main(args):
+    print(f"{'sentences':>10} {'before µs':>10} {'after µs':>10} {'speedup':>8}")
+    for sentences in args.sentences:
+        answers, citations = make_answers(args.answers, sentences, args.sources)
+        # Same output, before and after
+        for answer in answers[:50]:
+            assert legacy_normalize(answer, citations) == normalize_citations(answer, citations)
+        before = timed(legacy_normalize, answers, citations)
+        after = timed(normalize_citations, answers, citations)
+        print(f"{sentences:>10} {before:>10.2f} {after:>10.2f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--sentences", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--sources", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,174 @@
+# benchmarks/bench_context.py
+"""
+Prompt size, latency and answer quality of the retrieval stage at several token budgets.
+
+Fixtures come from a recorded cassette (see record_cassette.py). For each question it
+rebuilds what the pipeline retrieved: the generated queries, every recorded search
+result for them (duplicates included, as the pipeline used to send them) and the
+extracted slots. The documents cited by the recorded answer are the "gold" set.
+
+For every budget it then runs the retrieval stage (dedup → BM25 rank → pack) and reports:
+
+    docs / prompt tok    documents and estimated tokens of the synthesize prompt
+    select ms            CPU time of the retrieval stage per question
+    est. LLM ms          synthesize latency predicted for that prompt size, from a linear
+                         fit of latency against prompt tokens over the recorded LLM calls
+    cited recall         share of the recorded answer's cited documents still in the prompt
+
+Usage:
+    python benchmarks/bench_context.py [--cassette benchmarks/cassettes/pipeline.jsonl]
+        [--budgets 0 4000 2000 1000 500]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from agent.types.document import Document
+from agent.utils.retrieval import DocumentPool, document_tokens, estimate_tokens, normalize_url, select_context
+from agent.utils.replay import search_key
+
+HERE = os.path.dirname(__file__)
+
+_DOC_RE = re.compile(r"^\[(\d+)\] Title: (.*)\nSnippet: (.*)\nURL: (.*)$", re.MULTILINE)
+_QUESTION_RE = re.compile(r"(?:Question:|User question:\n)\s*(.+)")
+
+# Synthesize prompt without documents, in estimated tokens
+_SYNTHESIZE_TEMPLATE_TOKENS = 170
+
+
+def load_fixtures(path: str) -> list:
+    """
+    Rebuilds per-question fixtures from the cassette's recorded calls.
+    """
+    entries = [json.loads(line) for line in open(path, encoding="utf-8") if line.strip()]
+    searches = {e["key"]: e["response"] for e in entries if e["kind"] == "search" and e["response"]}
+    questions = defaultdict(lambda: {"queries": [], "slots": None, "gold": set()})
+
+    for entry in entries:
+        if entry["kind"] != "llm" or entry["response"] is None:
+            continue
+        prompt = entry["request"]["prompt"]
+        match = _QUESTION_RE.search(prompt)
+        if not match:
+            continue
+        fixture = questions[match.group(1).strip()]
+        if "information \"slots\"" in prompt:
+            try:
+                fixture["slots"] = json.loads(entry["response"])
+            except ValueError:
+                pass
+        elif "Slots:" in prompt:
+            try:
+                fixture["queries"] += json.loads(entry["response"]).get("new_queries", [])
+            except ValueError:
+                pass
+        elif "citations" in prompt:
+            urls = {int(n): url for n, _, _, url in _DOC_RE.findall(prompt)}
+            try:
+                answer = json.loads(re.sub(r"^```(?:json)?|```$", "", entry["response"].strip()))["answer"]
+            except (ValueError, KeyError):
+                continue
+            cited = {int(n) for group in re.findall(r"\[(.*?)\]", answer) for n in re.findall(r"\d+", group)}
+            fixture["gold"] |= {normalize_url(urls[n]) for n in cited if n in urls}
+        else:
+            fixture["queries"] += [
+                re.sub(r"^[\d\-\*\.\s]+", "", line).strip() for line in entry["response"].splitlines() if line.strip()
+            ]
+
+    fixtures = []
+    for question, fixture in questions.items():
+        docs = [Document(*item) for query in fixture["queries"] for item in searches.get(search_key(query), [])]
+        if docs and fixture["gold"]:
+            fixtures.append({"question": question, "slots": fixture["slots"], "docs": docs, "gold": fixture["gold"]})
+    return fixtures
+
+
+def _prompt_type(prompt: str) -> str:
+    if "information \"slots\"" in prompt:
+        return "slots"
+    if "Slots:" in prompt:
+        return "reflect"
+    if "citations" in prompt:
+        return "synthesize"
+    return "generate_queries"
+
+
+def fit_latency(path: str):
+    """
+    Fits LLM latency (s) = a[prompt type] + b × prompt tokens over the cassette's calls
+    (pooled within-type least squares, so the slope is not confounded by prompt type)
+    and returns (a for synthesize, b).
+    """
+    groups = defaultdict(list)
+    for line in open(path, encoding="utf-8"):
+        entry = json.loads(line)
+        if entry["kind"] == "llm":
+            prompt = entry["request"]["prompt"]
+            groups[_prompt_type(prompt)].append((estimate_tokens(prompt), entry["latency"]))
+
+    means = {
+        kind: (sum(x for x, _ in points) / len(points), sum(y for _, y in points) / len(points))
+        for kind, points in groups.items()
+    }
+    covariance = variance = 0.0
+    for kind, points in groups.items():
+        mean_x, mean_y = means[kind]
+        covariance += sum((x - mean_x) * (y - mean_y) for x, y in points)
+        variance += sum((x - mean_x) ** 2 for x, _ in points)
+    # Noisy recordings can produce a negative slope; larger prompts are never faster
+    slope = max(0.0, covariance / variance) if variance else 0.0
+    mean_x, mean_y = means.get("synthesize", (0.0, 0.0))
+    return mean_y - slope * mean_x, slope
+
+
+def evaluate(fixtures: list, budget: int) -> dict:
+    docs = tokens = recall = 0.0
+    select_seconds = 0.0
+    for fixture in fixtures:
+        start = time.process_time()
+        if budget < 0:
+            # Baseline: every retrieved document, as sent before the retrieval stage existed
+            context = fixture["docs"]
+        else:
+            pool = DocumentPool()
+            pool.add(fixture["docs"])
+            context = select_context(fixture["question"], pool.docs, fixture["slots"], budget=budget)
+        select_seconds += time.process_time() - start
+
+        kept = {normalize_url(doc.url) for doc in context}
+        docs += len(context)
+        tokens += _SYNTHESIZE_TEMPLATE_TOKENS + sum(document_tokens(doc) for doc in context)
+        recall += len(fixture["gold"] & kept) / len(fixture["gold"])
+
+    n = len(fixtures)
+    return {"docs": docs / n, "tokens": tokens / n, "select_ms": select_seconds * 1000 / n, "recall": recall / n}
+
+
+def main(args):
+    fixtures = load_fixtures(args.cassette)
+    if not fixtures:
+        sys.exit(f"No usable questions in {args.cassette}")
+    intercept, slope = fit_latency(args.cassette)
+    print(f"{len(fixtures)} questions; synthesize latency fit: {intercept * 1000:.0f} ms + {slope * 1e6:.0f} ms per 1k prompt tokens\n")
+
+    print(f"{'budget':>10} {'docs':>6} {'prompt tok':>11} {'select ms':>10} {'est. LLM ms':>12} {'cited recall':>13}")
+    for budget in [-1] + args.budgets:
+        row = evaluate(fixtures, budget)
+        label = "all docs" if budget < 0 else ("no limit" if budget == 0 else str(budget))
+        llm_ms = (intercept + slope * row["tokens"]) * 1000
+        print(f"{label:>10} {row['docs']:>6.1f} {row['tokens']:>11.0f} {row['select_ms']:>10.2f} {llm_ms:>12.0f} {row['recall']:>13.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=os.path.join(HERE, "cassettes", "pipeline.jsonl"))
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 4000, 2000, 1000, 500, 250])
+    main(parser.parse_args())
@@ -0,0 +1,127 @@
+# benchmarks/bench_logging.py
+"""
+Hot-path cost of the pipeline's diagnostics, before and after structured logging.
+
+One "request" is the diagnostics the reflect and synthesize nodes emit for a question:
+the call banners, the extracted slots, both raw LLM responses (~2 KB each) and the
+reflection round message. Each scenario runs it many times and reports the time the
+calling (event loop) thread spends per request:
+
+    print (before)           the old print() calls, stdout sent to a file
+    INFO, queued (default)   debug lines and payloads gated off by level
+    DEBUG, sampled, queued   debug lines on, raw responses sampled at LOG_PAYLOAD_SAMPLE_RATE
+    DEBUG, all, queued       debug lines and every raw response, through the queue handler
+    DEBUG, all, synchronous  the same, formatted and written in the calling thread
+
+Usage:
+    python benchmarks/bench_logging.py [--requests 20000] [--format json|text]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from agent.utils.logging_setup import (
+    LOG_PAYLOAD_SAMPLE_RATE, JsonFormatter, RequestIdFilter, log_payload, request_id, setup_logging, shutdown_logging
+)
+
+QUESTION = "Who won the 2022 FIFA World Cup and what was the final score?"
+SLOTS = ["winner", "final_score", "date"]
+DOCS = 8
+RAW = json.dumps({
+    "answer": "Argentina won the 2022 FIFA World Cup, beating France 4-2 on penalties after a 3-3 draw [1][2]. " * 12,
+    "citations": [{"id": i, "title": f"Source {i}", "url": f"https://example.com/{i}"} for i in range(1, 9)]
+})
+
+reflect_logger = logging.getLogger("agent.nodes.reflect")
+synthesize_logger = logging.getLogger("agent.nodes.synthesize")
+pipeline_logger = logging.getLogger("agent.pipeline")
+
+
+def request_with_print():
+    print(">>> reflect() called")
+    print(">>> Question:", QUESTION)
+    print(">>> Number of docs:", DOCS)
+    print("🎯 Extracted slots:", SLOTS)
+    print("[reflect] Raw Gemini response:")
+    print(RAW)
+    print("🔄 Reflection round 1: need more info, expanding...")
+    print(">>> synthesize() called")
+    print(">>> Question:", QUESTION)
+    print(">>> Number of docs:", DOCS)
+    print("📤 Raw Gemini response:", RAW)
+
+
+def request_with_logging(sample_rate=None):
+    reflect_logger.debug("reflect() called with %d docs for %r", DOCS, QUESTION)
+    reflect_logger.debug("🎯 Extracted slots: %s", SLOTS)
+    log_payload(reflect_logger, "Raw reflect response", RAW, sample_rate=sample_rate)
+    pipeline_logger.info("🔄 Reflection round %d: need more info, expanding...", 1)
+    synthesize_logger.debug("synthesize() called with %d docs for %r", DOCS, QUESTION)
+    log_payload(synthesize_logger, "📤 Raw synthesis response", RAW, sample_rate=sample_rate)
+
+
+def timed(fn, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+@contextlib.contextmanager
+def synchronous_logging(stream, fmt: str):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(logging.WARNING)
+
+
+def main(args):
+    request_id.set("bench")
+    results = []
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as out:
+        with contextlib.redirect_stdout(out):
+            results.append(("print (before)", timed(request_with_print, args.requests)))
+
+        scenarios = [
+            ("INFO, queued (default)", "INFO", None),
+            (f"DEBUG, sampled {LOG_PAYLOAD_SAMPLE_RATE:g}, queued", "DEBUG", None),
+            ("DEBUG, all, queued", "DEBUG", 1.0),
+        ]
+        for label, level, rate in scenarios:
+            setup_logging(level=level, levels="", fmt=args.format, stream=out)
+            try:
+                results.append((label, timed(lambda: request_with_logging(rate), args.requests)))
+            finally:
+                # Drains the queue; the listener thread's work is not charged to the hot path
+                shutdown_logging()
+
+        with synchronous_logging(out, args.format):
+            results.append(("DEBUG, all, synchronous", timed(lambda: request_with_logging(1.0), args.requests)))
+
+    baseline = results[0][1]
+    print(f"{'scenario':<28} {'µs/request':>11} {'vs print':>9}")
+    for label, us in results:
+        print(f"{label:<28} {us:>11.2f} {us / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--format", choices=["json", "text"], default="json")
+    main(parser.parse_args())
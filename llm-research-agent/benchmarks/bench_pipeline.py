@@ -0,0 +1,213 @@
+# benchmarks/bench_pipeline.py
+"""
+Offline benchmark of the full pipeline, replayed from a recorded cassette.
+
+Gemini and Google CSE are answered from a cassette (see record_cassette.py) with their
+recorded latencies, so no network access or credentials are needed. The answer and
+search caches are bypassed, so every request runs the whole chain. Each target is
+driven at increasing concurrency:
+
+    pipeline   run_pipeline() called directly
+    api        POST /api/query through the FastAPI app (in-process ASGI transport)
+
+For each level it reports throughput, p50/p95/p99 per stage (taken from the
+pipeline's OpenTelemetry spans) and process CPU time per request.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--targets pipeline api] [--levels 1 4 16]
+        [--latency-scale 1.0] [--json results.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import contextlib
+from collections import defaultdict
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import httpx
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import agent.pipeline as pipeline
+import agent.utils.slot_utils as slot_utils
+from agent.api_server import app
+from agent.tools.websearch import WebSearchTool
+from agent.utils.local_cache import LocalLRU
+from agent.utils.replay import configure_providers
+
+HERE = os.path.dirname(__file__)
+
+# Pipeline spans → reported stage (rounds and speculative calls are summed per request)
+STAGES = {
+    "run_pipeline": "total",
+    "generate_queries": "generate_queries",
+    "initial_web_search": "search",
+    "web_search_round": "search",
+    "reflect_round": "reflect",
+    "synthesize": "synthesize",
+    "speculative_synthesize": "synthesize",
+}
+STAGE_ORDER = ["generate_queries", "search", "reflect", "synthesize", "total"]
+
+
+class NullCache:
+    """
+    Answer cache stand-in that never hits, so each request does the full pipeline.
+    """
+
+    def key_for(self, question):
+        return question
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+def stage_of(span_name: str):
+    return STAGES.get(span_name) or STAGES.get(span_name.rsplit("_", 1)[0])
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def stage_latencies(spans) -> dict:
+    """
+    Sums span durations per stage and request (trace), returning {stage: [seconds per request]}.
+    """
+    per_trace = defaultdict(lambda: defaultdict(float))
+    for span in spans:
+        stage = stage_of(span.name)
+        if stage:
+            per_trace[span.context.trace_id][stage] += (span.end_time - span.start_time) / 1e9
+    latencies = defaultdict(list)
+    for stages in per_trace.values():
+        for stage, seconds in stages.items():
+            latencies[stage].append(seconds)
+    return latencies
+
+
+def isolate_caches():
+    # Every request must reach the (replayed) providers
+    pipeline.answer_cache = NullCache()
+    pipeline.WebSearchTool = lambda: WebSearchTool(cache=None)
+    slot_utils._local_slots = LocalLRU()
+    try:
+        import fakeredis
+        slot_utils.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    except ImportError:
+        pass
+
+
+async def run_level(target: str, client: httpx.AsyncClient, questions: list, concurrency: int, total: int):
+    """
+    Sends `total` requests with at most `concurrency` in flight; returns (seconds, errors).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        question = questions[i % len(questions)]
+        async with semaphore:
+            try:
+                if target == "api":
+                    resp = await client.post("/api/query", json={"question": question})
+                    resp.raise_for_status()
+                else:
+                    await pipeline.run_pipeline(question)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return time.perf_counter() - start, errors
+
+
+async def main(args):
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    configure_providers("replay", args.cassette, args.latency_scale)
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for target in args.targets:
+            print(f"\n▶ {target}")
+            header = f"{'conc':>5} {'req/s':>8} {'cpu ms/req':>11}"
+            for stage in STAGE_ORDER:
+                header += f" {stage + ' p50/95/99 ms':>30}"
+            print(header)
+
+            for level in args.levels:
+                total = args.requests or max(len(questions), 2 * level)
+                isolate_caches()
+                exporter.clear()
+                cpu_start = time.process_time()
+                # 🔇 Node diagnostics print to stdout; keep them out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    elapsed, errors = await run_level(target, client, questions, level, total)
+                cpu = time.process_time() - cpu_start
+
+                latencies = stage_latencies(exporter.get_finished_spans())
+                row = {
+                    "target": target,
+                    "concurrency": level,
+                    "requests": total,
+                    "errors": errors,
+                    "throughput": total / elapsed,
+                    "cpu_ms_per_request": cpu * 1000 / total,
+                    "stages": {
+                        stage: {f"p{q}": percentile(values, q / 100) * 1000 for q in (50, 95, 99)}
+                        for stage, values in latencies.items()
+                    }
+                }
+                results.append(row)
+
+                line = f"{level:>5} {row['throughput']:>8.2f} {row['cpu_ms_per_request']:>11.1f}"
+                for stage in STAGE_ORDER:
+                    p = row["stages"].get(stage)
+                    cell = f"{p['p50']:.0f}/{p['p95']:.0f}/{p['p99']:.0f}" if p else "-"
+                    line += f" {cell:>30}"
+                print(line + (f"  ⚠️ {errors} errors" if errors else ""))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=os.path.join(HERE, "cassettes", "pipeline.jsonl"))
+    parser.add_argument("--questions", default=os.path.join(HERE, "questions.txt"))
+    parser.add_argument("--targets", nargs="+", choices=["pipeline", "api"], default=["pipeline", "api"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=0,
+                        help="requests per level (default: all questions, at least 2 × concurrency)")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier for recorded latencies (0 = measure pure CPU overhead)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Redis being unavailable is expected here; keep the report readable
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args))
@@ -0,0 +1,153 @@
+# benchmarks/load_concurrency.py
+"""
+Load test for POST /api/query.
+
+Gemini and Google CSE are replaced by fakes with a fixed latency, and the Redis cache
+is bypassed, so every request runs the full generate → search → reflect → synthesize
+chain. The same number of requests is sent at increasing concurrency levels; with a
+non-blocking LLM layer, throughput should scale roughly linearly until the
+LLM_MAX_CONCURRENCY cap is reached.
+
+Usage:
+    python benchmarks/load_concurrency.py [--requests 32] [--latency 0.2]
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+# ✅ Make the agent package importable the same way src/main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import httpx
+
+import agent.pipeline as pipeline
+import agent.utils.llm as llm
+from agent.api_server import app
+from agent.tools.websearch import WebSearchTool, set_search_provider
+from agent.types.document import Document
+
+
+class FakeGemini:
+    """
+    Blocking stand-in for genai.Client that sleeps for `latency` seconds per call
+    and answers each prompt type with a well-formed response. Calls sent with a
+    response schema (LLM_STRUCTURED_OUTPUT) get JSON of that shape.
+    """
+
+    SLOTS = ["winner"]
+    REFLECTION = {"slots": ["winner"], "filled": ["winner"], "need_more": False, "new_queries": []}
+    ANSWER = {
+        "answer": "Argentina won the 2022 FIFA World Cup final [1].",
+        "citations": [{"id": 1, "title": "Final", "url": "https://example.com/final"}]
+    }
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model, contents, config=None):
+        time.sleep(self.latency)
+        schema = getattr(config, "response_schema", None)
+        if schema is not None:
+            if schema.get("type") == "ARRAY":
+                reply = self.SLOTS
+            elif "need_more" in schema.get("properties", {}):
+                reply = self.REFLECTION
+            else:
+                reply = self.ANSWER
+            return SimpleNamespace(text=json.dumps(reply))
+
+        prompt = contents[0]["parts"][0]["text"]
+        if "information \"slots\"" in prompt:
+            text = json.dumps(self.SLOTS)
+        elif "Slots:" in prompt:
+            text = json.dumps(self.REFLECTION)
+        elif "citations" in prompt:
+            text = json.dumps(self.ANSWER)
+        else:
+            text = "world cup winner 2022\nworld cup final score\nworld cup final scorers"
+        return SimpleNamespace(text=text)
+
+
+class FakeSearch:
+    """
+    Search provider that returns one result per query after `latency` seconds.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def search(self, query):
+        await asyncio.sleep(self.latency)
+        return [Document(title=query, snippet=query, url=f"https://example.com/{query}")]
+
+
+class NullCache:
+    """
+    Answer cache stand-in that never hits, so each request does the full pipeline.
+    """
+
+    def key_for(self, question):
+        return question
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+def install_fakes(latency: float):
+    fake = FakeGemini(latency)
+    llm.get_genai_client = lambda: fake
+    pipeline.answer_cache = NullCache()
+
+    pipeline.WebSearchTool = lambda: WebSearchTool(cache=None)
+    set_search_provider(FakeSearch(latency / 4))
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int) -> float:
+    """
+    Sends `total` requests with at most `concurrency` in flight and returns requests/second.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            resp = await client.post("/api/query", json={"question": f"Who won the World Cup? #{i}"})
+            resp.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return total / (time.perf_counter() - start)
+
+
+async def main(total: int, latency: float, levels: list[int]):
+    install_fakes(latency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'concurrency':>12} {'req/s':>10} {'speedup':>10}")
+        baseline = None
+        for level in levels:
+            # 🔇 Node diagnostics print to stdout; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                rps = await run_level(client, level, total)
+            baseline = baseline or rps
+            print(f"{level:>12} {rps:>10.2f} {rps / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated seconds per Gemini call")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.latency, args.levels))
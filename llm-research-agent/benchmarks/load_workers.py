@@ -0,0 +1,159 @@
+# benchmarks/load_workers.py
+"""
+Load test for the multi-worker runner (src/serve.py): POST /api/query throughput
+as the number of worker processes grows.
+
+For each worker count the real server is started with Gemini and Google CSE replayed
+from the cassette (recorded latencies × --latency-scale) and answer caching off, so
+every request runs the pipeline and the per-request CPU work is what the extra
+workers spread over the cores. Each run starts with one pass over the questions
+(imports, search cache), then sends `--requests` requests at `--concurrency`.
+
+The consolidated /metrics endpoint is scraped afterwards: its /api/query request
+count must equal the requests sent, whichever worker served them.
+
+Usage:
+    python benchmarks/load_workers.py [--workers 1 2 4] [--requests 400] [--concurrency 16] [--latency-scale 0.1]
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+HERE = os.path.dirname(__file__)
+SERVE = os.path.abspath(os.path.join(HERE, "../src/serve.py"))
+
+_REQUESTS_RE = re.compile(r'^http_requests_total\{handler="/api/query",method="POST",status="2xx"\} (\S+)$', re.M)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PROVIDER_MODE": "replay",
+        "PROVIDER_CASSETTE": os.path.abspath(args.cassette),
+        "REPLAY_LATENCY_SCALE": str(args.latency_scale),
+        # Every request runs the pipeline: no answers kept in Redis or in the workers
+        "CACHE_LIMIT": "0",
+        "LOCAL_CACHE_SIZE": "0",
+        "LOG_LEVEL": "ERROR",
+        "OTEL_SDK_DISABLED": "true"
+    }
+    # A fresh metrics directory per run (see serve.prepare_multiprocess_metrics)
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return subprocess.Popen(
+        [sys.executable, SERVE, "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("server did not start in time")
+
+
+async def send(client: httpx.AsyncClient, questions: list, total: int, concurrency: int):
+    """
+    Sends `total` requests, cycling through `questions`, with at most `concurrency`
+    in flight. Returns (seconds, sorted latencies, errors).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                resp = await client.post("/api/query", json={"question": questions[i % len(questions)]})
+                resp.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run_workers(workers: int, questions: list, args) -> dict:
+    port = free_port()
+    server = start_server(workers, port, args)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+            await wait_ready(client, server)
+            # Warm every worker: one pass over the questions
+            await send(client, questions, len(questions) * workers, args.concurrency)
+            elapsed, latencies, errors = await send(client, questions, args.requests, args.concurrency)
+
+            metrics = (await client.get("/metrics")).text
+            match = _REQUESTS_RE.search(metrics)
+            counted = float(match.group(1)) if match else 0.0
+            expected = len(questions) * workers + args.requests
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "workers": workers,
+        "throughput": args.requests / elapsed,
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "errors": errors,
+        "metrics_ok": counted == expected
+    }
+
+
+async def main(args):
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    print(f"{'workers':>8} {'req/s':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'metrics':>8}")
+    baseline = None
+    for workers in args.workers:
+        row = await run_workers(workers, questions, args)
+        baseline = baseline or row["throughput"]
+        print(
+            f"{workers:>8} {row['throughput']:>8.2f} {row['throughput'] / baseline:>7.2f}x "
+            f"{row['p50']:>8.0f} {row['p95']:>8.0f} {'ok' if row['metrics_ok'] else 'MISMATCH':>8}"
+            + (f"  ⚠️ {row['errors']} errors" if row["errors"] else "")
+        )
+    print(f"\n{os.cpu_count()} CPU cores")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight (keep at most the number of questions)")
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--cassette", default=os.path.join(HERE, "cassettes", "pipeline.jsonl"))
+    parser.add_argument("--questions", default=os.path.join(HERE, "questions.txt"))
+    asyncio.run(main(parser.parse_args()))
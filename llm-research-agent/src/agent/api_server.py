@@ -1,11 +1,72 @@
-from fastapi import FastAPI
+import json
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from agent.pipeline import run_pipeline
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+from agent.pipeline import run_pipeline, stream_pipeline, answer_cache, prewarm_popular
+from agent.utils.popularity import CACHE_PREWARM_TOP_N
+from agent.batch import BATCH_CONCURRENCY, run_batch, spool
+from agent.utils.http_client import close_http_client, get_http_client
+from agent.utils.document_store import document_store
+from agent.utils.replay import configure_providers
+from agent.utils.admission import Overloaded, admission
+from agent.utils.logging_setup import request_id, setup_logging, shutdown_logging
+from agent.utils.llm import LLMClient, get_genai_client, get_llm_provider
+from agent.utils.metrics import mark_worker_dead
+from agent.utils.redis_cache import redis_client
 
 from prometheus_fastapi_instrumentator import Instrumentator
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+async def warm_up():
+    """
+    Opens this worker's pooled clients before it takes traffic, so its first requests
+    do not pay for the setup: a Redis connection, the outbound HTTP client and the
+    LLM provider (with the Gemini client when live). Failures are logged; the
+    clients retry on first use.
+    """
+    try:
+        await redis_client.ping()
+    except Exception as e:
+        logger.warning("⚠️ Redis warm-up failed: %r", e)
+    get_http_client()
+    try:
+        if isinstance(get_llm_provider(), LLMClient):
+            get_genai_client()
+    except Exception as e:
+        logger.warning("⚠️ LLM client warm-up failed: %r", e)
+
+# Background tasks that live as long as the worker
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Structured logs, written off the request path by a background thread
+    setup_logging()
+    # Live Gemini/CSE by default; PROVIDER_MODE=record|replay captures or replays a cassette
+    configure_providers()
+    await warm_up()
+    # Keep this worker's in-process answer cache coherent with writes from other workers
+    listener = asyncio.create_task(answer_cache.listen_for_invalidations())
+    # Refresh the most asked questions' answers before they go stale
+    prewarmer = asyncio.create_task(prewarm_popular()) if CACHE_PREWARM_TOP_N else None
+    yield
+    listener.cancel()
+    if prewarmer:
+        prewarmer.cancel()
+    await close_http_client()
+    if document_store:
+        document_store.close()
+    shutdown_logging()
+    mark_worker_dead()
+
+app = FastAPI(lifespan=lifespan)
 
 # Instrument Prometheus
 Instrumentator().instrument(app).expose(app, include_in_schema=False, should_gzip=True)
@@ -19,12 +80,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request-ID correlation: every log line written while serving a request carries its
+# X-Request-ID (the caller's, or a generated one), which is echoed in the response
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    rid = request.headers.get("x-request-id", "")[:128] or uuid.uuid4().hex
+    token = request_id.set(rid)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
+
 # Request schema
 class QueryRequest(BaseModel):
     question: str
+    # Optional per-request limits; unset ones fall back to PIPELINE_DEADLINE / _MAX_LLM_CALLS / _MAX_TOKENS
+    deadline_seconds: Optional[float] = Field(None, gt=0)
+    max_llm_calls: Optional[int] = Field(None, gt=0)
+    max_tokens: Optional[int] = Field(None, gt=0)
+    # Admission class when the worker is at its pipeline limit: interactive requests go first
+    priority: Literal["interactive", "batch"] = "interactive"
+    # Add a per-stage "timings" breakdown (wall time, LLM calls, queue wait, tokens) to the response
+    timings: bool = False
+
+    def options(self) -> dict:
+        return {
+            "deadline": self.deadline_seconds,
+            "max_llm_calls": self.max_llm_calls,
+            "max_tokens": self.max_tokens,
+            "priority": self.priority,
+            "timings": self.timings
+        }
+
+# Load shedding: no pipeline slot for the request
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
 
 # Endpoint utama
 @app.post("/api/query")
 async def query_llm(request: QueryRequest):
-    result = await run_pipeline(request.question)
+    result = await run_pipeline(request.question, **request.options())
     return result
+
+# Streaming endpoint: Server-Sent Events with per-stage progress and answer tokens
+@app.post("/api/query/stream")
+async def query_llm_stream(request: QueryRequest):
+    # Once the stream has started the status is 200, so shed up front when the queue
+    # is already full (cached answers are still served)
+    if admission.saturated() and not await answer_cache.get(request.question, record_stats=False):
+        admission.reject(request.priority)
+
+    async def events():
+        async for item in stream_pipeline(request.question, **request.options()):
+            yield f"event: {item['event']}\ndata: {json.dumps(item['data'])}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Batch endpoint: NDJSON questions in, NDJSON answers out as each one completes
+@app.post("/api/batch")
+async def query_batch(request: Request, concurrency: int = Query(BATCH_CONCURRENCY, gt=0, le=256)):
+    body = await spool(request.stream())
+
+    async def results():
+        try:
+            async for result in run_batch(body, concurrency):
+                yield json.dumps(result) + "\n"
+        finally:
+            body.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
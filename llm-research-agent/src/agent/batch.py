@@ -0,0 +1,164 @@
+import os
+import json
+import asyncio
+import logging
+import tempfile
+from typing import IO, AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from agent.pipeline import run_pipeline
+from agent.utils.admission import Overloaded
+from agent.utils.logging_setup import request_id
+
+logger = logging.getLogger(__name__)
+
+# Questions answered at once by one batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Times a question shed by admission control is retried (after its Retry-After)
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "3"))
+
+# Bytes of a batch request body kept in memory; larger bodies are spooled to disk
+BATCH_SPOOL_SIZE = int(os.getenv("BATCH_SPOOL_SIZE", str(1024 * 1024)))
+
+# Optional per-question settings accepted in a batch line, and the run_pipeline arguments they map to
+_OPTIONS = {
+    "deadline_seconds": "deadline", "max_llm_calls": "max_llm_calls", "max_tokens": "max_tokens", "timings": "timings"
+}
+
+Line = Union[str, bytes]
+
+
+async def spool(chunks: AsyncIterable[bytes], max_size: int = BATCH_SPOOL_SIZE) -> IO[bytes]:
+    """
+    Copies a byte stream (e.g. a request body) into a temporary file, kept in memory
+    up to `max_size` bytes and on disk beyond that, rewound for reading.
+
+    The request body has to be read in full before the response starts streaming
+    (Starlette's streaming response listens for the client disconnecting on the same
+    channel the body arrives on); spooling keeps that from growing with the batch.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=max_size)
+    async for chunk in chunks:
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+
+async def file_lines(path: str) -> AsyncIterator[str]:
+    """
+    Reads a file line by line (a local file read is fast enough to do inline).
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line
+
+
+async def _as_async(lines: Union[Iterable[Line], AsyncIterable[Line]]) -> AsyncIterator[Line]:
+    if hasattr(lines, "__aiter__"):
+        async for line in lines:
+            yield line
+    else:
+        for line in lines:
+            yield line
+
+
+async def answer_line(index: int, line: Line) -> dict:
+    """
+    Answers one batch line: a JSON object with "question", an optional "id" that is
+    echoed back and optional deadline_seconds / max_llm_calls / max_tokens limits
+    and timings flag.
+    A bare JSON string is taken as the question.
+
+    Returns:
+        dict: "index" (line number among non-blank lines), "id", "question" and the
+        pipeline result, or "status": "error" with an "error" message.
+    """
+    record = {"index": index}
+    # Runs in its own task, so this only tags the logs of this line's pipeline
+    parent = request_id.get()
+    request_id.set(f"{parent}/{index}" if parent != "-" else f"batch/{index}")
+    try:
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict) or not isinstance(item.get("question"), str) or not item["question"].strip():
+            raise ValueError("expected a JSON object with a non-empty \"question\"")
+    except ValueError as e:
+        return {**record, "status": "error", "error": f"Invalid batch line: {e}"}
+
+    if "id" in item:
+        record["id"] = item["id"]
+    record["question"] = item["question"]
+    options = {arg: item[field] for field, arg in _OPTIONS.items() if item.get(field) is not None}
+
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        try:
+            return {**record, **await run_pipeline(item["question"], priority="batch", **options)}
+        except Overloaded as e:
+            if attempt == BATCH_MAX_RETRIES:
+                return {**record, "status": "error", "error": str(e)}
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            logger.warning(f"⚠️ Batch question {index} failed: {e!r}")
+            return {**record, "status": "error", "error": str(e)}
+
+
+async def run_batch(
+    lines: Union[Iterable[Line], AsyncIterable[Line]],
+    concurrency: Optional[int] = None
+) -> AsyncIterator[dict]:
+    """
+    Answers a stream of NDJSON batch lines (see answer_line) with at most
+    `concurrency` pipelines at once, yielding each result as soon as it completes
+    (so not in input order; use "index" or "id" to match them up).
+
+    Input is read only as capacity frees up, and a slot is only given back once its
+    result has been consumed, so memory stays flat however long the batch is. The
+    questions share the answer/search caches and in-flight search lookups, so a
+    query repeated across questions is fetched once.
+
+    Args:
+        lines: NDJSON lines (str or bytes), sync or async; blank lines are skipped.
+        concurrency (int, optional): Questions answered at once (default BATCH_CONCURRENCY).
+    """
+    slots = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    results: asyncio.Queue = asyncio.Queue()
+    running = set()
+
+    async def answer(index: int, line: Line):
+        results.put_nowait(await answer_line(index, line))
+
+    async def feed():
+        index = 0
+        async for line in _as_async(lines):
+            if not line.strip():
+                continue
+            await slots.acquire()
+            task = asyncio.ensure_future(answer(index, line))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            index += 1
+        while running:
+            await asyncio.gather(*running)
+        results.put_nowait(None)
+
+    def on_feed_done(task: asyncio.Task):
+        # A failing input stream ends the batch instead of leaving the reader waiting
+        if not task.cancelled() and task.exception() is not None:
+            results.put_nowait(None)
+
+    feeder = asyncio.ensure_future(feed())
+    feeder.add_done_callback(on_feed_done)
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+            slots.release()
+        if feeder.done() and not feeder.cancelled() and feeder.exception():
+            raise feeder.exception()
+    finally:
+        feeder.cancel()
+        for task in list(running):
+            task.cancel()
@@ -1,16 +1,9 @@
-import os
 import re
 from typing import List
-from dotenv import load_dotenv
-from google import genai
 
-# Load environment variables from .env (e.g. GEMINI_API_KEY)
-load_dotenv()
+from agent.utils.llm import get_llm_client
 
-# Initialize the Gemini client using the API key from environment
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-def generate_queries(question: str) -> List[str]:
+async def generate_queries(question: str) -> List[str]:
     """
     Given a natural language question from the user,
     generate 3–5 concise and distinct web search queries
@@ -35,14 +28,8 @@ User question:
 {question}
 """
 
-    # Call Gemini to generate the queries
-    response = client.models.generate_content(
-        model="gemini-1.5-flash",
-        contents=[{"parts": [{"text": prompt}]}]
-    )
-
-    # Extract the raw text from the model's response
-    raw_output = response.text if hasattr(response, "text") else str(response)
+    # Call Gemini to generate the queries and take the raw text of its response
+    raw_output = await get_llm_client().generate(prompt)
 
     # Clean and normalize each line into a proper search query
     queries = [
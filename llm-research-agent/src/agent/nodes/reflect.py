@@ -1,21 +1,31 @@
-import os
 import json
-import re
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-from google import genai
+import logging
+from typing import List, Dict, Any, Optional
 
 from agent.types.document import Document
+from agent.utils.llm import get_llm_client
+from agent.utils.logging_setup import log_payload
 from agent.utils.slot_utils import extract_slots_llm
-
-# Load environment variables (e.g. GEMINI_API_KEY from .env)
-load_dotenv()
-
-# Helper function to initialize the Gemini client
-def get_genai_client():
-    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-def reflect(question: str, docs: List[Document]) -> Dict[str, Any]:
+from agent.utils.structured import parse_json_reply
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+# Response schema of the reflect reply
+REFLECTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"slots": _STRINGS, "filled": _STRINGS, "need_more": {"type": "BOOLEAN"}, "new_queries": _STRINGS},
+    "required": ["slots", "filled", "need_more", "new_queries"],
+    "property_ordering": ["slots", "filled", "need_more", "new_queries"]
+}
+
+async def reflect(
+    question: str,
+    docs: List[Document],
+    slots: Optional[List[str]] = None,
+    fold_slots: bool = False
+) -> Dict[str, Any]:
     """
     Analyze whether the retrieved documents can answer the given question
     by checking which information 'slots' are filled.
@@ -23,6 +33,10 @@ def reflect(question: str, docs: List[Document]) -> Dict[str, Any]:
     Args:
         question (str): The user's original question.
         docs (List[Document]): List of retrieved web documents.
+        slots (List[str], optional): Slots already extracted for this question.
+            When omitted they are extracted first (memoized per question).
+        fold_slots (bool): When no slots are given, let this reflect call determine
+            them itself instead of making a separate slot-extraction call.
 
     Returns:
         Dict[str, Any]: A dictionary with:
@@ -32,17 +46,22 @@ def reflect(question: str, docs: List[Document]) -> Dict[str, Any]:
             - "new_queries": list of follow-up queries to fill missing info
     """
 
-    print(">>> reflect() called")
-    print(">>> Question:", question)
-    print(">>> Number of docs:", len(docs))
+    logger.debug("reflect() called with %d docs for %r", len(docs), question)
 
-    # Step 1: Extract information slots from the question using Gemini
-    slots = extract_slots_llm(question)
-    print("🎯 Extracted slots:", slots)
+    # Step 1: Extract information slots from the question using Gemini (unless given or folded)
+    if slots is None and not fold_slots:
+        slots = await extract_slots_llm(question)
+    logger.debug("🎯 Extracted slots: %s", slots)
+
+    if slots is None:
+        slots_line = "Slots: not provided. First determine the information slots needed to fully answer the question (e.g. \"winner\", \"date\", \"score\")."
+    else:
+        slots_line = f"Slots: {json.dumps(slots)}"
 
     # Step 2: Build a readable context string from retrieved documents
     context = "\n\n".join(
         f"Title: {doc.title}\nSnippet: {doc.snippet}\nURL: {doc.url}"
+        + (f"\nPage extract: {doc.content}" if doc.content else "")
         for doc in docs
     )
 
@@ -53,7 +72,7 @@ Your job is to check if the following retrieved search results are sufficient to
 
 Question: {question}
 
-Slots: {json.dumps(slots)}
+{slots_line}
 
 Search Results:
 {context}
@@ -73,24 +92,13 @@ Respond with valid JSON in this format:
 }}
 """
 
-    # Step 4: Call Gemini to get structured reflection
-    client = get_genai_client()
-    response = client.models.generate_content(
-        model="gemini-1.5-flash",
-        contents=[{"parts": [{"text": prompt}]}]
-    )
-
-    # Step 5: Extract plain text from Gemini response
-    text = response.text if hasattr(response, "text") else str(response)
-    print("[reflect] Raw Gemini response:")
-    print(text)
+    # Step 4: Call Gemini for a reflection following REFLECTION_SCHEMA
+    text = await get_llm_client().generate(prompt, schema=REFLECTION_SCHEMA)
+    log_payload(logger, "Raw reflect response", text)
 
-    # Step 6: Attempt to parse the JSON output from the model
+    # Step 5: Parse the JSON reply (repairing fences, trailing commas and cut-off replies)
     try:
-        # Remove optional ```json markdown wrapper if present
-        cleaned = re.sub(r"^```(?:json)?", "", text.strip(), flags=re.IGNORECASE).strip()
-        cleaned = re.sub(r"```$", "", cleaned).strip()
-        return json.loads(cleaned)
-    except Exception as e:
-        print("[reflect] Failed to parse response as JSON.")
-        raise e
+        return parse_json_reply(text)
+    except ValueError as e:
+        logger.warning("⚠️ Failed to parse reflect response as JSON: %s", e)
+        raise
@@ -1,23 +1,58 @@
-import os
-import json
-import re
-from typing import List
-from dotenv import load_dotenv
-from google import genai
+import logging
+from typing import Callable, List, Optional
 from agent.types.document import Document
-
-load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-def synthesize(question: str, docs: List[Document]) -> dict:
-    print(">>> synthesize() called")
-    print(">>> Question:", question)
-    print(">>> Number of docs:", len(docs))
+from agent.utils.citations import normalize_citations
+from agent.utils.json_stream import JsonExtractor, JsonFieldStreamer
+from agent.utils.llm import get_llm_client
+from agent.utils.logging_setup import log_payload
+from agent.utils.structured import parse_json_reply
+
+logger = logging.getLogger(__name__)
+
+# Response schema of the synthesize reply ("answer" first, so it can be streamed early)
+ANSWER_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "answer": {"type": "STRING"},
+        "citations": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"id": {"type": "INTEGER"}, "title": {"type": "STRING"}, "url": {"type": "STRING"}},
+                "required": ["id", "title", "url"]
+            }
+        }
+    },
+    "required": ["answer", "citations"],
+    "property_ordering": ["answer", "citations"]
+}
+
+async def synthesize(
+    question: str,
+    docs: List[Document],
+    on_token: Optional[Callable[[str], None]] = None
+) -> dict:
+    """
+    Writes a short cited answer to the question from the retrieved documents.
+
+    Args:
+        question (str): The user's original question.
+        docs (List[Document]): Documents to cite, numbered from 1 in prompt order.
+        on_token (Callable, optional): Receives the answer text incrementally while
+            Gemini streams it (citation markers are not yet renumbered).
+
+    Returns:
+        dict: "status", "answer" and compact "citations".
+    """
+    logger.debug("synthesize() called with %d docs for %r", len(docs), question)
 
     # Step 1: Format documents into context
     context = ""
     for idx, doc in enumerate(docs, 1):
-        context += f"[{idx}] Title: {doc.title}\nSnippet: {doc.snippet}\nURL: {doc.url}\n\n"
+        context += f"[{idx}] Title: {doc.title}\nSnippet: {doc.snippet}\nURL: {doc.url}\n"
+        if doc.content:
+            context += f"Page extract: {doc.content}\n"
+        context += "\n"
 
     # Step 2: Prompt with stronger instruction
     prompt = f"""You're a helpful research assistant.
@@ -48,81 +83,51 @@ Format:
 }}
 """
 
-    # Step 3: Get Gemini response
-    response = client.models.generate_content(
-        model="gemini-1.5-flash",
-        contents=[{"parts": [{"text": prompt}]}]
-    )
-
-    raw = response.text.strip() if hasattr(response, "text") else str(response)
-    print("📤 Raw Gemini response:", raw)
-
+    # Step 3: Get Gemini response (streamed through on_token when requested), parsing as it arrives
+    extractor = JsonExtractor("{")
+    if on_token is None:
+        raw = (await get_llm_client().generate(prompt, schema=ANSWER_SCHEMA)).strip()
+        extractor.feed(raw)
+    else:
+        streamer = JsonFieldStreamer("answer")
+        chunks = []
+        async for chunk in get_llm_client().stream(prompt, schema=ANSWER_SCHEMA):
+            chunks.append(chunk)
+            extractor.feed(chunk)
+            delta = streamer.feed(chunk)
+            if delta:
+                on_token(delta)
+        raw = "".join(chunks).strip()
+    log_payload(logger, "📤 Raw synthesis response", raw)
+
+    # Step 4: Parse the JSON reply (repairing fences, trailing commas and cut-off replies)
     try:
-        # Step 4: Clean and parse JSON
-        raw = re.sub(r"^```(?:json)?", "", raw, flags=re.IGNORECASE).strip("`\n ")
-        json_start = raw.find("{")
-        result = json.loads(raw[json_start:])
-
-        original_answer = result.get("answer", "")
-        raw_citations = result.get("citations", [])
-
-        # Step 5: Extract citation IDs from [1], [2, 3], etc.
-        matches = re.findall(r"\[(.*?)\]", original_answer)
-        used_ids = set()
-        for match in matches:
-            for part in re.split(r"[,\s]+", match):
-                if part.strip().isdigit():
-                    used_ids.add(int(part.strip()))
-        used_ids = sorted(used_ids)
-
-        # Step 6: Map old → new compact IDs
-        id_mapping = {old_id: new_id for new_id, old_id in enumerate(used_ids, 1)}
-
-        def replace_citations(text: str, id_mapping: dict[int, int]) -> str:
-            def repl(match):
-                ids = match.group(1)
-                new_ids = []
-                for part in re.split(r"[,\s]+", ids):
-                    if part.strip().isdigit():
-                        old = int(part.strip())
-                        if old in id_mapping:
-                            new_ids.append(str(id_mapping[old]))
-                return f"[{', '.join(new_ids)}]"
-            return re.sub(r"\[(.*?)\]", repl, text)
-
-        updated_answer = replace_citations(original_answer, id_mapping)
-
-        # Step 7: Build final citation map
-        final_citations = []
-        for old_id in used_ids:
-            for c in raw_citations:
-                if c["id"] == old_id:
-                    final_citations.append({
-                        "id": id_mapping[old_id],
-                        "title": c["title"],
-                        "url": c["url"]
-                    })
-                    break
-
-        # Step 8: Optional fallback — check if answer is vague
-        if not updated_answer or "not enough" in updated_answer.lower() or len(updated_answer.split()) < 4:
-            print("⚠️ Gemini returned insufficient answer.")
-            return {
-                "status": "incomplete",
-                "answer": updated_answer,
-                "citations": final_citations
-            }
-
+        result = parse_json_reply(extractor)
+    except ValueError as e:
+        logger.warning("❌ Failed to parse synthesis JSON: %s", e)
         return {
-            "status": "complete",
-            "answer": updated_answer,
-            "citations": final_citations
+            "status": "incomplete",
+            "answer": raw,
+            "citations": []
         }
 
-    except Exception as e:
-        print("❌ Failed to parse JSON:", e)
+    # Step 5: Renumber citation markers 1..n and keep only the cited sources
+    citations = result.get("citations")
+    answer, citations = normalize_citations(
+        str(result.get("answer") or ""), citations if isinstance(citations, list) else [], docs
+    )
+
+    # Step 6: Optional fallback — check if answer is vague
+    if not answer or "not enough" in answer.lower() or len(answer.split()) < 4:
+        logger.info("⚠️ Gemini returned insufficient answer")
         return {
             "status": "incomplete",
-            "answer": raw,
-            "citations": []
+            "answer": answer,
+            "citations": citations
         }
+
+    return {
+        "status": "complete",
+        "answer": answer,
+        "citations": citations
+    }
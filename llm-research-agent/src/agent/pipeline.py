@@ -1,109 +1,656 @@
-import re
-import json
 import os
-import redis
+import time
+import asyncio
+import logging
+import contextvars
+from typing import AsyncIterator, Callable, Dict, List, Optional, TypedDict
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, START, StateGraph
 from agent.nodes.generate_queries import generate_queries
 from agent.nodes.reflect import reflect
 from agent.nodes.synthesize import synthesize
+from agent.utils.slot_utils import extract_slots_llm, get_cached_slots, store_slots
 from agent.tools.websearch import WebSearchTool
+from agent.tools.page_fetcher import PAGE_FETCH, page_fetcher
 from opentelemetry import trace
-from agent.utils.metrics import TOOL_CALL_COUNT, TOOL_LATENCY
+from agent.utils.metrics import SINGLEFLIGHT_REQUESTS, SPECULATIVE_SYNTHESIS_CALLS, SPECULATIVE_SAVED_SECONDS, PIPELINE_RESUMES, CACHE_REFRESHES
+from agent.utils.singleflight import SingleFlight, RedisLock
+from agent.utils.redis_cache import AnswerCache, redis_client
+from agent.utils.popularity import CACHE_PREWARM_TOP_N, PopularityTracker
+from agent.utils.semantic_cache import SEMANTIC_CACHE, SemanticCache
+from agent.utils.retrieval import DocumentPool, select_context
+from agent.utils.query_planner import QueryPlanner
+from agent.utils.coverage import precheck, can_skip_reflect, heuristic_reflection, record_agreement
+from agent.utils.budget import (
+    Budget, current_budget, stage_estimates, PIPELINE_DEADLINE, PIPELINE_MAX_LLM_CALLS, PIPELINE_MAX_TOKENS,
+    REFLECT_OVERHEAD_TOKENS, SYNTHESIZE_OVERHEAD_TOKENS
+)
+from agent.utils.retrieval import document_tokens
+from agent.utils.admission import Overloaded, admission
+from agent.utils.instrumentation import Timings, current_timings, stage
+from agent.utils.checkpoints import RedisCheckpointSaver
+from agent.types.document import Document
 
+logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=6379,
-    db=0,
-    decode_responses=True
-)
+# Stale answers are still served, and refreshed in the background (see schedule_refresh)
+answer_cache = AnswerCache(on_stale=lambda question: schedule_refresh(question, "stale"))
+semantic_cache = SemanticCache(answer_cache)
 
-CACHE_PREFIX = "llm_cache:"
-CACHE_LIMIT = 50
 MAX_REFLECTION_ROUNDS = 2
 
-async def run_pipeline(question: str) -> dict:
+# Let the first reflect call determine the slots itself instead of a separate
+# extraction call when they are not cached yet
+REFLECT_FOLD_SLOTS = os.getenv("REFLECT_FOLD_SLOTS", "false").lower() == "true"
+
+# Run synthesize concurrently with each reflect call and keep the answer if
+# reflection finds the docs sufficient (costs a wasted LLM call otherwise)
+SPECULATIVE_SYNTHESIS = os.getenv("SPECULATIVE_SYNTHESIS", "false").lower() == "true"
+
+# Cross-worker coalescing: only one worker runs the pipeline for a question,
+# the others poll the cache until the result lands (or the lock expires)
+SINGLEFLIGHT_REDIS_LOCK = os.getenv("SINGLEFLIGHT_REDIS_LOCK", "false").lower() == "true"
+SINGLEFLIGHT_LOCK_TTL = int(os.getenv("SINGLEFLIGHT_LOCK_TTL", "60"))
+SINGLEFLIGHT_POLL_INTERVAL = 0.25
+
+# Checkpoint the pipeline state to Redis after every graph step, so a request retried
+# after a worker crash or timeout resumes from the last completed step
+PIPELINE_CHECKPOINTS = os.getenv("PIPELINE_CHECKPOINTS", "false").lower() == "true"
+# Seconds a run owns its checkpoints without renewing its lease; a crashed run's
+# checkpoints can be resumed once its lease has lapsed
+PIPELINE_CHECKPOINT_LEASE = int(os.getenv("PIPELINE_CHECKPOINT_LEASE", "15"))
+
+# Seconds between two passes refreshing the most asked questions' answers before they go stale
+CACHE_PREWARM_INTERVAL = float(os.getenv("CACHE_PREWARM_INTERVAL", "60"))
+
+single_flight = SingleFlight()
+redis_lock = RedisLock(redis_client, ttl_ms=SINGLEFLIGHT_LOCK_TTL * 1000)
+# Only one worker refreshes a given cached answer at a time
+refresh_lock = RedisLock(redis_client, prefix="llm_refresh:", ttl_ms=SINGLEFLIGHT_LOCK_TTL * 1000)
+# Only one run at a time writes (or resumes) a question's checkpoints
+checkpoint_lease = RedisLock(redis_client, prefix="llm_checkpoint_lease:", ttl_ms=PIPELINE_CHECKPOINT_LEASE * 1000)
+popularity = PopularityTracker()
+# Refreshes running in this worker, by cache key (also keeps the tasks referenced)
+_refreshing: Dict[str, asyncio.Task] = {}
+
+# Receives progress events as (event type, payload)
+EventCallback = Callable[[str, dict], None]
+
+def _emit(on_event: Optional[EventCallback], event: str, **data):
+    if on_event is not None:
+        on_event(event, data)
+
+async def run_pipeline(
+    question: str,
+    on_event: Optional[EventCallback] = None,
+    deadline: Optional[float] = None,
+    max_llm_calls: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    priority: str = "interactive",
+    timings: bool = False
+) -> dict:
+    """
+    Answers a question: generate queries → search → reflect (and search again) → synthesize.
+
+    Args:
+        question (str): The user's question.
+        on_event (Callable, optional): Receives per-stage progress events
+            ("queries", "search_results", "reflection", "answer_delta") while the
+            pipeline runs. Requests served from the cache or coalesced onto another
+            in-flight request only get the returned result.
+        deadline (float, optional): Seconds the request may take; reflection rounds
+            that would not leave time for synthesize are skipped and searches are cut
+            short (default PIPELINE_DEADLINE, 0 = none).
+        max_llm_calls (int, optional): LLM calls the request may make (default PIPELINE_MAX_LLM_CALLS).
+        max_tokens (int, optional): Estimated LLM tokens the request may use (default PIPELINE_MAX_TOKENS).
+        priority (str, optional): Admission class ("interactive" or "batch") when the
+            question has to run and the worker is at its pipeline limit.
+        timings (bool): Add a "timings" block with the per-stage breakdown of this
+            request (wall time, LLM calls, queue wait, tokens, parse failures, retries).
+
+    Returns:
+        dict: "status", "answer" and renumbered "citations". Answers served by the
+        semantic cache also carry a "cache" block with the matched question and similarity;
+        runs with a deadline or LLM budget carry a "budget" block (see Budget.report),
+        and requests that asked for them a "timings" block (see Timings.report).
+
+    Raises:
+        Overloaded: No pipeline slot is available (the request should get a 503).
+    """
+    budget = Budget(
+        deadline=PIPELINE_DEADLINE if deadline is None else deadline,
+        max_llm_calls=PIPELINE_MAX_LLM_CALLS if max_llm_calls is None else max_llm_calls,
+        max_tokens=PIPELINE_MAX_TOKENS if max_tokens is None else max_tokens
+    )
+    if not timings:
+        return await _run_pipeline(question, on_event, priority, budget)
+
+    # Stages run for this request (not by a request it was coalesced onto) record into it
+    collector = Timings()
+    token = current_timings.set(collector)
+    try:
+        output = await _run_pipeline(question, on_event, priority, budget)
+    finally:
+        current_timings.reset(token)
+    return {**output, "timings": collector.report()}
+
+async def _run_pipeline(question: str, on_event: Optional[EventCallback], priority: str, budget: Budget) -> dict:
     with tracer.start_as_current_span("run_pipeline"):
-        normalized_question = question.strip().lower()
-        cache_key = CACHE_PREFIX + normalized_question
+        cache_key = answer_cache.key_for(question)
+        if CACHE_PREWARM_TOP_N:
+            popularity.record(question)
 
-        cached = redis_client.get(cache_key)
+        cached = await answer_cache.get(question)
         if cached:
-            return json.loads(cached)
+            return cached
 
-        with tracer.start_as_current_span("generate_queries"):
-            TOOL_CALL_COUNT.labels("generate_queries").inc()
-            queries = generate_queries(question)
+        # A differently worded question with the same meaning may already be answered
+        if SEMANTIC_CACHE:
+            cached = await semantic_cache.get(question)
+            if cached:
+                return cached
 
-        with tracer.start_as_current_span("initial_web_search"):
-            TOOL_CALL_COUNT.labels("web_search").inc()
-            with TOOL_LATENCY.labels("web_search").time():
-                search_tool = WebSearchTool()
-                docs = await search_tool.run(queries)
+        # Identical questions already in flight in this worker await the same result;
+        # only the leader waits for a pipeline slot
+        output, shared = await single_flight.do(
+            cache_key, lambda: _run_admitted(question, cache_key, on_event, budget, priority)
+        )
+        if shared:
+            SINGLEFLIGHT_REQUESTS.labels("follower").inc()
+        return output
+
+async def stream_pipeline(question: str, **limits) -> AsyncIterator[dict]:
+    """
+    Runs the pipeline and yields its progress as {"event": ..., "data": ...} dicts:
+    "started" immediately, then the per-stage events, then "final" with the
+    citation-renumbered result (or "error").
 
-        rounds = 0
-        while rounds < MAX_REFLECTION_ROUNDS:
-            with tracer.start_as_current_span(f"reflect_round_{rounds+1}"):
-                TOOL_CALL_COUNT.labels("reflect").inc()
-                reflection = reflect(question, docs)
+    Keyword arguments (deadline, max_llm_calls, max_tokens, priority, timings) are passed to run_pipeline.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    yield {"event": "started", "data": {"question": question}}
 
-            if not reflection.get("need_more") or not reflection.get("new_queries"):
+    task = asyncio.ensure_future(run_pipeline(
+        question, on_event=lambda event, data: queue.put_nowait({"event": event, "data": data}), **limits
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
                 break
+            yield item
+        yield {"event": "final", "data": task.result()}
+    except Overloaded as e:
+        yield {"event": "error", "data": {"message": str(e), "retry_after": e.retry_after}}
+    except Exception as e:
+        yield {"event": "error", "data": {"message": str(e)}}
+    finally:
+        # The client went away: stop this request (coalesced work continues for others)
+        if not task.done():
+            task.cancel()
 
-            print(f"🔄 Reflection round {rounds+1}: need more info, expanding...")
-
-            with tracer.start_as_current_span(f"web_search_round_{rounds+1}"):
-                TOOL_CALL_COUNT.labels("web_search").inc()
-                with TOOL_LATENCY.labels("web_search").time():
-                    extra_docs = await search_tool.run(reflection["new_queries"])
-                    docs += extra_docs
-            rounds += 1
-
-        with tracer.start_as_current_span("synthesize"):
-            TOOL_CALL_COUNT.labels("synthesize").inc()
-            result = synthesize(question, docs)
-
-        # Normalize citations
-        matches = re.findall(r"\[(.*?)\]", result["answer"])
-        used_ids = set()
-        for m in matches:
-            for part in re.split(r"[,\s]+", m):
-                if part.isdigit():
-                    used_ids.add(int(part))
-        used_ids = sorted(used_ids)
-        id_map = {old: new for new, old in enumerate(used_ids, 1)}
-
-        def replace(match):
-            parts = match.group(1)
-            new_parts = []
-            for p in re.split(r"[,\s]+", parts):
-                if p.isdigit():
-                    new_parts.append(str(id_map.get(int(p), p)))
-            return f"[{', '.join(new_parts)}]"
-
-        final_answer = re.sub(r"\[(.*?)\]", replace, result["answer"])
-
-        final_citations = []
-        for citation in result["citations"]:
-            old_id = citation["id"]
-            if old_id in id_map:
-                final_citations.append({
-                    "id": id_map[old_id],
-                    "title": citation["title"],
-                    "url": citation["url"]
-                })
-
-        output = {
-            "status": "complete",
-            "answer": final_answer,
-            "citations": final_citations
-        }
-
-        redis_client.set(cache_key, json.dumps(output), ex=86400)
-
-        all_keys = redis_client.keys(f"{CACHE_PREFIX}*")
-        if len(all_keys) > CACHE_LIMIT:
-            for key in sorted(all_keys)[:-CACHE_LIMIT]:
-                redis_client.delete(key)
+async def _run_admitted(
+    question: str,
+    cache_key: str,
+    on_event: Optional[EventCallback],
+    budget: Budget,
+    priority: str,
+    lock_token: Optional[str] = None
+) -> dict:
+    async with admission.admit(priority):
+        return await _run_leader(question, cache_key, on_event, budget, lock_token)
 
-        return output
+async def _run_leader(
+    question: str,
+    cache_key: str,
+    on_event: Optional[EventCallback] = None,
+    budget: Optional[Budget] = None,
+    lock_token: Optional[str] = None
+) -> dict:
+    """
+    Runs the pipeline for the in-process leader. With SINGLEFLIGHT_REDIS_LOCK enabled,
+    first competes for the cross-worker lock (unless the caller already holds it,
+    `lock_token`) and, if another worker holds it, waits for that worker's result to
+    appear in the cache instead.
+    """
+    if not SINGLEFLIGHT_REDIS_LOCK:
+        SINGLEFLIGHT_REQUESTS.labels("leader").inc()
+        return await _run_uncached(question, on_event, budget)
+
+    token = lock_token if lock_token is not None else await redis_lock.acquire(cache_key)
+    while token is None:
+        await asyncio.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+        cached = await answer_cache.get(question, record_stats=False, local=False)
+        if cached:
+            SINGLEFLIGHT_REQUESTS.labels("remote_follower").inc()
+            return cached
+        # The holder may have failed or its lock expired; try to take over
+        token = await redis_lock.acquire(cache_key)
+
+    try:
+        SINGLEFLIGHT_REQUESTS.labels("leader").inc()
+        return await _run_uncached(question, on_event, budget)
+    finally:
+        await redis_lock.release(cache_key, token)
+
+def schedule_refresh(question: str, trigger: str = "stale") -> Optional[asyncio.Task]:
+    """
+    Starts refreshing the cached answer to `question` in the background, unless this
+    worker is already refreshing it. `trigger` ("stale" or "prewarm") labels the
+    cache_refreshes metric.
+
+    The refresh runs in a fresh context (its own trace, budget and timings), at
+    batch priority, coalesced with identical in-flight requests.
+    """
+    key = answer_cache.key_for(question)
+    if key in _refreshing:
+        CACHE_REFRESHES.labels(trigger, "skipped").inc()
+        return None
+    # Created inside an empty context (create_task's context= argument needs Python 3.11)
+    task = contextvars.Context().run(asyncio.get_running_loop().create_task, _refresh(question, key, trigger))
+    _refreshing[key] = task
+    task.add_done_callback(lambda _: _refreshing.pop(key, None))
+    return task
+
+async def _refresh(question: str, key: str, trigger: str):
+    # Other workers serving the same stale answer leave the refresh to the lock holder
+    token = await refresh_lock.acquire(key)
+    if token is None:
+        CACHE_REFRESHES.labels(trigger, "skipped").inc()
+        return
+    try:
+        outcome = await _recompute(question, key)
+    finally:
+        await refresh_lock.release(key, token)
+    CACHE_REFRESHES.labels(trigger, outcome).inc()
+
+async def _recompute(question: str, key: str) -> str:
+    """
+    Runs the pipeline for a refresh and returns its cache_refreshes outcome. Never
+    waits on another worker's run (SINGLEFLIGHT_REDIS_LOCK): that would only read
+    back the stale answer, so the refresh is skipped instead.
+    """
+    lock_token = None
+    if SINGLEFLIGHT_REDIS_LOCK:
+        lock_token = await redis_lock.acquire(key)
+        if lock_token is None:
+            return "skipped"
+    try:
+        await single_flight.do(key, lambda: _run_admitted(question, key, None, Budget(), "batch", lock_token))
+        return "refreshed"
+    except Overloaded:
+        return "shed"
+    except Exception as e:
+        logger.warning("⚠️ Refreshing the cached answer to %r failed: %r", question, e)
+        return "failed"
+    finally:
+        # A no-op when the run released it; frees it when the refresh joined a run already in flight
+        if lock_token:
+            await redis_lock.release(key, lock_token)
+
+async def prewarm(top_n: int = CACHE_PREWARM_TOP_N, horizon: float = CACHE_PREWARM_INTERVAL) -> List[str]:
+    """
+    Refreshes the cached answers of this worker's `top_n` most asked questions that
+    are missing or would go stale (expire, without a soft TTL) within `horizon` seconds.
+
+    Returns:
+        List[str]: The questions a refresh was started for.
+    """
+    questions = popularity.top(top_n)
+    stored = await answer_cache.stored_times(questions)
+    if not stored:
+        return []
+    lifetime = answer_cache.soft_ttl or answer_cache.ttl
+    now = time.time()
+    due = [q for q in questions if stored[q] is None or now - stored[q] >= lifetime - horizon]
+    return [q for q in due if schedule_refresh(q, "prewarm")]
+
+async def prewarm_popular(interval: float = CACHE_PREWARM_INTERVAL):
+    """
+    Runs prewarm every `interval` seconds until cancelled. Meant to be started once
+    per worker as a background task when CACHE_PREWARM_TOP_N is set.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await prewarm(horizon=interval)
+        except Exception as e:
+            logger.warning("⚠️ Cache prewarm pass failed: %r", e)
+
+class SpeculativeSynthesis:
+    """
+    A synthesize call started alongside reflect, before we know whether the docs
+    are sufficient.
+
+    `accept` returns its answer when reflection says no more searching is needed;
+    `discard` cancels it otherwise. The saved latency is the overlap between the
+    two calls: min(reflect finished, synthesize finished) - start.
+    """
+
+    def __init__(self, question: str, docs: list):
+        self.started = time.perf_counter()
+        self.finished = None
+        # Snapshot the docs so later changes by the caller cannot leak in
+        self.task = asyncio.ensure_future(self._run(question, list(docs)))
+        # Retrieve failures of discarded attempts so they are not reported as unhandled
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _run(self, question: str, docs: list) -> dict:
+        with stage("synthesize", span="speculative_synthesize"):
+            try:
+                return await synthesize(question, docs)
+            finally:
+                self.finished = time.perf_counter()
+
+    async def accept(self) -> dict:
+        reflect_done = time.perf_counter()
+        result = await self.task
+        SPECULATIVE_SYNTHESIS_CALLS.labels("used").inc()
+        SPECULATIVE_SAVED_SECONDS.observe(min(reflect_done, self.finished) - self.started)
+        return result
+
+    def discard(self):
+        # The Gemini call itself may still finish in its worker thread; either way it is wasted
+        self.task.cancel()
+        SPECULATIVE_SYNTHESIS_CALLS.labels("wasted").inc()
+
+async def _fetch_pages(question: str, docs: List[Document], slots: Optional[list], span: str, budget: Budget) -> List[Document]:
+    """
+    With PAGE_FETCH enabled, attaches page passages to the top documents that have
+    none yet, if that still fits before the deadline.
+    """
+    if not PAGE_FETCH or not budget.fits(["fetch_pages"], record=False):
+        return docs
+    with stage("fetch_pages", span=span):
+        started = time.perf_counter()
+        docs = await page_fetcher.enrich(question, docs, slots)
+        stage_estimates.observe("fetch_pages", time.perf_counter() - started)
+    return docs
+
+async def _search(search_tool, queries: list, on_result: Callable, budget: Budget) -> list:
+    """
+    Runs one search round. When synthesize has to start before the round finishes,
+    stops waiting and returns the results that already arrived.
+    """
+    arrived = []
+
+    def collect(query, results):
+        arrived.extend(results)
+        on_result(query, results)
+
+    started = time.perf_counter()
+    try:
+        docs = await asyncio.wait_for(
+            search_tool.run(queries, on_result=collect), timeout=budget.time_before_synthesis()
+        )
+    except asyncio.TimeoutError:
+        budget.cut()
+        return arrived
+    stage_estimates.observe("search", time.perf_counter() - started)
+    return docs
+
+class PipelineState(TypedDict, total=False):
+    """
+    State of one pipeline run, checkpointed after every step. Documents are kept as
+    plain dicts so checkpoints stay plain data.
+    """
+    question: str
+    # Queries of the current search round, and the round (0 = initial search)
+    queries: List[str]
+    round: int
+    # Every query searched so far, for the query planner
+    searched: List[str]
+    # Results of the current search round, until reflect or synthesize merges them
+    found: list
+    # Documents gathered so far, without duplicates
+    docs: list
+    slots: Optional[list]
+    # "search", "synthesize" or END, decided by reflect
+    route: str
+    result: dict
+
+def _documents(items: list) -> List[Document]:
+    return [Document(**item) for item in items]
+
+def _dicts(docs: List[Document]) -> list:
+    return [doc._asdict() for doc in docs]
+
+def _on_event(config: RunnableConfig) -> Optional[EventCallback]:
+    # Callbacks travel in the run config, never in the checkpointed state
+    return config["configurable"].get("on_event")
+
+def _gathered(state: PipelineState, config: RunnableConfig) -> DocumentPool:
+    # Every round's results go through one pool, so URLs and near-duplicate snippets are kept once.
+    # The pool lives for the run only; the checkpointed "docs" mirror its documents
+    pool = config["configurable"]["pool"]
+    pool.add(_documents(state.get("found", [])))
+    return pool
+
+async def _generate_queries_node(state: PipelineState, config: RunnableConfig) -> dict:
+    with stage("generate_queries"):
+        queries = await generate_queries(state["question"])
+    # Near-identical queries are searched once, at most QUERY_MAX_PER_ROUND of them
+    planner = QueryPlanner()
+    queries = planner.plan(queries)
+    _emit(_on_event(config), "queries", queries=queries)
+    return {"queries": queries, "round": 0, "searched": planner.searched}
+
+async def _extract_slots_node(state: PipelineState) -> dict:
+    # Slots depend only on the question: resolve them once for all reflection rounds,
+    # alongside generate_queries. A budget too tight for a separate extraction call leaves it to reflect
+    question = state["question"]
+    if REFLECT_FOLD_SLOTS or not current_budget.get().fits(["reflect"], llm_calls=2, record=False):
+        return {"slots": await get_cached_slots(question)}
+    with stage("extract_slots"):
+        return {"slots": await extract_slots_llm(question)}
+
+def _after_search(state: PipelineState) -> str:
+    return "reflect" if state["round"] < MAX_REFLECTION_ROUNDS else "synthesize"
+
+def _after_queries(state: PipelineState) -> str:
+    return "search" if state["queries"] else _after_search(state)
+
+async def _search_node(state: PipelineState, config: RunnableConfig) -> dict:
+    # The round's queries run concurrently inside WebSearchTool, each reported as it resolves
+    on_event = _on_event(config)
+
+    def on_search_result(query, results):
+        _emit(on_event, "search_results", query=query, documents=_dicts(results))
+
+    span = "initial_web_search" if state["round"] == 0 else f"web_search_round_{state['round']}"
+    with stage("web_search", span=span):
+        docs = await _search(WebSearchTool(), state["queries"], on_search_result, current_budget.get())
+    return {"found": _dicts(docs)}
+
+async def _reflect_node(state: PipelineState, config: RunnableConfig) -> dict:
+    question, rounds, slots = state["question"], state["round"], state.get("slots")
+    on_event = _on_event(config)
+    budget = current_budget.get()
+
+    pool = _gathered(state, config)
+    pool.docs = await _fetch_pages(question, pool.docs, slots, f"fetch_pages_round_{rounds+1}", budget)
+    update = {"docs": _dicts(pool.docs), "found": [], "route": "synthesize"}
+    # The most relevant documents that fit the prompt budget
+    context = select_context(question, pool.docs, slots)
+    context_tokens = sum(document_tokens(doc) for doc in context)
+    # Cheap local check of slot coverage; may stand in for the reflect call
+    coverage = precheck(question, context, slots)
+    skip_reflect = can_skip_reflect(coverage)
+
+    if skip_reflect:
+        reflection = heuristic_reflection(question, slots, coverage)
+        speculative = None
+    else:
+        # Another reflect call must leave room (time, calls, tokens) for synthesize
+        reflect_tokens = REFLECT_OVERHEAD_TOKENS + context_tokens
+        if not budget.fits(["reflect"], llm_calls=1, tokens=reflect_tokens, synthesis_tokens=context_tokens):
+            return update
+        speculative = None
+        if SPECULATIVE_SYNTHESIS and budget.fits(
+            ["reflect"], llm_calls=2, tokens=reflect_tokens + SYNTHESIZE_OVERHEAD_TOKENS + context_tokens,
+            synthesis_tokens=context_tokens, record=False
+        ):
+            speculative = SpeculativeSynthesis(question, context)
+        try:
+            with stage("reflect", span=f"reflect_round_{rounds+1}"):
+                started = time.perf_counter()
+                reflection = await reflect(question, context, slots=slots, fold_slots=True)
+                stage_estimates.observe("reflect", time.perf_counter() - started)
+        except BaseException:
+            if speculative:
+                speculative.discard()
+            raise
+        record_agreement(coverage, reflection)
+
+    if slots is None:
+        # Folded extraction: keep the slots reflect determined for later rounds and requests
+        slots = [slot for slot in reflection.get("slots", []) if isinstance(slot, str)]
+        if slots:
+            await store_slots(question, slots)
+        update["slots"] = slots
+
+    _emit(
+        on_event, "reflection",
+        round=rounds + 1,
+        need_more=bool(reflection.get("need_more")),
+        filled=reflection.get("filled", []),
+        new_queries=reflection.get("new_queries", []),
+        source="heuristic" if skip_reflect else "llm"
+    )
+
+    # Queries already searched (or close to them) would only find the same documents
+    planner = QueryPlanner(state.get("searched", []))
+    queries = planner.plan(reflection.get("new_queries") or []) if reflection.get("need_more") else []
+    if not queries or not budget.fits(["search"]):
+        # No further search round will run: the speculative answer covers the same documents
+        if speculative:
+            result = await speculative.accept()
+            # The speculative answer was not streamed; send it as one chunk
+            _emit(on_event, "answer_delta", text=result.get("answer", ""))
+            return {**update, "result": result, "route": END}
+        return update
+
+    if speculative:
+        speculative.discard()
+
+    logger.info("🔄 Reflection round %d: need more info, expanding...", rounds + 1)
+    return {**update, "queries": queries, "round": rounds + 1, "searched": planner.searched, "route": "search"}
+
+def _after_reflect(state: PipelineState) -> str:
+    return state["route"]
+
+async def _synthesize_node(state: PipelineState, config: RunnableConfig) -> dict:
+    question, slots = state["question"], state.get("slots")
+    on_event = _on_event(config)
+    pool = _gathered(state, config)
+    # Documents from the last search round have not been fetched yet
+    docs = await _fetch_pages(question, pool.docs, slots, "fetch_pages_final", current_budget.get())
+    # Always runs, whatever is left of the budget: answer from the documents gathered so far
+    with stage("synthesize"):
+        on_token = (lambda text: _emit(on_event, "answer_delta", text=text)) if on_event else None
+        started = time.perf_counter()
+        result = await synthesize(question, select_context(question, docs, slots), on_token=on_token)
+        stage_estimates.observe("synthesize", time.perf_counter() - started)
+    return {"result": result}
+
+def build_graph() -> StateGraph:
+    """
+    The pipeline as a graph:
+
+        generate_queries ─┬─ search ─ reflect ─┬─ synthesize
+        extract_slots ────┘    ↑_ more queries _┘
+
+    generate_queries and extract_slots run concurrently. search runs the queries of a
+    round concurrently; reflect (or synthesize, after the last round) merges their
+    results. reflect loops back to search while it wants more documents (at most
+    MAX_REFLECTION_ROUNDS rounds, within the budget), or ends the run when its
+    speculative answer was accepted.
+    """
+    graph = StateGraph(PipelineState)
+    graph.add_node("generate_queries", _generate_queries_node)
+    graph.add_node("extract_slots", _extract_slots_node)
+    graph.add_node("search", _search_node)
+    graph.add_node("reflect", _reflect_node)
+    graph.add_node("synthesize", _synthesize_node)
+
+    graph.add_edge(START, "generate_queries")
+    graph.add_edge(START, "extract_slots")
+    graph.add_conditional_edges("generate_queries", _after_queries, ["search", "reflect", "synthesize"])
+    graph.add_conditional_edges("search", _after_search, ["reflect", "synthesize"])
+    graph.add_conditional_edges("reflect", _after_reflect, ["search", "synthesize", END])
+    graph.add_edge("synthesize", END)
+    return graph
+
+_graph = build_graph().compile()
+_checkpointed_graph = build_graph().compile(checkpointer=RedisCheckpointSaver()) if PIPELINE_CHECKPOINTS else None
+
+async def _renew_lease(thread_id: str, token: str):
+    # Heartbeat: keeps the lease while the run is alive, so only a crashed run's lease lapses
+    while True:
+        await asyncio.sleep(PIPELINE_CHECKPOINT_LEASE / 3)
+        if not await checkpoint_lease.extend(thread_id, token):
+            logger.warning("⚠️ Lost the checkpoint lease of %r", thread_id)
+            return
+
+async def _run_graph(question: str, on_event: Optional[EventCallback]) -> dict:
+    pool = DocumentPool()
+    plain_config = {"configurable": {"on_event": on_event, "pool": pool}}
+    if _checkpointed_graph is None:
+        return (await _graph.ainvoke({"question": question}, plain_config))["result"]
+
+    # Checkpoints are per question: a retry after a crash or timeout resumes where the failed run stopped
+    thread_id = answer_cache.key_for(question)
+    token = await checkpoint_lease.acquire(thread_id)
+    if token is None:
+        # Another run of this question (on this or another worker) is still going and owns
+        # the checkpoints: answer without them rather than resume or overwrite its state
+        return (await _graph.ainvoke({"question": question}, plain_config))["result"]
+
+    heartbeat = asyncio.create_task(_renew_lease(thread_id, token))
+    try:
+        config = {"configurable": {"thread_id": thread_id, **plain_config["configurable"]}}
+        snapshot = await _checkpointed_graph.aget_state(config)
+        if snapshot.next:
+            PIPELINE_RESUMES.inc()
+            logger.info("♻️ Resuming pipeline for %r before %s", question, ", ".join(snapshot.next))
+            pool.add(_documents(snapshot.values.get("docs", [])))
+            state = await _checkpointed_graph.ainvoke(None, config)
+        else:
+            if snapshot.values:
+                await _checkpointed_graph.checkpointer.adelete_thread(thread_id)
+            state = await _checkpointed_graph.ainvoke({"question": question}, config)
+        # The answer cache takes over from here
+        await _checkpointed_graph.checkpointer.adelete_thread(thread_id)
+        return state["result"]
+    finally:
+        heartbeat.cancel()
+        await checkpoint_lease.release(thread_id, token)
+
+async def _run_uncached(
+    question: str,
+    on_event: Optional[EventCallback] = None,
+    budget: Optional[Budget] = None
+) -> dict:
+    # LLM calls made by this run (and the tasks it starts) are charged to its budget
+    budget = budget or Budget()
+    current_budget.set(budget)
+
+    result = await _run_graph(question, on_event)
+
+    # synthesize already renumbered the citations (agent.utils.citations)
+    output = {
+        "status": "complete",
+        "answer": result["answer"],
+        "citations": result["citations"]
+    }
+
+    await answer_cache.set(question, output)
+    if SEMANTIC_CACHE:
+        semantic_cache.add(question)
+
+    # Per-request usage is reported to this caller but never cached
+    if budget.limited:
+        output = {**output, "budget": budget.report()}
 
+    return output
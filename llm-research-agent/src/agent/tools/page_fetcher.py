@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import codecs
+import asyncio
+import logging
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from agent.types.document import Document
+from agent.utils.http_client import get_http_client
+from agent.utils.local_cache import LocalLRU
+from agent.utils.metrics import PAGE_FETCHES, PAGE_FETCH_BYTES
+from agent.utils.retrieval import STOPWORDS, bm25_scores, rank_documents, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Fetch the top result pages and attach their most relevant passages to the documents
+PAGE_FETCH = os.getenv("PAGE_FETCH", "false").lower() == "true"
+
+# Pages fetched per round (the highest-ranked documents not fetched yet)
+PAGE_FETCH_TOP_K = int(os.getenv("PAGE_FETCH_TOP_K", "3"))
+
+# Strict per-page budgets: body bytes read, and seconds including the wait for a host slot
+PAGE_FETCH_MAX_BYTES = int(os.getenv("PAGE_FETCH_MAX_BYTES", str(256 * 1024)))
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "3"))
+
+# Concurrent page requests per host, per process
+PAGE_FETCH_PER_HOST = int(os.getenv("PAGE_FETCH_PER_HOST", "2"))
+
+# Passages attached per document and their approximate length in words
+PAGE_PASSAGES = int(os.getenv("PAGE_PASSAGES", "2"))
+PAGE_PASSAGE_WORDS = int(os.getenv("PAGE_PASSAGE_WORDS", "80"))
+
+# Extracted page text is reused for this many seconds, then revalidated with
+# If-None-Match / If-Modified-Since; entries are dropped after PAGE_CACHE_TTL
+PAGE_CACHE_FRESH = float(os.getenv("PAGE_CACHE_FRESH", "600"))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "86400"))
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "512"))
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+_CHARSET_RE = re.compile(r"charset=([\w-]+)", re.IGNORECASE)
+
+
+class TextExtractor(HTMLParser):
+    """
+    Incremental HTML → readable text. Feed it the page in pieces; text inside
+    scripts, styles and page chrome (nav, header, footer, forms...) is skipped and
+    block elements become paragraph breaks.
+    """
+
+    SKIP = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe", "head"}
+    BLOCK = {"p", "div", "section", "article", "main", "br", "li", "ul", "ol", "table", "tr", "td", "th",
+             "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "figcaption"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._paragraphs: List[str] = []
+        self._current: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in self.BLOCK:
+            self._break()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK:
+            self._break()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def _break(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self._paragraphs.append(text)
+        self._current = []
+
+    def paragraphs(self) -> List[str]:
+        """
+        Closes the parser and returns the text as a list of paragraphs.
+        """
+        self.close()
+        self._break()
+        return self._paragraphs
+
+
+def chunk_paragraphs(paragraphs: List[str], words: int = PAGE_PASSAGE_WORDS) -> List[str]:
+    """
+    Groups paragraphs into passages of roughly `words` words; longer paragraphs are split.
+    """
+    chunks, current = [], []
+    for paragraph in paragraphs:
+        tokens = paragraph.split()
+        while len(tokens) > words:
+            if current:
+                chunks.append(" ".join(current))
+                current = []
+            chunks.append(" ".join(tokens[:words]))
+            tokens = tokens[words:]
+        if len(current) + len(tokens) > words and current:
+            chunks.append(" ".join(current))
+            current = []
+        current += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def best_passages(query: List[str], chunks: List[str], limit: int = PAGE_PASSAGES) -> Optional[str]:
+    """
+    The `limit` chunks with the highest BM25 score for the query tokens, in page order,
+    or None when no chunk mentions the query at all.
+    """
+    scores = bm25_scores(query, [tokenize(chunk) for chunk in chunks])
+    best = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])[:limit]
+    return " … ".join(chunks[i] for i in sorted(best)) or None
+
+
+class PageFetcher:
+    """
+    Fetches result pages concurrently and attaches their most relevant passages to
+    the documents (`Document.content`), so reflect and synthesize see more than the
+    CSE snippet.
+
+    Bodies are streamed through an incremental HTML parser and reading stops at
+    `max_bytes`; each page, including the wait for one of the `per_host` slots of its
+    host, must finish within `timeout` seconds or is skipped. Extracted text is cached
+    per URL and revalidated with the page's ETag / Last-Modified once stale.
+    """
+
+    def __init__(
+        self,
+        top_k: int = PAGE_FETCH_TOP_K,
+        max_bytes: int = PAGE_FETCH_MAX_BYTES,
+        timeout: float = PAGE_FETCH_TIMEOUT,
+        per_host: int = PAGE_FETCH_PER_HOST,
+        passages: int = PAGE_PASSAGES,
+        passage_words: int = PAGE_PASSAGE_WORDS,
+        fresh: float = PAGE_CACHE_FRESH,
+        cache: Optional[LocalLRU] = None
+    ):
+        self.top_k = top_k
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.per_host = per_host
+        self.passages = passages
+        self.passage_words = passage_words
+        self.fresh = fresh
+        self.cache = cache if cache is not None else LocalLRU(PAGE_CACHE_SIZE, PAGE_CACHE_TTL)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._slots_loop = None
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        # asyncio.Semaphore is bound to one event loop; start over if the loop changes
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._host_slots = {}
+            self._slots_loop = loop
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._host_slots[host]
+
+    async def enrich(self, question: str, docs: List[Document], slots: Optional[List[str]] = None) -> List[Document]:
+        """
+        Fetches the `top_k` most relevant documents that have no content yet and
+        attaches their best passages for the question.
+
+        Args:
+            question (str): The user's question; with the slots, it picks the passages.
+            docs (List[Document]): Candidate documents.
+            slots (List[str], optional): Information slots; their words join the query.
+
+        Returns:
+            List[Document]: `docs` in the same order, fetched ones with `content` set.
+        """
+        query = [token for token in tokenize(question) if token not in STOPWORDS]
+        for slot in slots or []:
+            query += tokenize(slot)
+
+        pending = [doc for doc in rank_documents(question, docs, slots) if doc.content is None][:self.top_k]
+        texts = await asyncio.gather(*[self.fetch_text(doc.url) for doc in pending])
+
+        content = {}
+        for doc, paragraphs in zip(pending, texts):
+            if paragraphs:
+                passages = best_passages(query, chunk_paragraphs(paragraphs, self.passage_words), self.passages)
+                if passages:
+                    content[doc.url] = passages
+        return [doc._replace(content=content[doc.url]) if doc.url in content else doc for doc in docs]
+
+    async def fetch_text(self, url: str) -> Optional[List[str]]:
+        """
+        Returns the page's text as paragraphs, from the cache when fresh, or None if
+        the page could not be fetched within the budgets or is not HTML/text.
+        """
+        try:
+            # Search results can carry malformed links (e.g. "http://[::1/"): they fail like any fetch
+            parts = urlsplit(url or "")
+            if parts.scheme not in ("http", "https") or not parts.netloc:
+                return None
+
+            entry = self.cache.get(url)
+            if entry is not None and time.monotonic() - entry["checked"] < self.fresh:
+                PAGE_FETCHES.labels("cached").inc()
+                return entry["paragraphs"]
+
+            return await asyncio.wait_for(self._fetch(url, parts.netloc.lower(), entry), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            PAGE_FETCHES.labels("timeout").inc()
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError, LookupError) as e:
+            logger.warning(f"⚠️ Page fetch failed for {url}: {e!r}")
+            PAGE_FETCHES.labels("error").inc()
+        return None
+
+    async def _fetch(self, url: str, host: str, entry: Optional[dict]) -> Optional[List[str]]:
+        headers = {"Accept": "text/html,application/xhtml+xml;q=0.9,text/plain;q=0.8"}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        async with self._slot(host):
+            async with get_http_client().stream("GET", url, headers=headers, follow_redirects=True) as resp:
+                if resp.status_code == 304 and entry is not None:
+                    PAGE_FETCHES.labels("not_modified").inc()
+                    entry["checked"] = time.monotonic()
+                    self.cache.set(url, entry)
+                    return entry["paragraphs"]
+                resp.raise_for_status()
+
+                content_type = resp.headers.get("Content-Type", "text/html")
+                if not content_type.lower().startswith(_HTML_TYPES):
+                    PAGE_FETCHES.labels("skipped").inc()
+                    return None
+                match = _CHARSET_RE.search(content_type)
+                decoder = codecs.getincrementaldecoder(match.group(1) if match else "utf-8")(errors="replace")
+
+                extractor = TextExtractor()
+                received = 0
+                async for chunk in resp.aiter_bytes():
+                    chunk = chunk[:self.max_bytes - received]
+                    received += len(chunk)
+                    extractor.feed(decoder.decode(chunk))
+                    if received >= self.max_bytes:
+                        # Byte budget spent: keep what was parsed, drop the rest of the body
+                        break
+                extractor.feed(decoder.decode(b"", final=True))
+                PAGE_FETCH_BYTES.inc(received)
+
+        paragraphs = extractor.paragraphs()
+        PAGE_FETCHES.labels("fetched").inc()
+        self.cache.set(url, {
+            "paragraphs": paragraphs,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "checked": time.monotonic()
+        })
+        return paragraphs
+
+
+page_fetcher = PageFetcher()
@@ -1,36 +1,163 @@
 import httpx
 import os
-from typing import List
+import logging
+from typing import Callable, List, Optional
 import asyncio
 
 from agent.types.document import Document
+from agent.utils.http_client import get_http_client, backoff_delay, retry_after_seconds, hedged
+from agent.utils.rate_limit import TokenBucket
+from agent.utils.search_cache import SearchCache, search_cache, query_key
+from agent.utils.document_store import DocumentStore, document_store
+from agent.utils.singleflight import SingleFlight
+from agent.utils.metrics import CACHE_HITS
+from agent.utils.instrumentation import record_retry
+
+logger = logging.getLogger(__name__)
 
 # Load Google API credentials from environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")
+
+# Per-attempt timeout and overall deadline (including retries) for one query, in seconds
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "5"))
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "15"))
+
+# Retries on 429/5xx and transport errors, with jittered exponential back-off
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Start a duplicate request if the first has not answered after this many seconds (0 = off)
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "0"))
+
+# CSE requests per second (and burst size) shared by all pipelines in this process
+CSE_RATE_LIMIT = float(os.getenv("CSE_RATE_LIMIT", "10"))
+CSE_RATE_BURST = float(os.getenv("CSE_RATE_BURST", "10"))
+
+cse_rate_limiter = TokenBucket(rate=CSE_RATE_LIMIT, capacity=CSE_RATE_BURST)
+
+# Near-identical queries from concurrent pipelines (e.g. a batch) share one lookup
+query_flight = SingleFlight()
+
+# Process-wide search provider override (e.g. record/replay, see agent.utils.replay)
+_search_provider = None
+
+
+def get_search_provider():
+    """
+    Returns the search provider installed with set_search_provider, or None
+    when searches go straight to Google CSE.
+    """
+    return _search_provider
+
+
+def set_search_provider(provider) -> None:
+    """
+    Routes every WebSearchTool's per-query lookups through `provider`, any object
+    with an async `search(query) -> List[Document]` method. Pass None to go back
+    to Google CSE.
+    """
+    global _search_provider
+    _search_provider = provider
 
 class WebSearchTool:
     """
     A web search tool that uses the Google Custom Search API to retrieve relevant documents
     based on a list of queries. Results are deduplicated based on the URL.
+
+    Per-query results are cached (see SearchCache), so only queries that miss the
+    cache are sent to Google CSE. Requests go through the process-wide pooled HTTP
+    client and CSE rate limiter, are retried on 429/5xx, and are bounded by a deadline.
+
+    Cache misses are answered from the local document store when it holds enough
+    fresh matches (see DocumentStore), and otherwise looked up through `provider`
+    when given, else through the process-wide provider (see set_search_provider),
+    else through CSE via `search`. Everything fetched is ingested into the store.
+
+    Near-identical queries (same content words, see query_key) are sent once, both
+    within a call and across concurrent calls in this process.
     """
 
-    async def run(self, queries: List[str]) -> List[Document]:
+    def __init__(
+        self,
+        cache: Optional[SearchCache] = search_cache,
+        endpoint: str = GOOGLE_CSE_URL,
+        rate_limiter: TokenBucket = cse_rate_limiter,
+        provider=None,
+        store: Optional[DocumentStore] = document_store
+    ):
+        self.cache = cache
+        self.store = store
+        self.endpoint = endpoint
+        self.rate_limiter = rate_limiter
+        self.provider = provider
+
+    async def run(
+        self,
+        queries: List[str],
+        on_result: Optional[Callable[[str, List[Document]], None]] = None
+    ) -> List[Document]:
         """
         Executes web search for a list of queries concurrently and returns a flattened
         list of unique documents.
 
         Args:
             queries (List[str]): Search queries to run.
+            on_result (Callable, optional): Called with (query, documents) as soon as
+                each query resolves, from the cache or from CSE.
 
         Returns:
             List[Document]: A list of unique search result documents.
         """
-        # Perform all search queries in parallel using asyncio.gather
-        async with httpx.AsyncClient() as client:
-            responses = await asyncio.gather(*[
-                self._search(client, query) for query in queries
-            ])
+        # Collapse near-identical queries; keep the first spelling
+        unique = {}
+        for query in queries:
+            unique.setdefault(query_key(query), query)
+        queries = list(unique.values())
+
+        cached = await self.cache.get_many(queries) if self.cache else {}
+        misses = [query for query in queries if query not in cached]
+        if misses and self.store:
+            # Prior crawls may already cover the query; only go to CSE when they do not
+            cached.update(await self.store.search_many(misses))
+            misses = [query for query in queries if query not in cached]
+        if on_result:
+            for query, docs in cached.items():
+                on_result(query, docs)
+
+        # Perform all remaining search queries in parallel using asyncio.gather
+        fetched = {}
+        if misses:
+            provider = self.provider or _search_provider or self
+            # Tools created per pipeline run all share the CSE endpoint
+            scope = self.endpoint if provider is self else id(provider)
+
+            async def fetch(query: str):
+                try:
+                    result, shared = await query_flight.do(
+                        f"{scope}|{query_key(query)}",
+                        lambda: asyncio.wait_for(provider.search(query), timeout=SEARCH_DEADLINE)
+                    )
+                    if shared:
+                        CACHE_HITS.labels("search", "inflight").inc()
+                except Exception as e:
+                    # Failures are treated as "no results" but never cached
+                    logger.warning(f"⚠️ Web search failed for {query!r}: {e!r}")
+                    result = None
+                if on_result:
+                    on_result(query, result or [])
+                if result is not None:
+                    fetched[query] = result
+
+            await asyncio.gather(*[fetch(query) for query in misses])
+
+            if self.cache:
+                await self.cache.set_many(fetched)
+            if self.store:
+                await self.store.ingest(doc for docs in fetched.values() for doc in docs)
+
+        responses = [cached.get(query) or fetched.get(query, []) for query in queries]
 
         # Step 1: Flatten results from all queries
         # Step 2: Deduplicate by URL
@@ -44,9 +171,29 @@ class WebSearchTool:
 
         return docs
 
+    async def search(self, query: str) -> List[Document]:
+        """
+        Runs one query against Google CSE, bypassing the cache and any installed provider.
+
+        Args:
+            query (str): A single search query string.
+
+        Returns:
+            List[Document]: Search result items converted to Document format.
+        """
+        return await self._search(get_http_client(), query)
+
+    async def _get(self, client: httpx.AsyncClient, params: dict) -> httpx.Response:
+        """
+        One rate-limited request attempt.
+        """
+        await self.rate_limiter.acquire()
+        return await client.get(self.endpoint, params=params, timeout=SEARCH_TIMEOUT)
+
     async def _search(self, client: httpx.AsyncClient, query: str) -> List[Document]:
         """
-        Internal method to perform a single Google Custom Search request.
+        Internal method to perform a single Google Custom Search request,
+        retrying rate-limited (429), 5xx and transport failures.
 
         Args:
             client (httpx.AsyncClient): Shared async HTTP client.
@@ -55,15 +202,36 @@ class WebSearchTool:
         Returns:
             List[Document]: Search result items converted to Document format.
         """
-        url = "https://www.googleapis.com/customsearch/v1"
         params = {
             "key": GOOGLE_API_KEY,
             "cx": GOOGLE_CSE_ID,
             "q": query
         }
 
-        # Call Google Search API
-        resp = await client.get(url, params=params)
+        # Call Google Search API; error responses raise instead of looking like "no results"
+        attempt = 0
+        while True:
+            try:
+                resp = await hedged(lambda: self._get(client, params), SEARCH_HEDGE_DELAY)
+            except httpx.TransportError:
+                if attempt >= SEARCH_MAX_RETRIES:
+                    raise
+                record_retry()
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code in RETRY_STATUSES and attempt < SEARCH_MAX_RETRIES:
+                # Honour the server's Retry-After when it sends one
+                record_retry()
+                delay = retry_after_seconds(resp)
+                await asyncio.sleep(delay if delay is not None else backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            resp.raise_for_status()
+            break
+
         data = resp.json()
 
         # Convert each search result item to a Document object
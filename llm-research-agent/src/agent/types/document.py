@@ -1,4 +1,4 @@
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 class Document(NamedTuple):
     """
@@ -8,7 +8,10 @@ class Document(NamedTuple):
         title (str): The title of the document or web page.
         snippet (str): A short excerpt or summary describing the content.
         url (str): The full URL to the original source.
+        content (str, optional): The passages of the fetched page most relevant to
+            the question (see PageFetcher); None when the page was not fetched.
     """
     title: str
     snippet: str
     url: str
+    content: Optional[str] = None
@@ -0,0 +1,166 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from agent.utils.metrics import (
+    ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT, ADMISSION_REJECTED
+)
+
+# Pipelines allowed to run at once per worker (0 = unlimited); cache hits and
+# requests coalesced onto an in-flight question never take a slot
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+
+# Requests allowed to wait for a slot; further ones are rejected right away
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+
+# Seconds a request may wait for a slot before it is rejected
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+
+# Priority classes, most urgent first: a free slot always goes to the most urgent waiter
+PRIORITIES = ("interactive", "batch")
+
+# Weight of the newest pipeline duration in the estimate behind Retry-After
+_SERVICE_ALPHA = 0.2
+_DEFAULT_SERVICE_SECONDS = 5.0
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is not admitted: the queue is full or the wait for a slot
+    took too long. `retry_after` is a suggested delay in whole seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number of pipelines running at once in this worker.
+
+    Requests over the limit wait in a priority queue (FIFO within a class); a
+    finishing pipeline hands its slot straight to the most urgent waiter. Requests
+    are shed with Overloaded when `max_queue` are already waiting or when no slot
+    frees up within `max_wait` seconds, so a burst fails fast instead of piling LLM
+    calls onto a rate-limited provider.
+
+    Args:
+        max_in_flight (int): Concurrent pipelines (0 = unlimited).
+        max_queue (int): Requests allowed to wait.
+        max_wait (float): Seconds a request may wait for a slot.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: List[list] = []
+        self._queued: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._seq = itertools.count()
+        self._service_seconds = _DEFAULT_SERVICE_SECONDS
+
+    def queued(self) -> int:
+        """
+        Returns the number of requests waiting for a slot.
+        """
+        return sum(self._queued.values())
+
+    def saturated(self) -> bool:
+        """
+        Whether a new request would be rejected right away (every slot busy and the queue full).
+        """
+        return bool(self.max_in_flight) and self.in_flight >= self.max_in_flight and self.queued() >= self.max_queue
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the current queue should have drained, from the recent pipeline durations.
+        """
+        slots = max(1, self.max_in_flight)
+        return max(1, math.ceil((self.queued() / slots + 1) * self._service_seconds))
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "interactive") -> AsyncIterator[None]:
+        """
+        Holds a pipeline slot for the duration of the block, waiting for one if needed.
+
+        Raises:
+            Overloaded: The queue is full or no slot freed up within `max_wait` seconds.
+        """
+        if priority not in self._queued:
+            raise ValueError(f"Unknown priority: {priority}")
+        await self._acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_seconds += _SERVICE_ALPHA * (elapsed - self._service_seconds)
+            self._release()
+
+    async def _acquire(self, priority: str):
+        if not self.max_in_flight or self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.inc()
+            ADMISSION_QUEUE_WAIT.labels(priority).observe(0)
+            return
+
+        if self.queued() >= self.max_queue:
+            self.reject(priority)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [PRIORITIES.index(priority), next(self._seq), waiter])
+        self._queued[priority] += 1
+        ADMISSION_QUEUE_DEPTH.labels(priority).inc()
+        started = time.monotonic()
+        try:
+            # asyncio.wait leaves the future alone on timeout, so a slot handed
+            # over at the last moment is never lost
+            await asyncio.wait({waiter}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot arrived as the caller went away: pass it on
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            self._queued[priority] -= 1
+            ADMISSION_QUEUE_DEPTH.labels(priority).dec()
+            ADMISSION_QUEUE_WAIT.labels(priority).observe(time.monotonic() - started)
+
+        if not waiter.done():
+            waiter.cancel()
+            self.reject(priority, "timeout")
+
+    def reject(self, priority: str, reason: str = "queue_full"):
+        """
+        Counts a shed request and raises Overloaded for it.
+        """
+        ADMISSION_REJECTED.labels(priority, reason).inc()
+        raise Overloaded(reason.replace("_", " "), self.retry_after())
+
+    def _release(self):
+        # Hand the slot to the most urgent live waiter; cancelled ones are skipped
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+
+
+admission = AdmissionController()
@@ -0,0 +1,189 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+
+from agent.utils.metrics import PIPELINE_BUDGET_STOPS
+from agent.utils.retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+# Defaults for requests that do not set their own limits (0 = no limit)
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "0"))
+PIPELINE_MAX_LLM_CALLS = int(os.getenv("PIPELINE_MAX_LLM_CALLS", "0"))
+PIPELINE_MAX_TOKENS = int(os.getenv("PIPELINE_MAX_TOKENS", "0"))
+
+# Weight of the newest observation in the per-stage latency estimates
+STAGE_ESTIMATE_ALPHA = 0.2
+
+# Starting latency estimates (seconds) until stages have been observed
+_DEFAULT_ESTIMATES = {"search": 1.5, "fetch_pages": 1.0, "reflect": 2.0, "synthesize": 3.0}
+
+# Estimated tokens of a reflect / synthesize call beyond its documents (prompt template + reply)
+REFLECT_OVERHEAD_TOKENS = 400
+SYNTHESIZE_OVERHEAD_TOKENS = 400
+
+
+class StageEstimates:
+    """
+    Exponentially weighted moving averages of stage latencies in this process, used
+    to decide whether a stage still fits before the deadline.
+    """
+
+    def __init__(self, alpha: float = STAGE_ESTIMATE_ALPHA):
+        self.alpha = alpha
+        self._seconds: Dict[str, float] = dict(_DEFAULT_ESTIMATES)
+
+    def observe(self, stage: str, seconds: float):
+        previous = self._seconds.get(stage)
+        self._seconds[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def get(self, stage: str) -> float:
+        return self._seconds.get(stage, 0.0)
+
+
+stage_estimates = StageEstimates()
+
+
+class Budget:
+    """
+    Latency deadline and LLM call/token ceiling of one pipeline run.
+
+    LLM usage is metered by BudgetedLLM while the budget is the run's `current_budget`.
+    The pipeline asks `fits` before each optional stage. One synthesize call (its
+    estimated time, one call and its tokens) is always held back, so an answer can be
+    written from whatever documents have been gathered.
+
+    Args:
+        deadline (float, optional): Seconds the run may take (None/0 = no deadline).
+        max_llm_calls (int, optional): LLM calls the run may make (None/0 = no limit).
+        max_tokens (int, optional): Estimated prompt + response tokens (None/0 = no limit).
+    """
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        max_llm_calls: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        estimates: StageEstimates = stage_estimates
+    ):
+        self.started = time.monotonic()
+        self.deadline = deadline or None
+        self.max_llm_calls = max_llm_calls or None
+        self.max_tokens = max_tokens or None
+        self.estimates = estimates
+        self.llm_calls = 0
+        self.tokens = 0
+        self.deadline_hit = False
+        self.stopped: Optional[str] = None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.deadline or self.max_llm_calls or self.max_tokens)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left before the deadline (negative once past it), or None without one.
+        """
+        return None if self.deadline is None else self.deadline - self.elapsed()
+
+    def time_before_synthesis(self) -> Optional[float]:
+        """
+        Seconds that can be spent before synthesize must start, or None without a deadline.
+        """
+        remaining = self.remaining()
+        return None if remaining is None else max(0.0, remaining - self.estimates.get("synthesize"))
+
+    def charge(self, prompt_tokens: int = 0, response_tokens: int = 0, calls: int = 0):
+        self.llm_calls += calls
+        self.tokens += prompt_tokens + response_tokens
+
+    def fits(
+        self,
+        stages: list,
+        llm_calls: int = 0,
+        tokens: int = 0,
+        synthesis_tokens: int = 0,
+        record: bool = True
+    ) -> bool:
+        """
+        Whether `stages` (by name, e.g. ["reflect", "search"]) with `llm_calls` calls and
+        `tokens` estimated tokens fit, keeping a synthesize call of `synthesis_tokens`
+        document tokens in reserve. Unless `record` is False, the first limit that says
+        no is recorded in `stopped`.
+        """
+        reason = None
+        if self.deadline is not None:
+            needed = sum(self.estimates.get(stage) for stage in stages)
+            if needed > self.time_before_synthesis():
+                reason = "deadline"
+        if reason is None and self.max_llm_calls is not None and self.llm_calls + llm_calls + 1 > self.max_llm_calls:
+            reason = "llm_calls"
+        if reason is None and self.max_tokens is not None:
+            reserve = synthesis_tokens + SYNTHESIZE_OVERHEAD_TOKENS
+            if self.tokens + tokens + reserve > self.max_tokens:
+                reason = "tokens"
+
+        if reason is not None and record:
+            if self.stopped is None:
+                self.stopped = reason
+                PIPELINE_BUDGET_STOPS.labels(reason).inc()
+            if reason == "deadline":
+                self.deadline_hit = True
+        return reason is None
+
+    def cut(self):
+        """
+        Records that a stage was cut short at the deadline.
+        """
+        self.deadline_hit = True
+        PIPELINE_BUDGET_STOPS.labels("search_deadline").inc()
+
+    def report(self) -> dict:
+        """
+        The "budget" block of the response: limits, usage, what is left and why the run stopped early.
+        """
+        remaining = self.remaining()
+        return {
+            "deadline_seconds": self.deadline,
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "remaining_seconds": None if remaining is None else round(remaining, 3),
+            "deadline_hit": self.deadline_hit,
+            "llm_calls": self.llm_calls,
+            "remaining_llm_calls": None if self.max_llm_calls is None else self.max_llm_calls - self.llm_calls,
+            "tokens": self.tokens,
+            "remaining_tokens": None if self.max_tokens is None else self.max_tokens - self.tokens,
+            "stopped": self.stopped
+        }
+
+
+# Budget of the pipeline run in the current task (inherited by tasks it starts)
+current_budget: ContextVar[Optional[Budget]] = ContextVar("current_budget", default=None)
+
+
+class BudgetedLLM:
+    """
+    Wraps an LLM provider and charges every call, with estimated prompt and response
+    tokens, to a Budget. Calls are never refused here: the pipeline decides up front.
+    """
+
+    def __init__(self, client, budget: Budget):
+        self.client = client
+        self.budget = budget
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **options) -> str:
+        self.budget.charge(estimate_tokens(prompt), calls=1)
+        text = await self.client.generate(prompt, model=model, **options)
+        self.budget.charge(response_tokens=estimate_tokens(text or ""))
+        return text
+
+    async def stream(self, prompt: str, model: Optional[str] = None, **options) -> AsyncIterator[str]:
+        self.budget.charge(estimate_tokens(prompt), calls=1)
+        received = 0
+        try:
+            async for chunk in self.client.stream(prompt, model=model, **options):
+                received += len(chunk)
+                yield chunk
+        finally:
+            self.budget.charge(response_tokens=received // CHARS_PER_TOKEN)
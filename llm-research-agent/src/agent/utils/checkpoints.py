@@ -0,0 +1,168 @@
+import os
+import base64
+import random
+import logging
+from typing import Any, AsyncIterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata
+)
+
+from agent.utils.redis_cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis key prefix of pipeline checkpoints
+CHECKPOINT_PREFIX = "graph_checkpoint:"
+
+# Seconds a checkpoint is kept for a retry to resume from
+PIPELINE_CHECKPOINT_TTL = int(os.getenv("PIPELINE_CHECKPOINT_TTL", "600"))
+
+
+def _pack(typed: Tuple[str, bytes]) -> str:
+    # The shared Redis pool decodes responses as text, so binary payloads travel as base64
+    kind, data = typed
+    return f"{kind}:{base64.b64encode(data).decode('ascii')}"
+
+
+def _unpack(value: str) -> Tuple[str, bytes]:
+    kind, data = value.split(":", 1)
+    return kind, base64.b64decode(data)
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer that keeps the latest checkpoint of each thread (and the
+    writes of the tasks that completed since) in Redis, so a request retried on any
+    worker resumes from the last completed node.
+
+    Only the latest checkpoint is kept: history and time travel are not needed to
+    resume. Keys expire after `ttl` seconds. Redis errors are logged and the run
+    carries on without checkpoints, like the caches do.
+    """
+
+    def __init__(self, client=redis_client, ttl: int = PIPELINE_CHECKPOINT_TTL, prefix: str = CHECKPOINT_PREFIX):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, thread_id: str, checkpoint_ns: str = "") -> str:
+        return f"{self.prefix}{thread_id}:{checkpoint_ns}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._key(thread_id, checkpoint_ns)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(key)
+                pipe.hgetall(f"{key}:writes")
+                saved, writes = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint lookup failed: {e}")
+            return None
+        if not saved:
+            return None
+        checkpoint_id = saved["id"]
+        requested = get_checkpoint_id(config)
+        if requested and requested != checkpoint_id:
+            return None
+
+        # Fields are "task_id\0idx\0task_path\0channel"; order them as the tasks wrote them
+        entries = []
+        for field, value in writes.items():
+            task_id, idx, task_path, channel = field.split("\0", 3)
+            entries.append((task_path, task_id, int(idx), channel, value))
+        pending = [
+            (task_id, channel, self.serde.loads_typed(_unpack(value)))
+            for _, task_id, _, channel, value in sorted(entries)
+        ]
+
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed(_unpack(saved["checkpoint"])),
+            metadata=self.serde.loads_typed(_unpack(saved["metadata"])),
+            pending_writes=pending,
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": saved["parent"]}}
+                if saved.get("parent") else None
+            )
+        )
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config is None or before is not None or limit == 0:
+            return
+        latest = await self.aget_tuple(config)
+        if latest and all(latest.metadata.get(k) == v for k, v in (filter or {}).items()):
+            yield latest
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._key(thread_id, checkpoint_ns)
+        saved = {
+            "id": checkpoint["id"],
+            "parent": config["configurable"].get("checkpoint_id") or "",
+            "checkpoint": _pack(self.serde.dumps_typed(checkpoint)),
+            "metadata": _pack(self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)))
+        }
+        try:
+            # Replaces the previous checkpoint; its task writes are superseded by this one
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(key, f"{key}:writes")
+                pipe.hset(key, mapping=saved)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint write failed: {e}")
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        key = self._key(config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+        fields = {
+            f"{task_id}\0{WRITES_IDX_MAP.get(channel, idx)}\0{task_path}\0{channel}": _pack(self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        }
+        if not fields:
+            return
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(f"{key}:writes", mapping=fields)
+                pipe.expire(f"{key}:writes", self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint write failed: {e}")
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        key = self._key(thread_id)
+        try:
+            await self.client.delete(key, f"{key}:writes")
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint delete failed: {e}")
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as the in-memory saver: monotonically increasing, string-sortable
+        current_v = 0 if current is None else int(str(current).split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
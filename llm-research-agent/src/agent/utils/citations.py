@@ -0,0 +1,57 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from agent.types.document import Document
+
+# A citation marker: [1] or [2, 3] (other bracketed text is left alone)
+_MARKER = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\]")
+_SEPARATOR = re.compile(r"\s*,\s*")
+
+
+def _sources(citations: Sequence[dict], docs: Optional[Sequence[Document]]) -> Dict[int, dict]:
+    # Prompt-numbered documents stand in for sources the model cited but did not list
+    sources = {}
+    if docs:
+        for number, doc in enumerate(docs, 1):
+            sources[number] = {"title": doc.title, "url": doc.url}
+    for citation in citations:
+        try:
+            sources[int(citation["id"])] = citation
+        except (KeyError, TypeError, ValueError):
+            continue
+    return sources
+
+
+def normalize_citations(
+    answer: str,
+    citations: Sequence[dict],
+    docs: Optional[Sequence[Document]] = None
+) -> Tuple[str, List[dict]]:
+    """
+    Renumbers an answer's citation markers 1..n in order of their original numbers
+    and returns the answer with the sources it cites, compacted to
+    {"id", "title", "url"}. Markers citing no known source are dropped.
+
+    Args:
+        answer (str): Answer text with markers like [1] or [2, 3].
+        citations (Sequence[dict]): Sources listed by the model, with "id", "title" and "url".
+        docs (Sequence[Document], optional): The documents as numbered in the prompt,
+            used for ids the model cited without listing them.
+
+    Returns:
+        Tuple[str, List[dict]]: The renumbered answer and its citations.
+    """
+    sources = _sources(citations, docs)
+    markers = _MARKER.findall(answer)
+    cited = sorted({int(part) for marker in markers for part in _SEPARATOR.split(marker)} & sources.keys())
+    numbers = {old: new for new, old in enumerate(cited, 1)}
+
+    def renumber(match: re.Match) -> str:
+        kept = [str(numbers[int(part)]) for part in _SEPARATOR.split(match.group(1)) if int(part) in numbers]
+        return f"[{', '.join(kept)}]" if kept else ""
+
+    answer = _MARKER.sub(renumber, answer) if markers else answer
+    return answer, [
+        {"id": numbers[old], "title": sources[old].get("title", ""), "url": sources[old].get("url", "")}
+        for old in cited
+    ]
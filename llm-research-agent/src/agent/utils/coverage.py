@@ -0,0 +1,179 @@
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+from agent.types.document import Document
+from agent.utils.metrics import COVERAGE_PRECHECK, COVERAGE_PRECHECK_AGREEMENT
+from agent.utils.retrieval import STOPWORDS, tokenize
+
+# off: always ask Gemini; shadow: score locally but still ask Gemini and record whether
+# they agree; on: trust the local verdict when it is confident either way
+COVERAGE_MODE = os.getenv("COVERAGE_MODE", "shadow").lower()
+
+# Minimum per-slot confidence (1 - 0.5^supporting docs) to call the docs sufficient
+COVERAGE_SKIP_CONFIDENCE = float(os.getenv("COVERAGE_SKIP_CONFIDENCE", "0.75"))
+
+# At or below this share of slots with any evidence, coverage is hopeless
+COVERAGE_HOPELESS_FRACTION = float(os.getenv("COVERAGE_HOPELESS_FRACTION", "0"))
+
+MAX_TEMPLATE_QUERIES = 3
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+DATE_RE = re.compile(
+    rf"\b\d{{4}}-\d{{2}}-\d{{2}}\b|\b\d{{1,2}}(?:st|nd|rd|th)? {_MONTHS}\.?,? \d{{4}}\b|\b{_MONTHS}\.? \d{{1,2}}(?:st|nd|rd|th)?,? \d{{4}}\b"
+    rf"|\b(?:in|on|since|from|during) (?:{_MONTHS} )?(?:1[5-9]|20)\d{{2}}\b",
+    re.IGNORECASE
+)
+SCORE_RE = re.compile(r"\b\d{1,3}\s?[-–:]\s?\d{1,3}\b(?!\s?[-–:]\s?\d)|\bon penalties\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\b\d{1,3}(?:[,.]\d{3})+\b|\b\d+(?:\.\d+)?\s?(?:million|billion|thousand|percent|%)|\b\d{2,}\b", re.IGNORECASE)
+ENTITY_RE = re.compile(r"\b[A-Z][\w'’-]+(?:\s+(?:de |van |von |da )?[A-Z][\w'’-]+)*")
+
+# Slot families: (words in the slot name, cue words in the text, pattern the text must contain)
+_FAMILIES = [
+    ({"scorer", "scorers"}, re.compile(r"\b(scor\w*|goals?|hat-trick|brace|netted)\b", re.I), ENTITY_RE),
+    ({"date", "year", "when", "time", "day"}, None, DATE_RE),
+    ({"score", "result"}, None, SCORE_RE),
+    ({"winner", "champion", "won", "victor"}, re.compile(r"\b(won|wins?|winners?|champions?|beat|defeated|victory|title)\b", re.I), ENTITY_RE),
+    ({"location", "venue", "place", "city", "country", "stadium", "where"},
+     re.compile(r"\b(in|at|held|hosted|located|stadium|venue|city)\b", re.I), ENTITY_RE),
+    ({"referee"}, re.compile(r"\b(referee\w*|officiat\w*|umpire)\b", re.I), ENTITY_RE),
+    ({"teams", "team", "opponent", "opponents"}, re.compile(r"\b(vs\.?|v\.|versus|against|between|beat|defeated|faced)\b", re.I), ENTITY_RE),
+    ({"attendance", "population", "count", "number", "price", "cost", "amount", "height", "age", "size"}, None, NUMBER_RE),
+]
+
+# Follow-up query templates for missing slots ({topic} = the question's key words)
+QUERY_TEMPLATES = {
+    "date": "{topic} date",
+    "score": "{topic} score",
+    "winner": "{topic} winner",
+    "goal_scorers": "{topic} goal scorers",
+    "top_scorer": "{topic} top scorer",
+    "location": "{topic} venue location",
+    "referee": "{topic} referee",
+    "teams": "{topic} teams",
+    "attendance": "{topic} attendance",
+}
+
+
+class Coverage(NamedTuple):
+    """
+    Local estimate of how well the documents cover the question's slots.
+
+    Attributes:
+        filled (List[str]): Slots with confident evidence.
+        missing (List[str]): Slots without confident evidence.
+        confidence (float): Lowest per-slot confidence (0..1).
+        decision (str): "sufficient", "insufficient" or "uncertain" (ask the LLM).
+    """
+    filled: List[str]
+    missing: List[str]
+    confidence: float
+    decision: str
+
+
+def _keywords(text: str) -> List[str]:
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+
+def _slot_matches(slot: str, text: str) -> bool:
+    words = set(tokenize(slot))
+    for names, cue, pattern in _FAMILIES:
+        if words & names:
+            return bool(pattern.search(text)) and (cue is None or bool(cue.search(text)))
+    # Unknown slot: every word of its name must appear (prefix match, so "population" finds "populations")
+    tokens = tokenize(text)
+    return bool(words) and all(any(token.startswith(word[:5]) for token in tokens) for word in words)
+
+
+def estimate_coverage(question: str, docs: List[Document], slots: List[str]) -> Coverage:
+    """
+    Scores each slot against the documents that mention the question's key words,
+    using keyword cues plus date, score, number and named-entity patterns.
+
+    A slot's confidence is 1 - 0.5^n for n supporting documents, so one match gives 0.5
+    and two give 0.75.
+
+    Args:
+        question (str): The user's question.
+        docs (List[Document]): Documents that would be sent to reflect.
+        slots (List[str]): Information slots for the question.
+
+    Returns:
+        Coverage: Filled and missing slots, confidence and the resulting decision.
+    """
+    keywords = set(_keywords(question))
+    texts = []
+    for doc in docs:
+        text = f"{doc.title or ''}. {doc.snippet or ''}"
+        if not keywords or keywords & set(tokenize(text)):
+            texts.append(text)
+
+    filled, missing, confidences, evidenced = [], [], [], 0
+    for slot in slots:
+        support = sum(1 for text in texts if _slot_matches(slot, text))
+        confidence = 1 - 0.5 ** support
+        confidences.append(confidence)
+        evidenced += support > 0
+        (filled if confidence >= COVERAGE_SKIP_CONFIDENCE else missing).append(slot)
+
+    confidence = min(confidences) if confidences else 0.0
+    if slots and not missing:
+        decision = "sufficient"
+    elif not slots or evidenced / len(slots) <= COVERAGE_HOPELESS_FRACTION:
+        decision = "insufficient"
+    else:
+        decision = "uncertain"
+    return Coverage(filled, missing, confidence, decision)
+
+
+def template_queries(question: str, slots: List[str]) -> List[str]:
+    """
+    Follow-up search queries for the missing slots, built from templates.
+    """
+    topic = " ".join(word for word in re.findall(r"[\w'’-]+", question) if word.lower() not in STOPWORDS)
+    queries = []
+    for slot in slots[:MAX_TEMPLATE_QUERIES]:
+        template = QUERY_TEMPLATES.get(slot, "{topic} " + " ".join(tokenize(slot)))
+        queries.append(template.format(topic=topic))
+    return queries
+
+
+def heuristic_reflection(question: str, slots: List[str], coverage: Coverage) -> dict:
+    """
+    A reflect-style verdict built from the local coverage estimate.
+    """
+    need_more = coverage.decision == "insufficient"
+    return {
+        "slots": slots,
+        "filled": coverage.filled,
+        "need_more": need_more,
+        "new_queries": template_queries(question, coverage.missing) if need_more else []
+    }
+
+
+def precheck(question: str, docs: List[Document], slots: Optional[List[str]]) -> Optional[Coverage]:
+    """
+    Runs the coverage pre-check when enabled and slots are known, recording the decision.
+
+    Returns:
+        Coverage: The estimate, or None when the pre-check does not apply.
+    """
+    if COVERAGE_MODE not in ("shadow", "on") or not slots:
+        return None
+    coverage = estimate_coverage(question, docs, slots)
+    COVERAGE_PRECHECK.labels(coverage.decision, COVERAGE_MODE).inc()
+    return coverage
+
+
+def can_skip_reflect(coverage: Optional[Coverage]) -> bool:
+    return coverage is not None and COVERAGE_MODE == "on" and coverage.decision != "uncertain"
+
+
+def record_agreement(coverage: Optional[Coverage], reflection: dict) -> None:
+    """
+    Shadow mode: compares a confident local decision with the LLM's verdict.
+    """
+    if coverage is None or coverage.decision == "uncertain":
+        return
+    agrees = (coverage.decision == "insufficient") == bool(reflection.get("need_more"))
+    COVERAGE_PRECHECK_AGREEMENT.labels(coverage.decision, str(agrees).lower()).inc()
@@ -0,0 +1,246 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from agent.types.document import Document
+from agent.utils.metrics import CACHE_HITS, CACHE_MISSES, DOCUMENT_STORE_DOCS
+from agent.utils.retrieval import STOPWORDS, normalize_url, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Keep every retrieved document in a local full-text index and answer searches from it first
+DOCUMENT_STORE = os.getenv("DOCUMENT_STORE", "false").lower() == "true"
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "documents.db")
+
+# Seconds a stored document counts as fresh enough to answer a search
+DOCUMENT_STORE_TTL = int(os.getenv("DOCUMENT_STORE_TTL", "86400"))
+
+# Fresh matching documents a query needs before Google CSE is skipped
+DOCUMENT_STORE_MIN_RESULTS = int(os.getenv("DOCUMENT_STORE_MIN_RESULTS", "3"))
+
+# Documents returned per query, like one page of CSE results
+DOCUMENT_STORE_MAX_RESULTS = int(os.getenv("DOCUMENT_STORE_MAX_RESULTS", "10"))
+
+# Seconds a document is kept at all; compaction deletes older ones
+DOCUMENT_STORE_RETENTION = int(os.getenv("DOCUMENT_STORE_RETENTION", str(30 * 86400)))
+
+# Seconds between compactions (run after an ingest once the interval has passed)
+DOCUMENT_STORE_COMPACT_INTERVAL = int(os.getenv("DOCUMENT_STORE_COMPACT_INTERVAL", "3600"))
+
+# The FTS index is an external-content table over `documents`; triggers keep it in sync
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    url_key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    snippet TEXT NOT NULL DEFAULT '',
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_fetched_at ON documents(fetched_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, snippet, content='documents', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF title, snippet ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+    INSERT INTO documents_fts(rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO documents (url_key, url, title, snippet, fetched_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(url_key) DO UPDATE SET
+    url = excluded.url, title = excluded.title, snippet = excluded.snippet, fetched_at = excluded.fetched_at
+"""
+
+_SEARCH = """
+SELECT d.title, d.snippet, d.url
+FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+WHERE documents_fts MATCH ? AND d.fetched_at >= ?
+ORDER BY bm25(documents_fts, 2.0, 1.0)
+LIMIT ?
+"""
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 query requiring every content word of `query` (quoted, so no word is read
+    as FTS syntax), or None when the query has no content words.
+    """
+    terms = [token for token in tokenize(query) if token not in STOPWORDS]
+    return " ".join(f'"{term}"' for term in dict.fromkeys(terms)) or None
+
+
+class DocumentStore:
+    """
+    Local SQLite store of every document retrieved from web search, with an FTS5
+    full-text index over titles and snippets.
+
+    Documents are keyed by normalized URL and stamped with their fetch time; a
+    re-fetched URL replaces the stored copy. A query is answered locally when enough
+    fresh documents contain all of its words, ranked by BM25 (title matches weigh double).
+
+    sqlite3 calls block, so they run on a single dedicated thread that owns the
+    connection; that also serializes access to it. WAL mode lets several worker
+    processes share one file.
+    """
+
+    def __init__(
+        self,
+        path: str = DOCUMENT_STORE_PATH,
+        ttl: int = DOCUMENT_STORE_TTL,
+        min_results: int = DOCUMENT_STORE_MIN_RESULTS,
+        max_results: int = DOCUMENT_STORE_MAX_RESULTS,
+        retention: int = DOCUMENT_STORE_RETENTION,
+        compact_interval: int = DOCUMENT_STORE_COMPACT_INTERVAL
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.min_results = min_results
+        self.max_results = max_results
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-store")
+        self._last_compaction = time.time()
+        self._compaction: Optional[asyncio.Task] = None
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            # Only takes effect on a new file; lets compaction release pages without a full VACUUM
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def ingest(self, docs: Iterable[Document], fetched_at: Optional[float] = None) -> int:
+        """
+        Bulk-inserts documents in one transaction, replacing stored copies of the same URL.
+
+        Args:
+            docs (Iterable[Document]): Documents to store; ones without a URL are skipped.
+            fetched_at (float, optional): Fetch time (Unix seconds); defaults to now.
+
+        Returns:
+            int: Number of documents written.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = {}
+        for doc in docs:
+            if doc.url:
+                rows[normalize_url(doc.url)] = (doc.url, doc.title or "", doc.snippet or "", fetched_at)
+        if not rows:
+            return 0
+        rows = [(key, *values) for key, values in rows.items()]
+        try:
+            await self._call(self._ingest_sync, rows)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Document store write failed: {e}")
+            return 0
+
+        if time.time() - self._last_compaction >= self.compact_interval and not self._compaction:
+            # In the background: the search that triggered it should not wait
+            self._compaction = asyncio.ensure_future(self.compact())
+            self._compaction.add_done_callback(lambda _: setattr(self, "_compaction", None))
+        return len(rows)
+
+    def _ingest_sync(self, rows: list):
+        conn = self._connect()
+        with conn:
+            conn.executemany(_UPSERT, rows)
+
+    async def search_many(self, queries: List[str]) -> Dict[str, List[Document]]:
+        """
+        Answers several queries from the store.
+
+        Returns:
+            Dict[str, List[Document]]: Fresh documents for the queries with at least
+            `min_results` matches; the other queries are absent from the dict.
+        """
+        if not queries:
+            return {}
+        try:
+            found = await self._call(self._search_sync, queries, time.time() - self.ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Document store lookup failed: {e}")
+            found = {}
+
+        hits = {}
+        for query in queries:
+            docs = found.get(query, [])
+            if len(docs) >= max(1, self.min_results):
+                CACHE_HITS.labels("document_store", "sqlite").inc()
+                hits[query] = docs
+            else:
+                CACHE_MISSES.labels("document_store").inc()
+        return hits
+
+    def _search_sync(self, queries: List[str], fresh_after: float) -> Dict[str, List[Document]]:
+        conn = self._connect()
+        found = {}
+        for query in queries:
+            expression = match_expression(query)
+            if expression:
+                rows = conn.execute(_SEARCH, (expression, fresh_after, self.max_results)).fetchall()
+                found[query] = [Document(*row) for row in rows]
+        return found
+
+    async def compact(self) -> int:
+        """
+        Deletes documents older than the retention period, merges the FTS index
+        segments and returns freed pages to the file system (incremental vacuum).
+
+        Returns:
+            int: Number of documents deleted.
+        """
+        self._last_compaction = time.time()
+        try:
+            deleted, total = await self._call(self._compact_sync, time.time() - self.retention)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Document store compaction failed: {e}")
+            return 0
+        DOCUMENT_STORE_DOCS.set(total)
+        return deleted
+
+    def _compact_sync(self, expired_before: float):
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute("DELETE FROM documents WHERE fetched_at < ?", (expired_before,)).rowcount
+            conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return deleted, total
+
+    def close(self):
+        """
+        Closes the connection and stops the store's thread.
+        """
+        def close_sync():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(close_sync).result()
+        self._executor.shutdown(wait=True)
+
+
+document_store = DocumentStore() if DOCUMENT_STORE else None
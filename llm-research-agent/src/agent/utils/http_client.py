@@ -0,0 +1,118 @@
+import os
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+T = TypeVar("T")
+
+# Negotiate HTTP/2 when the server supports it (requires the `h2` package)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and _H2_AVAILABLE
+
+# Connection pool bounds for the shared outbound client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Default per-attempt timeout in seconds
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+
+# Exponential back-off bounds in seconds
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared outbound HTTP client for the running event loop.
+
+    One long-lived client means pooled keep-alive connections (and HTTP/2
+    multiplexing where available) instead of a TCP + TLS handshake per call.
+    Connections are bound to the loop that opened them, so a new client is
+    created if the loop changes (e.g. between `asyncio.run` calls).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """
+    Closes the shared client (call on application shutdown).
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """
+    Full-jitter exponential back-off: a random delay in [0, min(cap, base * 2^attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """
+    Parses a numeric Retry-After header, if present.
+    """
+    value = resp.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def hedged(factory: Callable[[], Awaitable[T]], delay: float) -> T:
+    """
+    Runs `factory()` and, if it has not finished after `delay` seconds, starts a
+    second identical attempt. Returns whichever succeeds first and cancels the other.
+    If both fail, the first attempt's error is raised.
+
+    Args:
+        factory (Callable): Zero-argument coroutine function making one attempt.
+        delay (float): Seconds to wait before hedging; <= 0 disables hedging.
+    """
+    primary = asyncio.ensure_future(factory())
+    if delay <= 0:
+        return await primary
+
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done:
+            attempts.append(asyncio.ensure_future(factory()))
+
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return primary.result()
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
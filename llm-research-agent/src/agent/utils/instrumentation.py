@@ -0,0 +1,209 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from opentelemetry import trace
+
+from agent.utils.metrics import (
+    TOOL_CALL_COUNT, TOOL_LATENCY, STAGE_RETRIES, LLM_CALL_LATENCY, LLM_QUEUE_WAIT,
+    LLM_PROMPT_TOKENS, LLM_RESPONSE_TOKENS, LLM_PROMPT_BYTES, LLM_PARSE_FAILURES, LLM_JSON_REPLIES
+)
+from agent.utils.retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+tracer = trace.get_tracer(__name__)
+
+# Pipeline stage running in the current task (inherited by tasks it starts);
+# LLM calls, parse failures and retries are attributed to it
+current_stage: ContextVar[str] = ContextVar("current_stage", default="other")
+
+# LLM call in progress in the current task. Providers that know better fill in
+# "queue_wait" and the provider-reported "prompt_tokens" / "response_tokens"
+current_llm_call: ContextVar[Optional[dict]] = ContextVar("current_llm_call", default=None)
+
+
+class Timings:
+    """
+    Per-request breakdown for the "timings" block of the response: wall time per
+    stage and, for the LLM calls made in it, call time, queue wait, tokens, prompt
+    bytes, JSON-parse failures and repairs, and retries. Repeated stages (e.g. reflect rounds)
+    are summed.
+    """
+
+    _FIELDS = ("runs", "seconds", "llm_calls", "llm_seconds", "queue_wait_seconds",
+               "prompt_tokens", "response_tokens", "prompt_bytes", "parse_failures", "json_repairs", "retries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, dict] = {}
+
+    def _stage(self, name: str) -> dict:
+        if name not in self.stages:
+            self.stages[name] = dict.fromkeys(self._FIELDS, 0)
+        return self.stages[name]
+
+    def add(self, stage: str, **amounts):
+        entry = self._stage(stage)
+        for field, amount in amounts.items():
+            entry[field] += amount
+
+    def report(self) -> dict:
+        stages = {
+            name: {field: round(value, 4) if isinstance(value, float) else value for field, value in entry.items()}
+            for name, entry in self.stages.items()
+        }
+        return {"total_seconds": round(time.perf_counter() - self.started, 4), "stages": stages}
+
+
+# Timings of the request being served in the current task, when it asked for them
+current_timings: ContextVar[Optional[Timings]] = ContextVar("current_timings", default=None)
+
+
+def trace_exemplar(span=None) -> Optional[Dict[str, str]]:
+    """
+    Prometheus exemplar linking an observation to the trace of `span` (default: the
+    current span), or None outside a recorded trace.
+    """
+    context = (span or trace.get_current_span()).get_span_context()
+    if not context.is_valid:
+        return None
+    return {"trace_id": format(context.trace_id, "032x"), "span_id": format(context.span_id, "016x")}
+
+
+def _add_timing(stage: str, **amounts):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, **amounts)
+
+
+@contextmanager
+def stage(name: str, span: Optional[str] = None) -> Iterator[trace.Span]:
+    """
+    Runs a pipeline stage: opens its span (named `span`, default `name`), counts
+    it in tool_call_count, makes it the current stage for LLM call accounting and
+    records its wall time in tool_latency_seconds (with a trace exemplar), as a
+    span attribute and in the request's timings.
+    """
+    with tracer.start_as_current_span(span or name) as otel_span:
+        TOOL_CALL_COUNT.labels(name).inc()
+        token = current_stage.set(name)
+        started = time.perf_counter()
+        try:
+            yield otel_span
+        finally:
+            seconds = time.perf_counter() - started
+            current_stage.reset(token)
+            otel_span.set_attribute("stage.name", name)
+            otel_span.set_attribute("stage.seconds", seconds)
+            TOOL_LATENCY.labels(name).observe(seconds, exemplar=trace_exemplar(otel_span))
+            _add_timing(name, runs=1, seconds=seconds)
+
+
+def record_parse_failure():
+    """
+    Counts an LLM response that could not be parsed, against the current stage.
+    """
+    name = current_stage.get()
+    LLM_PARSE_FAILURES.labels(name).inc()
+    trace.get_current_span().add_event("parse_failure", {"stage.name": name})
+    _add_timing(name, parse_failures=1)
+
+
+def record_json_reply(outcome: str):
+    """
+    Counts a JSON reply parsed in the current stage by outcome: "clean", "repaired"
+    or "failed" (failures are also counted by record_parse_failure).
+    """
+    name = current_stage.get()
+    LLM_JSON_REPLIES.labels(name, outcome).inc()
+    if outcome == "repaired":
+        _add_timing(name, json_repairs=1)
+    elif outcome == "failed":
+        record_parse_failure()
+
+
+def record_retry():
+    """
+    Counts a retried call (e.g. a rate-limited search request), against the current stage.
+    """
+    name = current_stage.get()
+    STAGE_RETRIES.labels(name).inc()
+    _add_timing(name, retries=1)
+
+
+class InstrumentedLLM:
+    """
+    Wraps an LLM provider and records every call, under the current stage: wall
+    time, queue wait, prompt and response tokens and prompt bytes, as Prometheus
+    histograms (with exemplars linking to the call's span), as attributes of an
+    "llm_call" span and in the request's timings.
+
+    Token counts are the provider's when it reports them (see current_llm_call),
+    estimated from the text otherwise.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **options) -> str:
+        call, span, started = self._start()
+        token = current_llm_call.set(call)
+        text = ""
+        try:
+            text = await self.client.generate(prompt, model=model, **options)
+            return text
+        finally:
+            current_llm_call.reset(token)
+            self._finish(call, span, started, prompt, len(text or ""))
+
+    async def stream(self, prompt: str, model: Optional[str] = None, **options) -> AsyncIterator[str]:
+        call, span, started = self._start()
+        received = 0
+        # Set for the provider's first step, which runs in this same task
+        token = current_llm_call.set(call)
+        try:
+            async for chunk in self.client.stream(prompt, model=model, **options):
+                received += len(chunk)
+                yield chunk
+        finally:
+            try:
+                current_llm_call.reset(token)
+            except ValueError:
+                # Closed from another context (e.g. garbage collection); nothing to restore
+                pass
+            self._finish(call, span, started, prompt, received)
+
+    @staticmethod
+    def _start():
+        call = {"stage": current_stage.get(), "queue_wait": 0.0, "prompt_tokens": None, "response_tokens": None}
+        # Not made current: a streamed call's span stays open across the consumer's awaits
+        span = tracer.start_span("llm_call", attributes={"llm.stage": call["stage"]})
+        return call, span, time.perf_counter()
+
+    @staticmethod
+    def _finish(call: dict, span, started: float, prompt: str, response_chars: int):
+        seconds = time.perf_counter() - started
+        name = call["stage"]
+        prompt_tokens = call["prompt_tokens"] or estimate_tokens(prompt)
+        response_tokens = call["response_tokens"] or response_chars // CHARS_PER_TOKEN
+        prompt_bytes = len(prompt.encode("utf-8"))
+
+        exemplar = trace_exemplar(span)
+        LLM_CALL_LATENCY.labels(name).observe(seconds, exemplar=exemplar)
+        LLM_QUEUE_WAIT.labels(name).observe(call["queue_wait"], exemplar=exemplar)
+        LLM_PROMPT_TOKENS.labels(name).observe(prompt_tokens, exemplar=exemplar)
+        LLM_RESPONSE_TOKENS.labels(name).observe(response_tokens, exemplar=exemplar)
+        LLM_PROMPT_BYTES.labels(name).observe(prompt_bytes, exemplar=exemplar)
+
+        span.set_attributes({
+            "llm.seconds": seconds,
+            "llm.queue_wait_seconds": call["queue_wait"],
+            "llm.prompt_tokens": prompt_tokens,
+            "llm.response_tokens": response_tokens,
+            "llm.prompt_bytes": prompt_bytes
+        })
+        span.end()
+        _add_timing(
+            name, llm_calls=1, llm_seconds=seconds, queue_wait_seconds=call["queue_wait"],
+            prompt_tokens=prompt_tokens, response_tokens=response_tokens, prompt_bytes=prompt_bytes
+        )
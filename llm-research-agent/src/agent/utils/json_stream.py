@@ -0,0 +1,210 @@
+import re
+import json
+
+# Single-character JSON escapes
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally decodes one string field of a JSON object that arrives in chunks.
+
+    Used to stream the "answer" of a synthesize reply to the client while Gemini is
+    still generating the rest of the object. Text before the field (including a
+    ```json fence) is skipped; decoding stops at the closing quote. Escapes split
+    across chunks are held back until complete.
+    """
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Adds a chunk of raw model output and returns the newly decoded field text.
+        """
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf = self._buffer
+        out = []
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+
+            # Escape sequence: wait for the rest of it if the chunk ended mid-way
+            if i + 1 >= len(buf):
+                break
+            kind = buf[i + 1]
+            if kind != "u":
+                out.append(_ESCAPES.get(kind, kind))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            try:
+                code = int(buf[i + 2:i + 6], 16)
+            except ValueError:
+                out.append(buf[i:i + 6])
+                i += 6
+                continue
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: combine with the following \uXXXX low surrogate
+                if i + 12 > len(buf):
+                    break
+                try:
+                    low = int(buf[i + 8:i + 12], 16)
+                except ValueError:
+                    low = 0
+                if buf[i + 6:i + 8] == "\\u" and 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            out.append(chr(code))
+            i += 6
+
+        self._pos = i
+        return "".join(out)
+
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonExtractor:
+    """
+    Incrementally finds the JSON object (or array) in model output that arrives in
+    chunks, and parses it tolerating what models do to it: prose or a ```json fence
+    around it, trailing commas, and a reply cut off mid-value.
+
+    Each chunk is scanned once as it arrives (string state, bracket depth), so the
+    work is spread over the stream instead of redone on the whole reply at the end.
+    """
+
+    def __init__(self, expect: str = "{"):
+        """
+        Args:
+            expect (str): "{" for an object or "[" for an array; text before the
+                first such bracket is skipped.
+        """
+        self.expect = expect
+        self.repaired = False
+        self._buffer = ""
+        self._pos = 0
+        self._start = None
+        self._end = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # Index of the last non-whitespace character outside strings
+        self._last = None
+        # Trailing commas (indexes) to drop
+        self._drop = set()
+        # Last point where everything before it is complete values: (index, depth)
+        self._cut = None
+
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str):
+        """
+        Adds a chunk of raw model output.
+        """
+        self._buffer += chunk
+        if self._end is not None:
+            return
+        buf = self._buffer
+        stack = self._stack
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._start is None:
+                if c == self.expect:
+                    self._start = self._last = i
+                    stack.append(c)
+                    self._cut = (i + 1, 1)
+                i += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last = i
+                i += 1
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in _CLOSERS:
+                stack.append(c)
+                self._cut = (i + 1, len(stack))
+            elif c in "}]":
+                if buf[self._last] == ",":
+                    self._drop.add(self._last)
+                stack.pop()
+                if not stack:
+                    self._end = i + 1
+                    self._pos = i + 1
+                    return
+                self._cut = (i + 1, len(stack))
+            elif c == ",":
+                self._cut = (i, len(stack))
+            if not c.isspace():
+                self._last = i
+            i += 1
+        self._pos = i
+
+    def _text(self, stop: int) -> str:
+        if not self._drop:
+            return self._buffer[self._start:stop]
+        return "".join(c for i, c in enumerate(self._buffer[self._start:stop], self._start) if i not in self._drop)
+
+    def value(self):
+        """
+        Returns the parsed value; `repaired` tells whether it needed fixing.
+
+        Raises:
+            ValueError: No object/array was found, or it could not be repaired.
+        """
+        if self._start is None:
+            raise ValueError(f"no JSON {'object' if self.expect == '{' else 'array'} in reply")
+
+        if self._end is not None:
+            text = self._text(self._end)
+            # Text around the value (fences, prose) is skipped, not repaired
+            self.repaired = bool(self._drop)
+            return json.loads(text)
+
+        # Cut off: first try closing what is open (keeps a partial string value) ...
+        self.repaired = True
+        text = self._text(len(self._buffer))
+        if self._in_string:
+            text = (text[:-1] if self._escape else text) + '"'
+        closers = "".join(_CLOSERS[c] for c in reversed(self._stack))
+        try:
+            return json.loads(text.rstrip().rstrip(",") + closers)
+        except ValueError:
+            pass
+        # ... then fall back to the last complete value
+        index, depth = self._cut
+        closers = "".join(_CLOSERS[c] for c in reversed(self._stack[:depth]))
+        return json.loads(self._text(index) + closers)
+
@@ -0,0 +1,216 @@
+import os
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+from google import genai
+
+from agent.utils.budget import BudgetedLLM, current_budget
+from agent.utils.instrumentation import InstrumentedLLM, current_llm_call
+from agent.utils.structured import response_config
+
+# Load environment variables from .env (e.g. GEMINI_API_KEY)
+load_dotenv()
+
+# Default Gemini model used by every node
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+# Max number of Gemini calls in flight at once per process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+_genai_client = None
+_llm_client = None
+
+
+def get_genai_client():
+    """
+    Returns the process-wide Gemini client, creating it on first use.
+
+    The client holds the underlying HTTP connection pool, so it is built once
+    and shared by every node instead of being re-created per call.
+    """
+    global _genai_client
+    if _genai_client is None:
+        _genai_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _genai_client
+
+
+class LLMClient:
+    """
+    Async facade over the Gemini client.
+
+    `generate_content` from google-genai is blocking, so every call is offloaded to a
+    dedicated thread pool. The pool size is the concurrency cap: once `max_concurrency`
+    calls are running, further calls wait for a free worker without blocking the event loop.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="llm"
+        )
+
+    async def generate(self, prompt: str, model: Optional[str] = None, schema: Optional[dict] = None) -> str:
+        """
+        Sends a single-turn prompt to Gemini and returns the response text.
+
+        Args:
+            prompt (str): The full prompt text.
+            model (str, optional): Overrides the default model for this call.
+            schema (dict, optional): Response schema the JSON reply must follow
+                (see agent.utils.structured).
+
+        Returns:
+            str: The raw text of the model's response.
+        """
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor,
+            partial(self._generate_sync, prompt, model or self.model, current_llm_call.get(), time.perf_counter(), schema)
+        )
+        return response.text if hasattr(response, "text") else str(response)
+
+    async def stream(self, prompt: str, model: Optional[str] = None, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Sends a single-turn prompt to Gemini and yields the response text as it arrives.
+
+        The blocking stream is consumed on the same bounded thread pool; chunks are
+        handed back to the event loop through a queue.
+
+        Args:
+            prompt (str): The full prompt text.
+            model (str, optional): Overrides the default model for this call.
+            schema (dict, optional): Response schema the JSON reply must follow.
+
+        Yields:
+            str: Successive chunks of response text.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+        call = current_llm_call.get()
+        submitted = time.perf_counter()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # The event loop is gone; nobody is listening any more
+                stop.set()
+
+        def produce():
+            _started(call, submitted)
+            try:
+                client = get_genai_client()
+                for chunk in client.models.generate_content_stream(
+                    model=model or self.model,
+                    contents=[{"parts": [{"text": prompt}]}],
+                    **_config_kwargs(schema)
+                ):
+                    # The last chunk carries the usage totals
+                    _record_usage(call, chunk)
+                    if stop.is_set():
+                        break
+                    text = chunk.text if hasattr(chunk, "text") else str(chunk)
+                    if text:
+                        put(text)
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Let the worker thread stop early if the consumer went away
+            stop.set()
+
+    def _generate_sync(
+        self, prompt: str, model: str, call: Optional[dict] = None, submitted: float = 0.0, schema: Optional[dict] = None
+    ):
+        _started(call, submitted)
+        client = get_genai_client()
+        response = client.models.generate_content(
+            model=model,
+            contents=[{"parts": [{"text": prompt}]}],
+            **_config_kwargs(schema)
+        )
+        _record_usage(call, response)
+        return response
+
+    def shutdown(self):
+        """
+        Releases the worker threads. Pending calls are allowed to finish.
+        """
+        self._executor.shutdown(wait=False)
+
+
+def _config_kwargs(schema: Optional[dict]) -> dict:
+    # Plain prompts are sent exactly as before, without a config
+    config = response_config(schema)
+    return {"config": config} if config is not None else {}
+
+
+def _started(call: Optional[dict], submitted: float):
+    # Runs on the worker thread: the time since submission was spent waiting for it
+    if call is not None:
+        call["queue_wait"] = time.perf_counter() - submitted
+
+
+def _record_usage(call: Optional[dict], response):
+    usage = getattr(response, "usage_metadata", None)
+    if call is None or usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    if isinstance(prompt_tokens, int):
+        call["prompt_tokens"] = prompt_tokens
+    if isinstance(response_tokens, int):
+        call["response_tokens"] = response_tokens
+
+
+def get_llm_provider():
+    """
+    Returns the installed LLM provider itself: an LLMClient unless another provider
+    was installed with set_llm_client. Nodes call through get_llm_client instead.
+    """
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Returns the shared, long-lived LLM client for this process (see get_llm_provider).
+    Inside a pipeline run with a budget, calls through it are charged to that budget;
+    every call is recorded per stage (see InstrumentedLLM).
+    """
+    client = get_llm_provider()
+    budget = current_budget.get()
+    if budget is not None:
+        client = BudgetedLLM(client, budget)
+    return InstrumentedLLM(client)
+
+
+def set_llm_client(client) -> None:
+    """
+    Installs the LLM provider used by every node: any object with async
+    `generate(prompt, model=None, schema=None)` and `stream(prompt, model=None, schema=None)`
+    methods, such as the record/replay wrappers in agent.utils.replay.
+    """
+    global _llm_client
+    _llm_client = client
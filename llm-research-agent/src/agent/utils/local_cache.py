@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LocalLRU:
+    """
+    Bounded in-process LRU cache with a per-entry TTL.
+
+    Not thread-safe: it is meant to be used from a single event loop, where every
+    operation runs without interleaving.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the value for `key` and marks it most recently used,
+        or None if it is missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> int:
+        """
+        Stores `value` and returns how many entries were evicted to make room.
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        evicted = 0
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import queue
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Dict, Optional, TextIO
+
+# Root level, and per-logger overrides as "agent.nodes=DEBUG,agent.tools.websearch=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# "json" (one object per line, for the log pipeline) or "text" (for humans)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Share of large payloads (raw LLM responses) logged when their logger is at DEBUG,
+# and the characters kept of each
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+# ID of the request being served in the current task (inherited by tasks it starts)
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed as `extra` and is a structured field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_configured_levels: Dict[str, int] = {}
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps each record with the current request ID. Runs in the logging thread's
+    caller, where the request's context is still current.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, request ID, message and any
+    structured fields passed through `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format the message now (arguments may change later) but leave the formatting
+        # of the whole line, and its cost, to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_text = logging.Formatter().formatException(record.exc_info) if record.exc_info else None
+        record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """
+    Parses "agent.nodes=DEBUG,agent.tools=WARNING" into {logger name: level}.
+    """
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    fmt: str = LOG_FORMAT,
+    stream: Optional[TextIO] = None
+) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through an unbounded queue to a background thread that
+    formats and writes the records (to stderr by default), so a log call on the
+    request path costs a queue put instead of a synchronous write. Records carry
+    the current request ID. Calling it again replaces the previous setup.
+
+    Args:
+        level (str): Root log level.
+        levels (str): Per-logger levels, e.g. "agent.nodes=DEBUG,agent.tools=WARNING".
+        fmt (str): "json" or "text".
+        stream (TextIO, optional): Destination (default sys.stderr).
+
+    Returns:
+        QueueListener: The running listener (stopped by shutdown_logging).
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(records)
+    _queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+        _configured_levels[name] = logger_level
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """
+    Flushes the queued records and removes the handler installed by setup_logging.
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for name in _configured_levels:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _configured_levels.clear()
+
+
+def log_payload(
+    logger: logging.Logger,
+    label: str,
+    payload: str,
+    sample_rate: Optional[float] = None,
+    max_chars: int = LOG_PAYLOAD_MAX_CHARS
+):
+    """
+    Logs a large payload (e.g. a raw LLM response) at DEBUG for a sampled share of
+    calls, truncated to `max_chars`. Costs one level check when DEBUG is off.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.debug(
+        "%s (%d chars): %s", label, len(payload), payload[:max_chars],
+        extra={"payload_chars": len(payload), "truncated": len(payload) > max_chars}
+    )
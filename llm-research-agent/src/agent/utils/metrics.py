@@ -1,4 +1,11 @@
-from prometheus_client import Counter, Histogram
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, multiprocess
+
+# 🧵 Multi-worker serving (src/serve.py): each worker process writes its samples to files in
+#    PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them (gauges by their multiprocess_mode).
+#    Exemplars are not kept in this mode
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
 
 # ✅ Counts how many times each tool (e.g., generate_queries, web_search) has been called
 TOOL_CALL_COUNT = Counter(
@@ -7,9 +14,256 @@ TOOL_CALL_COUNT = Counter(
     ["tool"]                       # Labels: one for each tool name
 )
 
-# ⏱️ Measures how long each tool takes to run (in seconds), as a histogram
+# ⏱️ Measures how long each tool / pipeline stage takes to run (in seconds), as a histogram;
+#    observations carry trace exemplars (visible in the OpenMetrics exposition)
 TOOL_LATENCY = Histogram(
     "tool_latency_seconds",        # Metric name for latency
     "Tool latency in seconds",     # Description shown in Prometheus
     ["tool"]                       # Label by tool name for granularity
 )
+
+# 🔀 Counts /api/query pipeline runs by single-flight role:
+#    leader (ran the pipeline), follower (awaited an in-process leader),
+#    remote_follower (waited for another worker's result via the Redis lock)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "singleflight_requests",
+    "Pipeline requests by single-flight role",
+    ["role"]
+)
+
+# 🗄️ Cache lookups and evictions, labelled by cache name (e.g. "answer")
+#    and tier ("local" = in-process LRU, "redis" = shared Redis, "semantic" = similar question,
+#    "inflight" = shared with an identical lookup already running)
+CACHE_HITS = Counter(
+    "cache_hits",
+    "Cache hits",
+    ["cache", "tier"]
+)
+
+CACHE_MISSES = Counter(
+    "cache_misses",
+    "Cache misses",
+    ["cache"]
+)
+
+CACHE_EVICTIONS = Counter(
+    "cache_evictions",
+    "Entries evicted to stay within the cache's entry or byte budget",
+    ["cache", "tier"]
+)
+
+# 🔁 Stale-while-revalidate: cached answers served past CACHE_SOFT_TTL, and background
+#    refreshes by trigger (stale = a stale answer was served, prewarm = a popular answer
+#    nearing expiry) and outcome (refreshed, skipped = already refreshing in this or
+#    another worker, shed = no pipeline slot, failed)
+CACHE_STALE_SERVED = Counter(
+    "cache_stale_served",
+    "Cached answers served past their soft TTL",
+    ["cache"]
+)
+
+CACHE_REFRESHES = Counter(
+    "cache_refreshes",
+    "Background refreshes of cached answers, by trigger and outcome",
+    ["trigger", "outcome"]
+)
+
+# 🏎️ Speculative synthesis outcomes: "used" (answer returned) or "wasted" (discarded LLM call)
+SPECULATIVE_SYNTHESIS_CALLS = Counter(
+    "speculative_synthesis",
+    "Speculative synthesize calls by outcome",
+    ["outcome"]
+)
+
+# ⏱️ End-to-end latency saved by overlapping synthesize with reflect
+SPECULATIVE_SAVED_SECONDS = Histogram(
+    "speculative_saved_seconds",
+    "Latency saved per request by speculative synthesis, in seconds"
+)
+
+# 🧭 Search queries picked by the query planner, and those it pruned:
+#    searched (repeats a query the request already searched), duplicate (near-identical
+#    to another query of the round) or fan_out (over QUERY_MAX_PER_ROUND)
+SEARCH_QUERIES_PLANNED = Counter(
+    "search_queries_planned",
+    "Search queries picked by the query planner"
+)
+
+SEARCH_QUERIES_PRUNED = Counter(
+    "search_queries_pruned",
+    "Search queries the query planner did not run, by reason",
+    ["reason"]
+)
+
+# ✂️ Documents left out of reflect/synthesize prompts:
+#    duplicate_url, near_duplicate (MinHash) or budget (did not fit CONTEXT_TOKEN_BUDGET)
+CONTEXT_DOCS_DROPPED = Counter(
+    "context_docs_dropped",
+    "Retrieved documents left out of LLM prompts, by reason",
+    ["reason"]
+)
+
+# 📏 Estimated tokens of the documents sent in each reflect/synthesize prompt
+CONTEXT_TOKENS = Histogram(
+    "context_tokens",
+    "Estimated prompt tokens taken by retrieved documents",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+)
+
+# 🩺 Local slot-coverage pre-check before reflect, by decision
+#    ("sufficient" / "insufficient" skip the LLM in on mode, "uncertain" always asks it)
+#    and mode ("shadow" still asks the LLM, "on" trusts confident decisions)
+COVERAGE_PRECHECK = Counter(
+    "coverage_precheck",
+    "Coverage pre-check decisions",
+    ["decision", "mode"]
+)
+
+# 🎯 Confident pre-check decisions compared with the LLM reflect verdict (shadow mode)
+COVERAGE_PRECHECK_AGREEMENT = Counter(
+    "coverage_precheck_agreement",
+    "Coverage pre-check decisions that matched the LLM verdict",
+    ["decision", "agrees"]
+)
+
+# 🧭 Best cosine similarity found per semantic cache lookup (tune SEMANTIC_CACHE_THRESHOLD with it);
+#    semantic hits are counted in cache_hits{tier="semantic"}
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "semantic_cache_similarity",
+    "Similarity of the closest cached question per semantic cache lookup",
+    buckets=(0.3, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+)
+
+# 📚 Documents held in the local document store after the last compaction;
+#    lookups are counted in cache_hits/cache_misses{cache="document_store"}
+DOCUMENT_STORE_DOCS = Gauge(
+    "document_store_documents",
+    "Documents in the local document store",
+    # The store is shared by the workers on a host: the latest count is the store's
+    multiprocess_mode="mostrecent"
+)
+
+# 📄 Result page fetches by outcome: fetched, cached, not_modified (ETag/Last-Modified
+#    revalidation), skipped (not HTML/text), timeout or error
+PAGE_FETCHES = Counter(
+    "page_fetches",
+    "Result page fetches by outcome",
+    ["outcome"]
+)
+
+# 📦 Page body bytes read (each page stops at PAGE_FETCH_MAX_BYTES)
+PAGE_FETCH_BYTES = Counter(
+    "page_fetch_bytes",
+    "Bytes of result page bodies read"
+)
+
+# ⏳ Pipeline runs cut short by their budget: deadline, llm_calls or tokens (a round
+#    skipped), or search_deadline (a search round cancelled to leave time for synthesize)
+PIPELINE_BUDGET_STOPS = Counter(
+    "pipeline_budget_stops",
+    "Pipeline stages skipped or cut short by the request budget",
+    ["reason"]
+)
+
+# 🚦 Admission control: pipelines running in this worker, requests waiting for a slot
+#    per priority class, how long they waited, and requests shed with 503
+#    (reason: queue_full or timeout)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Pipelines currently running",
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for a pipeline slot",
+    ["priority"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for a pipeline slot, in seconds",
+    ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected",
+    "Requests rejected by admission control",
+    ["priority", "reason"]
+)
+
+# 🧮 Every LLM call, labelled by the pipeline stage that made it (generate_queries,
+#    extract_slots, reflect, synthesize, or "other"): wall time, time spent waiting
+#    for a free LLM worker, prompt/response tokens (provider-reported when available,
+#    estimated otherwise) and prompt size. Observations carry trace exemplars
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_latency_seconds",
+    "LLM call wall time, including queue wait, in seconds",
+    ["stage"]
+)
+
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for a free worker, in seconds",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Prompt tokens per LLM call",
+    ["stage"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+
+LLM_RESPONSE_TOKENS = Histogram(
+    "llm_response_tokens",
+    "Response tokens per LLM call",
+    ["stage"],
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2000, 4000)
+)
+
+LLM_PROMPT_BYTES = Histogram(
+    "llm_prompt_bytes",
+    "Prompt size per LLM call, in bytes",
+    ["stage"],
+    buckets=(512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+)
+
+# 🧩 LLM responses that could not be parsed as the expected JSON, by stage
+LLM_PARSE_FAILURES = Counter(
+    "llm_parse_failures",
+    "LLM responses that failed to parse",
+    ["stage"]
+)
+
+# 🩹 JSON replies by outcome: "clean", "repaired" (trailing commas, cut off mid-value) or "failed"
+LLM_JSON_REPLIES = Counter(
+    "llm_json_replies",
+    "LLM replies parsed as JSON, by outcome",
+    ["stage", "outcome"]
+)
+
+# 🔁 Retried calls (e.g. rate-limited or failed search requests), by stage
+STAGE_RETRIES = Counter(
+    "stage_retries",
+    "Calls retried within a pipeline stage",
+    ["stage"]
+)
+
+# ♻️ Pipeline runs resumed from a checkpoint left by a failed attempt
+PIPELINE_RESUMES = Counter(
+    "pipeline_resumes",
+    "Pipeline runs resumed from a checkpoint"
+)
+
+
+def mark_worker_dead():
+    """
+    Drops this worker's live gauges from the aggregated /metrics once it exits
+    (multi-worker mode only). Its counters and histograms keep counting.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,107 @@
+import os
+import random
+from typing import Dict, List, Optional
+
+from agent.utils.redis_cache import normalize_question
+
+# Questions whose cached answers are refreshed ahead of expiry (0 = no prewarming)
+CACHE_PREWARM_TOP_N = int(os.getenv("CACHE_PREWARM_TOP_N", "0"))
+
+# Questions counted between two halvings of every count, so popularity follows recent traffic
+POPULARITY_DECAY_EVERY = int(os.getenv("POPULARITY_DECAY_EVERY", "10000"))
+
+# Seeds of the sketch's hash rows; fixed so estimates are reproducible within a process
+_rng = random.Random(20240704)
+
+
+class CountMinSketch:
+    """
+    Approximate per-key counts in `depth` rows of `width` counters.
+
+    A key increments one counter per row and its estimate is the smallest of them,
+    so estimates never undercount and overcount by about total / width at most
+    (with probability 1 - 2^-depth). Memory stays fixed however many distinct
+    questions arrive.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._seeds = [_rng.getrandbits(64) for _ in range(depth)]
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: str):
+        # hash() of str is stable within a process, which is all the sketch needs
+        return [(row, hash((seed, key)) % self.width) for row, seed in zip(self._rows, self._seeds)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        Counts `key` and returns its new estimate.
+        """
+        estimate = None
+        for row, cell in self._cells(key):
+            row[cell] += count
+            estimate = row[cell] if estimate is None else min(estimate, row[cell])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[cell] for row, cell in self._cells(key))
+
+    def decay(self):
+        """
+        Halves every counter.
+        """
+        for row in self._rows:
+            row[:] = [count >> 1 for count in row]
+
+
+class PopularityTracker:
+    """
+    Tracks how often each question is asked in this worker and keeps the most
+    asked ones.
+
+    Counts live in a CountMinSketch; only the `capacity` questions with the highest
+    estimates are remembered by text (a new question displaces the least popular
+    one once it is estimated to be asked more often). Every `decay_every` questions
+    all counts are halved, so questions that stop being asked drop out.
+    """
+
+    def __init__(
+        self,
+        capacity: int = max(4 * CACHE_PREWARM_TOP_N, 16),
+        decay_every: int = POPULARITY_DECAY_EVERY,
+        sketch: Optional[CountMinSketch] = None
+    ):
+        self.capacity = capacity
+        self.decay_every = decay_every
+        self.sketch = sketch or CountMinSketch()
+        # {normalized question: (estimate, question as last asked)}
+        self._top: Dict[str, tuple] = {}
+        self._since_decay = 0
+
+    def record(self, question: str):
+        """
+        Counts one request for `question`.
+        """
+        key = normalize_question(question)
+        estimate = self.sketch.add(key)
+        if key in self._top or len(self._top) < self.capacity:
+            self._top[key] = (estimate, question)
+        else:
+            coldest = min(self._top, key=lambda k: self._top[k][0])
+            if estimate > self._top[coldest][0]:
+                del self._top[coldest]
+                self._top[key] = (estimate, question)
+
+        self._since_decay += 1
+        if self.decay_every and self._since_decay >= self.decay_every:
+            self._since_decay = 0
+            self.sketch.decay()
+            self._top = {k: (count >> 1, q) for k, (count, q) in self._top.items() if count >> 1}
+
+    def top(self, n: int) -> List[str]:
+        """
+        The `n` most asked questions, most popular first.
+        """
+        ranked = sorted(self._top.values(), key=lambda entry: entry[0], reverse=True)
+        return [question for _, question in ranked[:n]]
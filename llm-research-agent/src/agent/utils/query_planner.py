@@ -0,0 +1,105 @@
+import os
+from typing import Iterable, List
+
+from agent.utils.metrics import SEARCH_QUERIES_PLANNED, SEARCH_QUERIES_PRUNED
+from agent.utils.retrieval import STOPWORDS, tokenize
+
+# Jaccard similarity of content words at or above which two queries count as the same search
+QUERY_DEDUP_SIMILARITY = float(os.getenv("QUERY_DEDUP_SIMILARITY", "0.6"))
+
+# Queries searched per round at most (0 = no cap); the most novel ones are kept
+QUERY_MAX_PER_ROUND = int(os.getenv("QUERY_MAX_PER_ROUND", "4"))
+
+
+def query_terms(query: str) -> frozenset:
+    """
+    Content words of a query (stopwords dropped, unless that leaves none).
+    """
+    tokens = tokenize(query)
+    return frozenset(token for token in tokens if token not in STOPWORDS) or frozenset(tokens)
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class QueryPlanner:
+    """
+    Decides which of a round's candidate queries are worth a search, given the
+    queries the request already searched.
+
+    A candidate is pruned when its content words overlap an already searched query
+    (or one picked earlier in the round) by at least `similarity` (Jaccard). The rest
+    are picked greedily by novelty, the share of their words not searched yet, so
+    each pick is the query adding the most new terms; ties keep the order the LLM
+    gave. At most `max_per_round` queries are picked per round.
+
+    Queries are a handful of words, so exact Jaccard over word sets is cheaper than
+    MinHash signatures here (see DocumentPool for the document-sized case).
+    """
+
+    def __init__(
+        self,
+        searched: Iterable[str] = (),
+        max_per_round: int = QUERY_MAX_PER_ROUND,
+        similarity: float = QUERY_DEDUP_SIMILARITY
+    ):
+        self.max_per_round = max_per_round
+        self.similarity = similarity
+        self.searched: List[str] = []
+        self._terms: List[frozenset] = []
+        self._seen = set()
+        for query in searched:
+            self._record(query)
+
+    def _record(self, query: str):
+        terms = query_terms(query)
+        self.searched.append(query)
+        self._terms.append(terms)
+        self._seen |= terms
+
+    def _repeats(self, terms: frozenset) -> bool:
+        return any(_jaccard(terms, earlier) >= self.similarity for earlier in self._terms)
+
+    def plan(self, queries: Iterable[str]) -> List[str]:
+        """
+        Picks the queries to search this round and adds them to the history.
+
+        Args:
+            queries (Iterable[str]): Candidate queries, most important first.
+
+        Returns:
+            List[str]: The picked queries, most novel first.
+        """
+        candidates = []
+        for query in queries:
+            if not isinstance(query, str) or not query.strip():
+                continue
+            terms = query_terms(query)
+            if self._repeats(terms):
+                SEARCH_QUERIES_PRUNED.labels("searched").inc()
+                continue
+            candidates.append((query, terms))
+
+        picked = []
+        while candidates:
+            if self.max_per_round and len(picked) >= self.max_per_round:
+                SEARCH_QUERIES_PRUNED.labels("fan_out").inc(len(candidates))
+                break
+            # The first candidate among those adding the most unseen words
+            best = max(
+                range(len(candidates)),
+                key=lambda i: (len(candidates[i][1] - self._seen) / max(1, len(candidates[i][1])), -i)
+            )
+            query, _ = candidates.pop(best)
+            picked.append(query)
+            self._record(query)
+            # Later candidates too close to this pick would repeat its search
+            kept = [(query, terms) for query, terms in candidates if not self._repeats(terms)]
+            SEARCH_QUERIES_PRUNED.labels("duplicate").inc(len(candidates) - len(kept))
+            candidates = kept
+
+        SEARCH_QUERIES_PLANNED.inc(len(picked))
+        return picked
@@ -0,0 +1,46 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each `acquire`
+    takes one token, sleeping until one is available. Waiters are served in arrival
+    order, so a burst of concurrent pipelines shares the quota fairly.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _get_lock(self) -> asyncio.Lock:
+        # asyncio.Lock is bound to one event loop; recreate it if the loop changes
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self):
+        """
+        Waits until a token is available and consumes it.
+        """
+        if self.rate <= 0:
+            return
+        async with self._get_lock():
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
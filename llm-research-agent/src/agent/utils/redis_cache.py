@@ -1,43 +1,345 @@
-import hashlib
+import os
+import uuid
+import time
 import json
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
 import redis
+import redis.asyncio as aioredis
 
-# Connect to Redis (assumes service name is "redis" in Docker or localhost setup)
-r = redis.Redis(host="redis", port=6379, decode_responses=True)
+from agent.utils.local_cache import LocalLRU
+from agent.utils.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_STALE_SERVED
 
-# Max number of cached items to retain
-MAX_CACHE = 50
+logger = logging.getLogger(__name__)
+
+# Max pooled connections per worker process
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+# Shared async Redis connection pool (REDIS_HOST is "redis" in docker-compose, localhost otherwise)
+redis_pool = aioredis.ConnectionPool(
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", "6379")),
+    db=0,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0")),
+    health_check_interval=30
+)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
 
 # Redis key prefix to avoid collisions with other keys
 KEY_PREFIX = "llm_cache:"
 
-def _hash_key(key: str) -> str:
+# Max number of cached answers to retain
+MAX_CACHE = int(os.getenv("CACHE_LIMIT", "50"))
+
+# Max total size of cached answers (bytes of serialized JSON)
+MAX_CACHE_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Seconds before a cached answer expires
+CACHE_TTL = int(os.getenv("CACHE_TTL", "86400"))
+
+# Seconds after which a cached answer is stale: still served, but refreshed in the
+# background (0 = answers stay fresh until CACHE_TTL)
+CACHE_SOFT_TTL = int(os.getenv("CACHE_SOFT_TTL", "0"))
+
+# In-process tier: max entries and seconds an answer may be served without asking Redis
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "1024"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "60"))
+
+
+# Returns the cached value and when it was stored, and refreshes its recency score in
+# the same round trip. A miss on a key that is still indexed means Redis expired it:
+# drop its bookkeeping.
+_GET_SCRIPT = """
+local value = redis.call("GET", KEYS[1])
+if value then
+    redis.call("ZADD", KEYS[2], ARGV[1], KEYS[1])
+    return {value, redis.call("HGET", KEYS[6], KEYS[1])}
+elseif redis.call("ZREM", KEYS[2], KEYS[1]) == 1 then
+    local size = redis.call("HGET", KEYS[3], KEYS[1])
+    redis.call("HDEL", KEYS[3], KEYS[1])
+    redis.call("HDEL", KEYS[5], KEYS[1])
+    redis.call("HDEL", KEYS[6], KEYS[1])
+    if size then redis.call("DECRBY", KEYS[4], size) end
+end
+return false
+"""
+
+# Stores the value, records its size, access and store time and question text, then evicts
+# least recently used entries until both the entry count and the byte budget fit.
+# Returns the number of evicted entries.
+_SET_SCRIPT = """
+local size = string.len(ARGV[1])
+local old = redis.call("HGET", KEYS[3], KEYS[1])
+if old then redis.call("DECRBY", KEYS[4], old) end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+redis.call("HSET", KEYS[3], KEYS[1], size)
+redis.call("INCRBY", KEYS[4], size)
+redis.call("ZADD", KEYS[2], ARGV[3], KEYS[1])
+redis.call("HSET", KEYS[5], KEYS[1], ARGV[6])
+redis.call("HSET", KEYS[6], KEYS[1], ARGV[3])
+
+local max_entries = tonumber(ARGV[4])
+local max_bytes = tonumber(ARGV[5])
+local evicted = 0
+while redis.call("ZCARD", KEYS[2]) > max_entries
+    or tonumber(redis.call("GET", KEYS[4]) or "0") > max_bytes do
+    local popped = redis.call("ZPOPMIN", KEYS[2])
+    if #popped == 0 then break end
+    local victim = popped[1]
+    local victim_size = redis.call("HGET", KEYS[3], victim)
+    redis.call("DEL", victim)
+    redis.call("HDEL", KEYS[3], victim)
+    redis.call("HDEL", KEYS[5], victim)
+    redis.call("HDEL", KEYS[6], victim)
+    if victim_size then redis.call("DECRBY", KEYS[4], victim_size) end
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+# Deletes an entry along with its recency, size, question and store time, so the
+# byte total and eviction order keep matching what is stored. Returns 1 if it was indexed.
+_DELETE_SCRIPT = """
+redis.call("DEL", KEYS[1])
+local size = redis.call("HGET", KEYS[3], KEYS[1])
+redis.call("HDEL", KEYS[3], KEYS[1])
+redis.call("HDEL", KEYS[5], KEYS[1])
+redis.call("HDEL", KEYS[6], KEYS[1])
+if size then redis.call("DECRBY", KEYS[4], size) end
+return redis.call("ZREM", KEYS[2], KEYS[1])
+"""
+
+
+def normalize_question(question: str) -> str:
     """
-    Create a hashed key using SHA-256 to avoid overly long or unsafe keys.
+    Canonical form of a question used for cache and coalescing keys.
     """
-    return KEY_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+    return question.strip().lower()
+
 
-def get_from_cache(query: str) -> dict | None:
+def _hash_key(prefix: str, key: str) -> str:
     """
-    Retrieve a cached result (if available) from Redis using the hashed query key.
+    Create a hashed key using SHA-256 to avoid overly long or unsafe keys.
     """
-    key = _hash_key(query)
-    data = r.get(key)
-    return json.loads(data) if data else None
+    return prefix + hashlib.sha256(key.encode()).hexdigest()
 
-def save_to_cache(query: str, answer: dict):
+
+class AnswerCache:
     """
-    Save an answer to Redis cache under a hashed key.
-    Also maintain an LRU-like list of recent keys with a max size limit.
+    Two-tier cache of pipeline answers: a per-worker LocalLRU in front of Redis.
+
+    Hot questions are served from process memory without a network round trip.
+    On a local miss the answer is read from Redis and promoted into the local tier.
+
+    In Redis each entry is a plain string key with a TTL. Recency lives in a sorted set
+    (member = entry key, score = last access time) and sizes in a hash plus a running
+    total, so eviction is a ZPOPMIN loop inside a Lua script instead of a KEYS scan.
+
+    A hash maps each entry key to its original question, so the semantic cache can
+    index exactly the questions Redis still holds.
+
+    Entries older than `soft_ttl` seconds are stale: they are still returned, and
+    `on_stale` is called with the question so the caller can refresh the answer in
+    the background (stale-while-revalidate). Store times live in a hash too.
+
+    Every write is published on the `<prefix>invalidate` channel in the same pipeline,
+    and `listen_for_invalidations` drops those keys from the other workers' local tiers.
+    Entries evicted by Redis itself linger locally for at most LOCAL_CACHE_TTL seconds.
+    Redis errors are logged and treated as misses so the pipeline keeps working
+    without a cache.
     """
-    key = _hash_key(query)
-    r.set(key, json.dumps(answer))
 
-    # Track recent keys in a Redis list (like LRU queue)
-    r.lpush(KEY_PREFIX + "keys", key)
-    r.ltrim(KEY_PREFIX + "keys", 0, MAX_CACHE - 1)
+    def __init__(
+        self,
+        client: aioredis.Redis = redis_client,
+        prefix: str = KEY_PREFIX,
+        max_entries: int = MAX_CACHE,
+        max_bytes: int = MAX_CACHE_BYTES,
+        ttl: int = CACHE_TTL,
+        local: Optional[LocalLRU] = None,
+        name: str = "answer",
+        soft_ttl: int = CACHE_SOFT_TTL,
+        on_stale: Optional[Callable[[str], None]] = None
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.local = local if local is not None else LocalLRU(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.on_stale = on_stale
+        self.channel = prefix + "invalidate"
+        self._origin = uuid.uuid4().hex
+        self._index_key = prefix + "lru"
+        self._sizes_key = prefix + "sizes"
+        self._total_key = prefix + "bytes"
+        self._questions_key = prefix + "questions"
+        self._stored_key = prefix + "stored"
+        self._get_script = client.register_script(_GET_SCRIPT)
+        self._set_script = client.register_script(_SET_SCRIPT)
+        self._delete_script = client.register_script(_DELETE_SCRIPT)
+
+    def key_for(self, question: str) -> str:
+        """
+        Returns the Redis key under which the answer to `question` is stored.
+        """
+        return _hash_key(self.prefix, normalize_question(question))
+
+    def _keys(self, key: str) -> list:
+        return [key, self._index_key, self._sizes_key, self._total_key, self._questions_key, self._stored_key]
+
+    def is_stale(self, stored_at: Optional[float]) -> bool:
+        """
+        Whether an answer stored at `stored_at` (epoch seconds) is past the soft TTL.
+        Answers of unknown age (written before store times were kept) only expire hard.
+        """
+        return bool(self.soft_ttl) and stored_at is not None and time.time() - stored_at >= self.soft_ttl
+
+    def _serve(self, question: str, answer: dict, stored_at: Optional[float]) -> dict:
+        if self.is_stale(stored_at):
+            CACHE_STALE_SERVED.labels(self.name).inc()
+            if self.on_stale is not None:
+                self.on_stale(question)
+        return answer
+
+    async def get(self, question: str, record_stats: bool = True, local: bool = True) -> Optional[dict]:
+        """
+        Retrieve a cached answer and mark it as recently used.
+
+        Args:
+            question (str): The user's question.
+            record_stats (bool): Count the lookup in the hit/miss metrics.
+            local (bool): Consult the in-process tier first.
+
+        Returns:
+            Optional[dict]: The cached answer, or None on a miss.
+        """
+        key = self.key_for(question)
+        if local:
+            entry = self.local.get(key)
+            if entry is not None:
+                if record_stats:
+                    CACHE_HITS.labels(self.name, "local").inc()
+                answer, stored_at = entry
+                # Copy so callers can annotate the response without touching the cache
+                return self._serve(question, dict(answer), stored_at)
+
+        try:
+            data = await self._get_script(keys=self._keys(key), args=[time.time()])
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Cache lookup failed: {e}")
+            data = None
+
+        if record_stats:
+            if data:
+                CACHE_HITS.labels(self.name, "redis").inc()
+            else:
+                CACHE_MISSES.labels(self.name).inc()
+        if not data:
+            return None
+
+        value, stored_at = data
+        answer = json.loads(value)
+        stored_at = float(stored_at) if stored_at else None
+        self._set_local(key, dict(answer), stored_at)
+        return self._serve(question, answer, stored_at)
+
+    async def set(self, question: str, answer: dict):
+        """
+        Save an answer in both tiers, evict least recently used Redis entries beyond
+        the entry-count or byte budget, and tell other workers to drop their copy.
+        """
+        key = self.key_for(question)
+        now = time.time()
+        self._set_local(key, dict(answer), now)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                await self._set_script(
+                    keys=self._keys(key),
+                    args=[json.dumps(answer), self.ttl, now, self.max_entries, self.max_bytes, question],
+                    client=pipe
+                )
+                pipe.publish(self.channel, f"{self._origin}:{key}")
+                evicted, _ = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Cache write failed: {e}")
+            return
+
+        if evicted:
+            CACHE_EVICTIONS.labels(self.name, "redis").inc(evicted)
+
+    async def invalidate(self, question: str):
+        """
+        Remove an answer from Redis and from every worker's local tier.
+        """
+        key = self.key_for(question)
+        self.local.delete(key)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                await self._delete_script(keys=self._keys(key), client=pipe)
+                pipe.publish(self.channel, f"{self._origin}:{key}")
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Cache invalidation failed: {e}")
+
+    async def questions(self) -> Optional[Dict[str, str]]:
+        """
+        Returns {entry key: question} for every answer cached in Redis, or None if
+        Redis is unreachable.
+        """
+        try:
+            return await self.client.hgetall(self._questions_key)
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Cache question listing failed: {e}")
+            return None
+
+    async def stored_times(self, questions: Iterable[str]) -> Optional[Dict[str, Optional[float]]]:
+        """
+        Returns {question: epoch seconds its answer was stored, or None if not cached}
+        in one round trip, or None if Redis is unreachable.
+        """
+        questions = list(questions)
+        if not questions:
+            return {}
+        try:
+            stored = await self.client.hmget(self._stored_key, [self.key_for(q) for q in questions])
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Cache store time lookup failed: {e}")
+            return None
+        return {q: float(at) if at else None for q, at in zip(questions, stored)}
+
+    def _set_local(self, key: str, answer: dict, stored_at: Optional[float]):
+        evicted = self.local.set(key, (answer, stored_at))
+        if evicted:
+            CACHE_EVICTIONS.labels(self.name, "local").inc(evicted)
 
-    # Delete old entries if over limit
-    current_keys = r.lrange(KEY_PREFIX + "keys", MAX_CACHE, -1)
-    for old_key in current_keys:
-        r.delete(old_key)
+    async def listen_for_invalidations(self, ready: Optional[asyncio.Event] = None):
+        """
+        Drops keys written or removed by other workers from the local tier.
+        Runs until cancelled; reconnects with a short back-off if Redis goes away.
+        Meant to be started once per worker as a background task.
+        """
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if ready is not None:
+                    ready.set()
+                async for message in pubsub.listen():
+                    origin, _, key = message["data"].partition(":")
+                    if origin != self._origin:
+                        self.local.delete(key)
+            except redis.RedisError as e:
+                logger.warning(f"⚠️ Cache invalidation listener disconnected: {e}")
+                # Anything may have changed while disconnected
+                self.local.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.close()
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import AsyncIterator, List, Optional
+
+from agent.types.document import Document
+from agent.utils.llm import DEFAULT_MODEL, LLM_MAX_CONCURRENCY, get_llm_provider, set_llm_client
+from agent.utils.search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# live: call Gemini and Google CSE; record: call them and append every request/response
+# to the cassette; replay: answer from the cassette without touching the network
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+PROVIDER_CASSETTE = os.getenv("PROVIDER_CASSETTE", "cassettes/pipeline.jsonl")
+
+# Replayed calls sleep for recorded latency × this factor (0 = answer instantly)
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "0"))
+
+
+class ReplayMiss(LookupError):
+    """
+    Raised when a replayed request was never recorded.
+    """
+
+
+def llm_key(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def search_key(query: str) -> str:
+    return normalize_query(query)
+
+
+class Cassette:
+    """
+    Recorded provider interactions, one JSON object per line:
+
+        {"kind": "llm" | "search", "key": ..., "request": {...},
+         "response": ..., "latency": seconds, ["chunks": [[offset, text], ...]], ["error": ...]}
+
+    Recording appends and flushes each interaction as it completes, so a crashed run
+    keeps everything captured so far. Identical requests recorded several times are
+    replayed in order, cycling once the recordings run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def append(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def next(self, kind: str, key: str, description: str) -> dict:
+        """
+        Returns the next recording for (kind, key).
+
+        Raises:
+            ReplayMiss: Nothing was recorded for this request.
+        """
+        entries = self._entries.get((kind, key))
+        if not entries:
+            raise ReplayMiss(f"No recorded {kind} response for {description} in {self.path}")
+        with self._lock:
+            cursor = self._cursors.get((kind, key), 0)
+            self._cursors[(kind, key)] = cursor + 1
+        return entries[cursor % len(entries)]
+
+
+def _replay_error(entry: dict) -> Exception:
+    return RuntimeError(f"Replayed failure: {entry['error']}")
+
+
+class RecordingLLM:
+    """
+    LLM provider that forwards to `inner` and records each call with its latency.
+    """
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.model = getattr(inner, "model", DEFAULT_MODEL)
+
+    def _record(self, prompt: str, model: str, started: float, **fields):
+        self.cassette.append({
+            "kind": "llm",
+            "key": llm_key(prompt, model),
+            "request": {"model": model, "prompt": prompt},
+            "latency": round(time.perf_counter() - started, 6),
+            **fields
+        })
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **options) -> str:
+        model = model or self.model
+        started = time.perf_counter()
+        try:
+            text = await self.inner.generate(prompt, model=model, **options)
+        except Exception as e:
+            self._record(prompt, model, started, response=None, error=repr(e))
+            raise
+        self._record(prompt, model, started, response=text)
+        return text
+
+    async def stream(self, prompt: str, model: Optional[str] = None, **options) -> AsyncIterator[str]:
+        model = model or self.model
+        started = time.perf_counter()
+        chunks = []
+        try:
+            async for chunk in self.inner.stream(prompt, model=model, **options):
+                chunks.append([round(time.perf_counter() - started, 6), chunk])
+                yield chunk
+        except Exception as e:
+            self._record(prompt, model, started, response=None, chunks=chunks, error=repr(e))
+            raise
+        self._record(prompt, model, started, response="".join(text for _, text in chunks), chunks=chunks)
+
+
+class ReplayLLM:
+    """
+    LLM provider that answers from a cassette.
+
+    Recorded latencies are reproduced × `latency_scale`, and at most `max_concurrency`
+    calls "run" at once, mirroring the thread pool cap of LLMClient. Streamed calls
+    replay their recorded chunk timing; plain recordings are streamed as one chunk.
+    Calls are keyed by prompt and model only: a given prompt always comes with the
+    same response schema.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        latency_scale: float = REPLAY_LATENCY_SCALE,
+        model: str = DEFAULT_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY
+    ):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def _lookup(self, prompt: str, model: Optional[str]) -> dict:
+        model = model or self.model
+        return self.cassette.next("llm", llm_key(prompt, model), f"prompt {prompt[:60]!r}")
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # asyncio.Semaphore is bound to one event loop; recreate it if the loop changes
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def generate(self, prompt: str, model: Optional[str] = None, schema: Optional[dict] = None) -> str:
+        entry = self._lookup(prompt, model)
+        async with self._get_semaphore():
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        if entry.get("error"):
+            raise _replay_error(entry)
+        return entry["response"]
+
+    async def stream(self, prompt: str, model: Optional[str] = None, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        entry = self._lookup(prompt, model)
+        chunks = entry.get("chunks")
+        if chunks is None:
+            chunks = [[entry["latency"], entry["response"] or ""]]
+        async with self._get_semaphore():
+            elapsed = 0.0
+            for offset, text in chunks:
+                await asyncio.sleep(max(0.0, offset - elapsed) * self.latency_scale)
+                elapsed = offset
+                yield text
+            await asyncio.sleep(max(0.0, entry["latency"] - elapsed) * self.latency_scale)
+        if entry.get("error"):
+            raise _replay_error(entry)
+
+
+class RecordingSearch:
+    """
+    Search provider that forwards to `inner` and records each query with its latency.
+    """
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def search(self, query: str) -> List[Document]:
+        started = time.perf_counter()
+        entry = {"kind": "search", "key": search_key(query), "request": {"query": query}}
+        try:
+            docs = await self.inner.search(query)
+        except Exception as e:
+            entry.update(response=None, error=repr(e), latency=round(time.perf_counter() - started, 6))
+            self.cassette.append(entry)
+            raise
+        entry.update(response=[list(doc[:3]) for doc in docs], latency=round(time.perf_counter() - started, 6))
+        self.cassette.append(entry)
+        return docs
+
+
+class ReplaySearch:
+    """
+    Search provider that answers from a cassette, sleeping for the recorded latency × `latency_scale`.
+    """
+
+    def __init__(self, cassette: Cassette, latency_scale: float = REPLAY_LATENCY_SCALE):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+
+    async def search(self, query: str) -> List[Document]:
+        entry = self.cassette.next("search", search_key(query), f"query {query!r}")
+        await asyncio.sleep(entry["latency"] * self.latency_scale)
+        if entry.get("error"):
+            raise _replay_error(entry)
+        return [Document(*item) for item in entry["response"]]
+
+
+def configure_providers(
+    mode: str = PROVIDER_MODE,
+    path: str = PROVIDER_CASSETTE,
+    latency_scale: float = REPLAY_LATENCY_SCALE
+) -> Optional[Cassette]:
+    """
+    Installs the LLM and search providers for `mode` process-wide.
+
+    Args:
+        mode (str): "live", "record" or "replay".
+        path (str): Cassette file to append to (record) or answer from (replay).
+        latency_scale (float): Replay only; multiplier for the recorded latencies.
+
+    Returns:
+        Cassette: The cassette in use, or None in live mode.
+    """
+    # Imported here: websearch pulls in the HTTP and Redis stack, which replay itself does not need
+    from agent.tools.websearch import WebSearchTool, set_search_provider
+
+    if mode == "live":
+        return None
+
+    cassette = Cassette(path)
+    if mode == "record":
+        set_llm_client(RecordingLLM(get_llm_provider(), cassette))
+        set_search_provider(RecordingSearch(WebSearchTool(cache=None), cassette))
+    elif mode == "replay":
+        set_llm_client(ReplayLLM(cassette, latency_scale))
+        set_search_provider(ReplaySearch(cassette, latency_scale))
+    else:
+        raise ValueError(f"Unknown PROVIDER_MODE {mode!r}; expected live, record or replay")
+
+    logger.info("🎞️ Providers in %s mode using %s (%d recorded calls)", mode, path, len(cassette))
+    return cassette
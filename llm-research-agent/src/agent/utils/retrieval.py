@@ -0,0 +1,230 @@
+import os
+import re
+import math
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from agent.types.document import Document
+from agent.utils.metrics import CONTEXT_DOCS_DROPPED, CONTEXT_TOKENS
+
+# Estimated prompt tokens the documents may take in a reflect/synthesize prompt (0 = no limit)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Jaccard similarity of word shingles at or above which two snippets count as duplicates
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.8"))
+
+SHINGLE_SIZE = 3
+MINHASH_BANDS = 8
+MINHASH_ROWS = 2
+
+# Characters per token for Gemini-style tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+# Per-document prompt overhead ("[12] Title: ...\nSnippet: ...\nURL: ...\n\n")
+_DOC_OVERHEAD_CHARS = 32
+_CONTENT_OVERHEAD_CHARS = 15
+
+# MinHash "permutations": XOR masks over a 64-bit shingle hash. Cheap in pure Python but
+# only approximately min-wise independent, so LSH finds candidates and exact Jaccard decides
+_HASH_MASK = (1 << 64) - 1
+_rng = random.Random(20240611)
+_PERMUTATIONS = [_rng.getrandbits(64) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Function words and the request phrasing around questions ("can you tell me ..."):
+# no query, snippet or cached question is matched on them
+STOPWORDS = frozenset(
+    "a an and are as at be by can could did do does for from how i in is it me my of on or "
+    "please should tell the to was were what when where which who whom whose why will with "
+    "would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens; underscores split words so slot names like "goal_scorers" match text.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def document_tokens(doc: Document) -> int:
+    """
+    Estimated prompt tokens of one document as the nodes format it.
+    """
+    chars = len(doc.title or "") + len(doc.snippet or "") + len(doc.url or "") + _DOC_OVERHEAD_CHARS
+    if doc.content:
+        chars += len(doc.content) + _CONTENT_OVERHEAD_CHARS
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical URL for duplicate detection: scheme, "www.", fragment and trailing slash are ignored.
+    """
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    return f"{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _shingles(text: str) -> frozenset:
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return frozenset([" ".join(tokens)])
+    return frozenset(" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+
+def _signature(shingles: frozenset) -> List[int]:
+    # hash() of str is stable within a process, which is all the signatures need
+    hashes = [hash(shingle) & _HASH_MASK for shingle in shingles]
+    return [min([h ^ mask for h in hashes]) for mask in _PERMUTATIONS]
+
+
+class DocumentPool:
+    """
+    Documents gathered across search rounds for one question, without duplicates.
+
+    A document is dropped when its URL was already seen, or when the word shingles of
+    its title and snippet overlap an earlier document's by at least `similarity`
+    (Jaccard). MinHash LSH bands pick the earlier documents worth comparing, so each
+    new document is only checked against likely matches.
+    """
+
+    def __init__(self, similarity: float = DEDUP_SIMILARITY):
+        self.similarity = similarity
+        self.docs: List[Document] = []
+        self._urls = set()
+        self._shingles: List[frozenset] = []
+        self._buckets: Dict[tuple, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, docs: Iterable[Document]) -> List[Document]:
+        """
+        Adds documents in order, skipping duplicates.
+
+        Returns:
+            List[Document]: The documents that were new.
+        """
+        added = []
+        for doc in docs:
+            url = normalize_url(doc.url)
+            if url in self._urls:
+                CONTEXT_DOCS_DROPPED.labels("duplicate_url").inc()
+                continue
+
+            shingles = _shingles(f"{doc.title or ''} {doc.snippet or ''}")
+            signature = _signature(shingles)
+            bands = [
+                (band, tuple(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]))
+                for band in range(MINHASH_BANDS)
+            ]
+            candidates = {index for key in bands for index in self._buckets.get(key, ())}
+            if any(self._jaccard(shingles, self._shingles[i]) >= self.similarity for i in candidates):
+                CONTEXT_DOCS_DROPPED.labels("near_duplicate").inc()
+                continue
+
+            index = len(self.docs)
+            for key in bands:
+                self._buckets.setdefault(key, []).append(index)
+            self._shingles.append(shingles)
+            self._urls.add(url)
+            self.docs.append(doc)
+            added.append(doc)
+        return added
+
+    @staticmethod
+    def _jaccard(a: frozenset, b: frozenset) -> float:
+        return len(a & b) / len(a | b)
+
+
+def bm25_scores(query: List[str], documents: List[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """
+    Okapi BM25 score of each tokenized document for the query tokens, with IDF taken
+    from the documents themselves.
+    """
+    if not documents:
+        return []
+    n = len(documents)
+    avg_len = sum(len(tokens) for tokens in documents) / n or 1.0
+    frequencies = [Counter(tokens) for tokens in documents]
+    document_frequency = Counter(term for counts in frequencies for term in counts)
+    terms = [term for term in set(query) if term in document_frequency]
+    idf = {
+        term: math.log(1 + (n - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in terms
+    }
+
+    scores = []
+    for tokens, counts in zip(documents, frequencies):
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        scores.append(sum(
+            idf[term] * counts[term] * (k1 + 1) / (counts[term] + norm)
+            for term in terms if term in counts
+        ))
+    return scores
+
+
+def rank_documents(question: str, docs: List[Document], slots: Optional[List[str]] = None) -> List[Document]:
+    """
+    Orders documents by BM25 relevance to the question and its information slots
+    (stable: ties keep search order).
+    """
+    query = [token for token in tokenize(question) if token not in STOPWORDS]
+    for slot in slots or []:
+        query += tokenize(slot)
+    scores = bm25_scores(query, [tokenize(f"{doc.title or ''} {doc.snippet or ''}") for doc in docs])
+    order = sorted(range(len(docs)), key=lambda i: -scores[i])
+    return [docs[i] for i in order]
+
+
+def pack_documents(docs: List[Document], budget: int) -> List[Document]:
+    """
+    Greedily keeps documents in the given order while they fit in `budget` estimated
+    tokens, skipping ones that do not fit. The first document is always kept.
+    """
+    if budget <= 0:
+        return list(docs)
+    packed = []
+    used = 0
+    for doc in docs:
+        cost = document_tokens(doc)
+        if packed and used + cost > budget:
+            continue
+        packed.append(doc)
+        used += cost
+    return packed
+
+
+def select_context(
+    question: str,
+    docs: List[Document],
+    slots: Optional[List[str]] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET
+) -> List[Document]:
+    """
+    Picks the documents to put in a reflect/synthesize prompt: ranked by BM25 against
+    the question and slots, most relevant first, packed into the token budget.
+
+    Args:
+        question (str): The user's question.
+        docs (List[Document]): Deduplicated candidate documents (see DocumentPool).
+        slots (List[str], optional): Information slots; their words join the query.
+        budget (int): Estimated prompt tokens available for documents (0 = no limit).
+
+    Returns:
+        List[Document]: The documents to send, in prompt order.
+    """
+    context = pack_documents(rank_documents(question, docs, slots), budget)
+    CONTEXT_DOCS_DROPPED.labels("budget").inc(len(docs) - len(context))
+    CONTEXT_TOKENS.observe(sum(document_tokens(doc) for doc in context))
+    return context
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, List
+
+import redis
+import redis.asyncio as aioredis
+
+from agent.types.document import Document
+from agent.utils.metrics import CACHE_HITS, CACHE_MISSES
+from agent.utils.redis_cache import redis_client
+from agent.utils.retrieval import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Redis key prefix for per-query search results
+KEY_PREFIX = "search_cache:"
+
+# Seconds a non-empty result list is reused
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))
+
+# Seconds an empty result list is reused (negative caching)
+SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "300"))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query: lowercase words separated by single spaces,
+    so "2022 World Cup final score" and "2022 world cup final score?" share an entry.
+    """
+    return " ".join(_WORD_RE.findall(query.lower()))
+
+
+def query_key(query: str) -> str:
+    """
+    Order-insensitive form of a query's content words, shared by near-identical
+    queries such as "2022 world cup winner" and "winner of the 2022 World Cup".
+    """
+    normalized = normalize_query(query)
+    words = sorted({word for word in normalized.split() if word not in STOPWORDS})
+    return " ".join(words) or normalized
+
+
+class SearchCache:
+    """
+    Redis cache of Google CSE results, keyed by normalized query text.
+
+    Documents are stored as compact JSON arrays of [title, snippet, url].
+    Empty results are cached too, under a shorter TTL, so queries with no hits
+    do not spend quota on every request. Lookups and writes for a whole batch of
+    queries each take a single round trip (MGET / pipelined SET EX).
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis = redis_client,
+        prefix: str = KEY_PREFIX,
+        ttl: int = SEARCH_CACHE_TTL,
+        negative_ttl: int = SEARCH_CACHE_NEGATIVE_TTL
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def key_for(self, query: str) -> str:
+        return self.prefix + hashlib.sha256(normalize_query(query).encode()).hexdigest()
+
+    async def get_many(self, queries: List[str]) -> Dict[str, List[Document]]:
+        """
+        Looks up several queries at once.
+
+        Returns:
+            Dict[str, List[Document]]: Cached results for the queries that hit;
+            misses are absent from the dict.
+        """
+        if not queries:
+            return {}
+        try:
+            values = await self.client.mget([self.key_for(q) for q in queries])
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Search cache lookup failed: {e}")
+            values = [None] * len(queries)
+
+        hits = {}
+        for query, value in zip(queries, values):
+            if value is None:
+                CACHE_MISSES.labels("search").inc()
+                continue
+            CACHE_HITS.labels("search", "redis").inc()
+            hits[query] = [Document(*fields) for fields in json.loads(value)]
+        return hits
+
+    async def set_many(self, results: Dict[str, List[Document]]):
+        """
+        Stores results for several queries, using the negative TTL for empty lists.
+        """
+        if not results:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for query, docs in results.items():
+                    payload = json.dumps([doc[:3] for doc in docs], separators=(",", ":"))
+                    pipe.set(self.key_for(query), payload, ex=self.ttl if docs else self.negative_ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Search cache write failed: {e}")
+
+
+search_cache = SearchCache()
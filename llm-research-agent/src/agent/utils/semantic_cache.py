@@ -0,0 +1,255 @@
+import os
+import math
+import time
+import zlib
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from agent.utils.metrics import CACHE_HITS, SEMANTIC_CACHE_SIMILARITY
+from agent.utils.redis_cache import AnswerCache
+from agent.utils.retrieval import STOPWORDS, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Serve a cached answer for a differently worded question (off by default: a wrong
+# match returns another question's answer)
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+
+# Minimum cosine similarity between question vectors for a semantic hit
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+
+# Seconds before the index is resynced with the questions cached in Redis
+SEMANTIC_CACHE_REFRESH = float(os.getenv("SEMANTIC_CACHE_REFRESH", "30"))
+
+# Hashed feature space: 2^20 buckets keeps collisions rare for question-sized texts
+_FEATURE_BITS = 20
+_FEATURE_MASK = (1 << _FEATURE_BITS) - 1
+
+# Irregular forms the suffix stripper cannot reach
+_LEMMAS = {
+    "won": "win", "built": "build", "began": "begin", "begun": "begin", "wrote": "write",
+    "written": "write", "made": "make", "found": "find", "took": "take", "taken": "take",
+    "gave": "give", "given": "give", "ran": "run", "led": "lead", "held": "hold",
+    "bought": "buy", "sold": "sell", "became": "become", "fought": "fight", "thought": "think",
+    "died": "die", "dying": "die", "children": "child", "people": "person", "men": "man", "women": "woman",
+}
+
+_SUFFIXES = ("ing", "ers", "er", "ed", "es", "s")
+
+
+def lemma(word: str) -> str:
+    """
+    Crude stem: irregular forms from a table, then one suffix stripped
+    ("winner" → "win", "formed" → "form", "holes" → "hole").
+    """
+    if word in _LEMMAS:
+        return _LEMMAS[word]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # Undo consonant doubling: "winn" → "win", "stopp" → "stop"
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+                word = word[:-1]
+            break
+    return word
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f"#{word}#"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _feature(kind: str, text: str) -> int:
+    return zlib.crc32(f"{kind}:{text}".encode("utf-8")) & _FEATURE_MASK
+
+
+class QuestionVector(NamedTuple):
+    """
+    A question embedded for matching.
+
+    Attributes:
+        weights (Dict[int, float]): L2-normalized sparse vector of hashed word and
+            character-trigram features.
+        words (frozenset): Lemmatized content words.
+        numbers (frozenset): Numeric tokens, which must match exactly ("2018" ≠ "2022").
+    """
+    weights: Dict[int, float]
+    words: frozenset
+    numbers: frozenset
+
+
+def embed(question: str) -> QuestionVector:
+    """
+    Embeds a question as hashed word + character-trigram counts (the trigrams make
+    spelling and inflection variants overlap), L2-normalized so a dot product is the
+    cosine similarity.
+    """
+    words = [lemma(token) for token in tokenize(question) if token not in STOPWORDS]
+    weights: Dict[int, float] = {}
+    for word in words:
+        feature = _feature("w", word)
+        weights[feature] = weights.get(feature, 0.0) + 1.0
+        grams = _trigrams(word)
+        for gram in grams:
+            feature = _feature("c", gram)
+            weights[feature] = weights.get(feature, 0.0) + 1.0 / len(grams)
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return QuestionVector(
+        {feature: w / norm for feature, w in weights.items()},
+        frozenset(word for word in words if not word.isdigit()),
+        frozenset(word for word in words if word.isdigit())
+    )
+
+
+def _similar_word(word: str, others: frozenset) -> bool:
+    grams = set(_trigrams(word))
+    for other in others:
+        other_grams = set(_trigrams(other))
+        if len(grams & other_grams) / len(grams | other_grams) >= 0.5:
+            return True
+    return False
+
+
+def compatible(a: QuestionVector, b: QuestionVector) -> bool:
+    """
+    Guards a vector match against the cases cosine similarity cannot see: different
+    numbers, or a content word swapped for an unrelated one on both sides
+    ("... for Argentina" vs "... for France"). Extra words on one side only are fine.
+    """
+    if a.numbers != b.numbers:
+        return False
+    only_a = [word for word in a.words - b.words if not _similar_word(word, b.words)]
+    only_b = [word for word in b.words - a.words if not _similar_word(word, a.words)]
+    return not (only_a and only_b)
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity search over sparse question vectors.
+
+    Vectors are kept in an inverted index (feature → {key: weight}), so a query only
+    touches the entries that share one of its features, instead of scanning them all.
+    """
+
+    def __init__(self):
+        self._postings: Dict[int, Dict[str, float]] = {}
+        self._entries: Dict[str, Tuple[str, QuestionVector]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def add(self, key: str, question: str, vector: Optional[QuestionVector] = None):
+        self.remove(key)
+        vector = vector or embed(question)
+        self._entries[key] = (question, vector)
+        for feature, weight in vector.weights.items():
+            self._postings.setdefault(feature, {})[key] = weight
+
+    def remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for feature in entry[1].weights:
+            posting = self._postings.get(feature)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[feature]
+
+    def search(self, vector: QuestionVector, limit: int = 5) -> List[Tuple[float, str, str, QuestionVector]]:
+        """
+        Returns up to `limit` (similarity, key, question, vector) tuples, most similar first.
+        """
+        scores: Dict[str, float] = {}
+        for feature, weight in vector.weights.items():
+            for key, other in self._postings.get(feature, {}).items():
+                scores[key] = scores.get(key, 0.0) + weight * other
+        best = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(score, key, *self._entries[key]) for key, score in best]
+
+
+class SemanticCache:
+    """
+    Finds a cached answer for a question worded differently from the one it was cached under.
+
+    The index mirrors the question hash that AnswerCache keeps next to its entries in
+    Redis (the eviction script removes both together). Each worker reloads it at most
+    every `refresh` seconds and adds its own writes immediately; a matched entry that
+    Redis has since dropped is removed on the spot and the lookup is a miss.
+    """
+
+    def __init__(
+        self,
+        cache: AnswerCache,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        refresh: float = SEMANTIC_CACHE_REFRESH
+    ):
+        self.cache = cache
+        self.threshold = threshold
+        self.refresh = refresh
+        self.index = VectorIndex()
+        self._loaded_at = float("-inf")
+
+    async def load(self):
+        """
+        Syncs the index with the questions currently cached in Redis.
+        """
+        questions = await self.cache.questions()
+        self._loaded_at = time.monotonic()
+        if questions is None:
+            return
+        for key in self.index.keys():
+            if key not in questions:
+                self.index.remove(key)
+        for key, question in questions.items():
+            if key not in self.index:
+                self.index.add(key, question)
+
+    def add(self, question: str):
+        """
+        Indexes a question this worker just cached.
+        """
+        self.index.add(self.cache.key_for(question), question)
+        # Bounded even while Redis is unreachable and syncs cannot prune: an answer can
+        # only still be cached in one of the two tiers
+        while len(self.index) > self.cache.max_entries + self.cache.local.max_entries:
+            self.index.remove(self.index.keys()[0])
+
+    async def get(self, question: str) -> Optional[dict]:
+        """
+        Returns the cached answer of the most similar cached question, or None.
+
+        Args:
+            question (str): The user's question (already an exact-key miss).
+
+        Returns:
+            Optional[dict]: The answer with a "cache" block giving the matched question
+            and its similarity, or None when nothing passes the threshold and guards.
+        """
+        if time.monotonic() - self._loaded_at >= self.refresh:
+            await self.load()
+
+        vector = embed(question)
+        candidates = self.index.search(vector)
+        SEMANTIC_CACHE_SIMILARITY.observe(candidates[0][0] if candidates else 0.0)
+
+        for similarity, key, matched, other in candidates:
+            if similarity < self.threshold:
+                break
+            if not compatible(vector, other):
+                continue
+            answer = await self.cache.get(matched, record_stats=False)
+            if answer is None:
+                # Evicted or expired in Redis since the last sync
+                self.index.remove(key)
+                continue
+            CACHE_HITS.labels(self.cache.name, "semantic").inc()
+            answer["cache"] = {"match": "semantic", "similarity": round(similarity, 4), "question": matched}
+            return answer
+        return None
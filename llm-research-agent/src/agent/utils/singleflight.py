@@ -0,0 +1,121 @@
+import uuid
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-delete so a worker only ever releases a lock it still owns
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Compare-and-expire: only the owner extends its lease
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the work; every caller that arrives
+    while it is still running (a follower) awaits the leader's result instead of
+    repeating the work. Exceptions raised by the leader are re-raised to all followers.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs `fn` once per key among concurrent callers.
+
+        The work runs in its own task, so a leader whose request is cancelled
+        (e.g. the client disconnects) does not cancel it for the followers.
+
+        Args:
+            key (str): Identifies identical work.
+            fn (Callable): Zero-argument coroutine function producing the result.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it was shared from another caller.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+class RedisLock:
+    """
+    Best-effort cross-worker lock built on SET NX PX.
+
+    Used to elect a single leader across uvicorn workers: the holder computes the
+    result, everyone else waits for it to appear in the shared cache.
+    """
+
+    def __init__(self, client: aioredis.Redis, prefix: str = "llm_lock:", ttl_ms: int = 60000):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_ms = ttl_ms
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._extend = client.register_script(_EXTEND_SCRIPT)
+
+    async def acquire(self, key: str) -> Optional[str]:
+        """
+        Tries to take the lock once. Returns an ownership token, or None if it is held.
+        If Redis is unreachable the caller proceeds as leader with an empty token.
+        """
+        token = uuid.uuid4().hex
+        try:
+            if await self.client.set(self.prefix + key, token, nx=True, px=self.ttl_ms):
+                return token
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Single-flight lock unavailable: {e}")
+            return ""
+        return None
+
+    async def release(self, key: str, token: str):
+        """
+        Releases the lock if `token` still owns it.
+        """
+        if not token:
+            return
+        try:
+            await self._release(keys=[self.prefix + key], args=[token])
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Failed to release single-flight lock: {e}")
+
+    async def extend(self, key: str, token: str) -> bool:
+        """
+        Resets the lock's expiry to `ttl_ms` if `token` still owns it. Returns False
+        once the lock was lost; an empty token (Redis was unreachable) is never lost.
+        """
+        if not token:
+            return True
+        try:
+            return bool(await self._extend(keys=[self.prefix + key], args=[token, self.ttl_ms]))
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ Failed to extend single-flight lock: {e}")
+            return True
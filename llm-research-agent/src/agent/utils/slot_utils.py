@@ -1,33 +1,103 @@
 import os
 import json
-from typing import List
-from dotenv import load_dotenv
-from google import genai
+import hashlib
+import logging
+from typing import List, Optional
 
-# Load environment variables from .env file (especially GEMINI_API_KEY)
-load_dotenv()
+import redis
 
-def get_genai_client():
+from agent.utils.llm import get_llm_client
+from agent.utils.local_cache import LocalLRU
+from agent.utils.logging_setup import log_payload
+from agent.utils.metrics import CACHE_HITS, CACHE_MISSES
+from agent.utils.redis_cache import redis_client, normalize_question, LOCAL_CACHE_SIZE
+from agent.utils.singleflight import SingleFlight
+from agent.utils.structured import parse_json_reply
+
+logger = logging.getLogger(__name__)
+
+# Slots depend only on the question, so they can be kept much longer than answers
+SLOT_CACHE_PREFIX = "slot_cache:"
+SLOT_CACHE_TTL = int(os.getenv("SLOT_CACHE_TTL", str(7 * 86400)))
+
+# Response schema of the slot extraction reply
+SLOTS_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+_local_slots = LocalLRU(max_entries=LOCAL_CACHE_SIZE, ttl=SLOT_CACHE_TTL)
+_slot_flight = SingleFlight()
+
+def _slot_key(question: str) -> str:
+    return SLOT_CACHE_PREFIX + hashlib.sha256(normalize_question(question).encode()).hexdigest()
+
+async def get_cached_slots(question: str) -> Optional[List[str]]:
+    """
+    Looks up previously extracted slots for a question, in process memory first
+    and then in Redis. Returns None if they are not cached.
+    """
+    key = _slot_key(question)
+    slots = _local_slots.get(key)
+    if slots is not None:
+        CACHE_HITS.labels("slots", "local").inc()
+        return list(slots)
+
+    try:
+        data = await redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Slot cache lookup failed: {e}")
+        data = None
+
+    if data is None:
+        CACHE_MISSES.labels("slots").inc()
+        return None
+
+    CACHE_HITS.labels("slots", "redis").inc()
+    slots = json.loads(data)
+    _local_slots.set(key, slots)
+    return list(slots)
+
+async def store_slots(question: str, slots: List[str]):
     """
-    Creates and returns a Gemini API client using the API key from environment variables.
+    Caches the slots for a question in process memory and in Redis.
     """
-    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    key = _slot_key(question)
+    _local_slots.set(key, list(slots))
+    try:
+        await redis_client.set(key, json.dumps(slots), ex=SLOT_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Slot cache write failed: {e}")
 
-def extract_slots_llm(question: str) -> List[str]:
+async def extract_slots_llm(question: str) -> List[str]:
     """
     Uses Gemini to extract the relevant 'information slots' from a user's question.
     
     These slots are key pieces of information (e.g., 'winner', 'date') that need to be filled 
     in order to fully answer the question.
 
+    Results are memoized per normalized question (in process and in Redis), and
+    concurrent extractions for the same question share a single Gemini call.
+
     Parameters:
     - question (str): the input question from the user
 
     Returns:
     - List[str]: a list of slot names extracted from the question
     """
-    client = get_genai_client()
+    slots = await get_cached_slots(question)
+    if slots is not None:
+        return slots
 
+    slots, _ = await _slot_flight.do(_slot_key(question), lambda: _extract_and_store(question))
+    return list(slots)
+
+async def _extract_and_store(question: str) -> List[str]:
+    slots = await _extract_slots_uncached(question)
+    if slots is None:
+        # Parse failures are not cached so the next request can try again
+        return []
+    await store_slots(question, slots)
+    return slots
+
+async def _extract_slots_uncached(question: str) -> Optional[List[str]]:
     # Construct a prompt that instructs the model to return only the required slots as a JSON array
     prompt = f"""
 You are a helpful assistant that extracts relevant information "slots" from a user question.
@@ -50,21 +120,15 @@ Do not explain your answer. Just return a JSON list of slot strings.
 Question: {question}
 """
 
-    # Send the prompt to Gemini
-    response = client.models.generate_content(
-        model="gemini-1.5-flash",
-        contents=[{"parts": [{"text": prompt}]}]
-    )
+    # Send the prompt to Gemini and extract the raw text response
+    text = (await get_llm_client().generate(prompt, schema=SLOTS_SCHEMA)).strip()
+    log_payload(logger, "📤 Raw slots from LLM", text)
 
-    # Extract the raw text response from Gemini
-    text = response.text.strip() if hasattr(response, "text") else str(response)
-    print("📤 Raw slots from LLM:", text)
-
-    # Try to parse the JSON string into a Python list
+    # Parse the JSON list (repairing fences, trailing commas and cut-off replies)
     try:
-        slots = json.loads(text)
-        # Ensure all items in the list are strings
-        return [slot for slot in slots if isinstance(slot, str)]
-    except Exception as e:
-        print("⚠️ Failed to parse slot list:", e)
-        return []
+        slots = parse_json_reply(text, expect="[")
+    except ValueError as e:
+        logger.warning("⚠️ Failed to parse slot list: %s", e)
+        return None
+    # Ensure all items in the list are strings
+    return [slot for slot in slots if isinstance(slot, str)]
@@ -0,0 +1,46 @@
+import os
+from typing import Any, Optional, Union
+
+from google.genai import types
+
+from agent.utils.instrumentation import record_json_reply
+from agent.utils.json_stream import JsonExtractor
+
+# Ask Gemini for JSON matching each node's response schema (response_mime_type +
+# response_schema) instead of relying on the prompt alone
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+
+def response_config(schema: Optional[dict]) -> Optional[types.GenerateContentConfig]:
+    """
+    Generation config constraining the reply to `schema` (Gemini's OpenAPI subset),
+    or None for a plain text reply.
+    """
+    if schema is None or not LLM_STRUCTURED_OUTPUT:
+        return None
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=schema)
+
+
+def parse_json_reply(reply: Union[str, JsonExtractor], expect: str = "{") -> Any:
+    """
+    Parses an LLM reply as JSON, repairing what can be repaired (see JsonExtractor),
+    and counts the outcome against the current stage.
+
+    Args:
+        reply: The raw reply text, or a JsonExtractor it was already fed to while streaming.
+        expect (str): "{" for an object or "[" for an array.
+
+    Raises:
+        ValueError: The reply holds no parseable JSON value of that kind.
+    """
+    extractor = reply
+    if isinstance(reply, str):
+        extractor = JsonExtractor(expect)
+        extractor.feed(reply)
+    try:
+        value = extractor.value()
+    except ValueError:
+        record_json_reply("failed")
+        raise
+    record_json_reply("repaired" if extractor.repaired else "clean")
+    return value
@@ -3,6 +3,7 @@
 import sys
 import os
 import asyncio
+import argparse
 import json
 
 # ✅ Add the current directory (/app/src) to PYTHONPATH
@@ -11,17 +12,76 @@ import json
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from agent.pipeline import run_pipeline
+from agent.batch import BATCH_CONCURRENCY, file_lines, run_batch
 from agent.utils.telemetry import setup_tracer
+from agent.utils.logging_setup import setup_logging, shutdown_logging
+from agent.utils.replay import configure_providers
+from agent.utils.http_client import close_http_client
+from agent.utils.document_store import document_store
+
+async def close_clients():
+    """
+    Closes the shared outbound HTTP client and the document store's SQLite handle,
+    like the API server's lifespan does on shutdown.
+    """
+    await close_http_client()
+    if document_store:
+        document_store.close()
+
+async def answer_batch(path: str, output: str, concurrency: int):
+    """
+    Answers every question of an NDJSON file, writing each result line as soon as
+    it completes (to `output`, or stdout for "-").
+    """
+    out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    try:
+        async for result in run_batch(file_lines(path), concurrency):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await close_clients()
+
+async def answer_question(question: str) -> dict:
+    try:
+        return await run_pipeline(question)
+    finally:
+        await close_clients()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a question (or a batch of questions) with cited web research.")
+    parser.add_argument("question", nargs="?", default="What is AI?")
+    parser.add_argument("--batch", metavar="FILE", help="NDJSON file of {\"question\": ..., \"id\": ...} lines")
+    parser.add_argument("--output", default="-", help="Where batch results are written (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Questions answered at once in batch mode")
+    args = parser.parse_args()
+
+    # 📝 Logs go to stderr, so stdout carries only the JSON result(s)
+    setup_logging()
+
     # 🔧 Initialize OpenTelemetry tracer for tool performance monitoring and observability
     setup_tracer()
 
+    # 🎞️ Live Gemini/CSE by default; PROVIDER_MODE=record|replay captures or replays a cassette
+    configure_providers()
+
+    if args.batch:
+        # 📦 Batch mode: one NDJSON result line per question, in completion order
+        try:
+            asyncio.run(answer_batch(args.batch, args.output, args.concurrency))
+        finally:
+            shutdown_logging()
+        sys.exit(0)
+
     # ❓ Get the question from command-line arguments, or use a default one if not provided
-    question = sys.argv[1] if len(sys.argv) > 1 else "What is AI?"
+    question = args.question
 
     # 🚀 Run the main pipeline asynchronously to process the question
-    result = asyncio.run(run_pipeline(question))
+    try:
+        result = asyncio.run(answer_question(question))
+    finally:
+        shutdown_logging()
 
     # 🖨️ Print the final result in nicely formatted JSON
     print(json.dumps(result, indent=2))
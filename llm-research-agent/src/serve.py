@@ -0,0 +1,52 @@
+# src/serve.py
+
+import os
+import sys
+import glob
+import argparse
+import tempfile
+
+import uvicorn
+
+# ✅ The API imports modules relative to /app/src, like src/main.py
+SRC_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Worker processes serving the API (0 = one per CPU core)
+API_WORKERS = int(os.getenv("API_WORKERS", "0"))
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+
+def worker_count(requested: int = API_WORKERS) -> int:
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def prepare_multiprocess_metrics() -> str:
+    """
+    Points prometheus_client at a metrics directory shared by the workers (before
+    any of them imports it), so /metrics on any worker reports the totals of all.
+    Uses PROMETHEUS_MULTIPROC_DIR when set, else a fresh temporary directory.
+    Samples left by a previous run are removed, or they would be added to this one's.
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="llm-agent-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API with several worker processes.")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes (default: API_WORKERS, 0 = one per core)")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    workers = worker_count(args.workers)
+    if workers > 1:
+        path = prepare_multiprocess_metrics()
+        print(f"📊 Aggregating metrics of {workers} workers in {path}", file=sys.stderr)
+
+    # 🚀 Each worker runs the app's lifespan: logging, providers, warm-up, background tasks
+    uvicorn.run("agent.api_server:app", host=args.host, port=args.port, workers=workers, app_dir=SRC_DIR)
@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+
+import agent.pipeline as pipeline
+from agent.api_server import app
+from agent.utils.admission import AdmissionController, Overloaded
+
+
+class StaticCache:
+    """
+    Answer cache stand-in holding a fixed set of answers.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return self.answers.get(self.key_for(question))
+
+    async def set(self, question, answer):
+        pass
+
+
+# ✅ Test ① Slots are bounded and a freed slot goes to the most urgent waiter
+def test_priority_order():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_wait=5)
+    order = []
+
+    async def job(name, priority, started=None):
+        async with controller.admit(priority):
+            order.append(name)
+            if started:
+                started.set()
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        started = asyncio.Event()
+        first = asyncio.ensure_future(job("first", "batch", started))
+        await started.wait()
+        waiting = [asyncio.ensure_future(job(name, priority)) for name, priority in
+                   [("batch-1", "batch"), ("interactive-1", "interactive"), ("batch-2", "batch"), ("interactive-2", "interactive")]]
+        await asyncio.sleep(0)
+        assert controller.in_flight == 1 and controller.queued() == 4
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(scenario())
+    assert order == ["first", "interactive-1", "interactive-2", "batch-1", "batch-2"]
+    assert controller.in_flight == 0
+
+
+# ✅ Test ② Requests are shed when the queue is full or the wait is too long
+def test_queue_full_and_wait_timeout():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_wait=0.05)
+
+    async def hold(seconds):
+        async with controller.admit():
+            await asyncio.sleep(seconds)
+
+    async def scenario():
+        holder = asyncio.ensure_future(hold(0.2))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(hold(0))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as full:
+            await hold(0)
+        with pytest.raises(Overloaded) as timeout:
+            await waiter
+        await holder
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(scenario())
+    assert full.reason == "queue full" and full.retry_after >= 1
+    assert timeout.reason == "timeout"
+    assert controller.in_flight == 0 and controller.queued() == 0
+
+
+# ✅ Test ③ A cancelled waiter does not take or leak a slot
+def test_cancelled_waiter_releases_nothing():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, max_wait=5)
+    admitted = []
+
+    async def job(name, seconds=0.0):
+        async with controller.admit():
+            admitted.append(name)
+            await asyncio.sleep(seconds)
+
+    async def scenario():
+        holder = asyncio.ensure_future(job("holder", 0.05))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(job("cancelled"))
+        later = asyncio.ensure_future(job("later"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(holder, later, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert admitted == ["holder", "later"]
+    assert controller.in_flight == 0
+
+
+# ✅ Test ④ The API answers 503 with Retry-After when shedding, but cached answers are still served
+def test_api_sheds_with_503_but_serves_cache(monkeypatch):
+    cached = {"status": "complete", "answer": "Argentina [1].", "citations": []}
+    monkeypatch.setattr(pipeline, "answer_cache", StaticCache({"who won?": cached}))
+    monkeypatch.setattr("agent.api_server.answer_cache", pipeline.answer_cache)
+    controller = AdmissionController(max_in_flight=1, max_queue=0, max_wait=1)
+    controller.in_flight = 1
+    monkeypatch.setattr(pipeline, "admission", controller)
+    monkeypatch.setattr("agent.api_server.admission", controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (
+                await client.post("/api/query", json={"question": "Who won?"}),
+                await client.post("/api/query", json={"question": "Who lost?"}),
+                await client.post("/api/query/stream", json={"question": "Who lost?", "priority": "batch"}),
+            )
+
+    hit, shed, shed_stream = asyncio.run(scenario())
+    assert hit.status_code == 200 and hit.json() == cached
+    assert shed.status_code == 503 and int(shed.headers["Retry-After"]) >= 1
+    assert shed_stream.status_code == 503
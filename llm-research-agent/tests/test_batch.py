@@ -0,0 +1,130 @@
+import json
+import asyncio
+
+import httpx
+
+import agent.batch as batch
+from agent.api_server import app
+from agent.tools.websearch import WebSearchTool
+from agent.types.document import Document
+from agent.utils.admission import Overloaded
+
+
+class FakePipeline:
+    """
+    run_pipeline stand-in: answers after a per-question delay and tracks how many run at once.
+    """
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+
+    async def __call__(self, question, priority="interactive", **limits):
+        self.calls.append((question, priority, limits))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(question, 0.01))
+        finally:
+            self.running -= 1
+        if question == "boom":
+            raise RuntimeError("pipeline failed")
+        return {"status": "complete", "answer": f"A: {question}", "citations": []}
+
+
+def collect(lines, concurrency):
+    async def scenario():
+        return [result async for result in batch.run_batch(lines, concurrency)]
+    return asyncio.run(scenario())
+
+
+# ✅ Test ① Results stream back as they complete, with bounded concurrency
+def test_results_in_completion_order_with_bounded_concurrency(monkeypatch):
+    fake = FakePipeline({"slow": 0.1})
+    monkeypatch.setattr(batch, "run_pipeline", fake)
+    lines = [json.dumps({"id": "a", "question": "slow"})] + [json.dumps(f"q{i}") for i in range(6)]
+
+    results = collect(lines, concurrency=2)
+
+    assert fake.peak == 2
+    assert [r["index"] for r in results][-1] == 0
+    assert results[-1] == {"index": 0, "id": "a", "question": "slow", "status": "complete", "answer": "A: slow", "citations": []}
+    assert sorted(r["index"] for r in results) == list(range(7))
+    assert all(priority == "batch" for _, priority, _ in fake.calls)
+
+
+# ✅ Test ② Bad lines and failed questions become error lines; the batch carries on
+def test_errors_are_reported_per_line(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(batch, "run_pipeline", fake)
+    lines = ["not json", "", json.dumps({"id": 7}), json.dumps({"question": "boom"}),
+             json.dumps({"question": "ok", "deadline_seconds": 5})]
+
+    results = {r["index"]: r for r in collect(lines, concurrency=4)}
+
+    assert results[0]["status"] == "error" and "Invalid batch line" in results[0]["error"]
+    assert results[1]["status"] == "error" and "id" not in results[1]
+    assert results[2] == {"index": 2, "question": "boom", "status": "error", "error": "pipeline failed"}
+    assert results[3]["answer"] == "A: ok"
+    assert fake.calls[-1] == ("ok", "batch", {"deadline": 5})
+
+
+# ✅ Test ③ Questions shed by admission control are retried after Retry-After
+def test_overloaded_questions_are_retried(monkeypatch):
+    attempts = []
+
+    async def flaky(question, priority="interactive", **limits):
+        attempts.append(question)
+        if len(attempts) == 1:
+            raise Overloaded("queue full", 0)
+        return {"status": "complete", "answer": "ok", "citations": []}
+
+    monkeypatch.setattr(batch, "run_pipeline", flaky)
+    assert collect([json.dumps("q")], concurrency=1)[0]["answer"] == "ok"
+    assert attempts == ["q", "q"]
+
+
+# ✅ Test ④ POST /api/batch streams NDJSON results
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    monkeypatch.setattr(batch, "run_pipeline", FakePipeline())
+    body = "\n".join(json.dumps({"id": i, "question": f"q{i}"}) for i in range(5)) + "\n"
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/batch?concurrency=3", content=body)
+
+    resp = asyncio.run(scenario())
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(r["id"] for r in results) == list(range(5))
+    assert all(r["answer"] == f"A: q{r['id']}" for r in results)
+
+
+# ✅ Test ⑤ Near-identical queries from concurrent questions are fetched once
+def test_concurrent_near_identical_queries_are_fetched_once():
+    class SlowProvider:
+        def __init__(self):
+            self.sent = []
+
+        async def search(self, query):
+            self.sent.append(query)
+            await asyncio.sleep(0.05)
+            return [Document(title=query, snippet="", url="https://example.com/final")]
+
+    provider = SlowProvider()
+
+    async def scenario():
+        tools = [WebSearchTool(cache=None, provider=provider, store=None) for _ in range(3)]
+        return await asyncio.gather(
+            tools[0].run(["2022 World Cup winner"]),
+            tools[1].run(["winner of the 2022 world cup"]),
+            tools[2].run(["2022 World Cup final"]),
+        )
+
+    first, second, third = asyncio.run(scenario())
+    assert sorted(provider.sent) == ["2022 World Cup final", "2022 World Cup winner"]
+    assert first == second
+    assert third[0].title == "2022 World Cup final"
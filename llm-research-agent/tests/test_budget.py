@@ -0,0 +1,162 @@
+import time
+import asyncio
+
+import pytest
+
+import agent.pipeline as pipeline
+from agent.types.document import Document
+from agent.utils.budget import Budget, BudgetedLLM, stage_estimates
+from agent.utils.llm import get_llm_client
+
+LATENCY = 0.1
+
+
+class EmptyCache:
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        self.stored = answer
+
+
+class FakeSearchTool:
+    async def run(self, queries, on_result=None):
+        return [Document(title=q, snippet=q, url=f"https://example.com/{q}") for q in queries]
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, prompt, model=None):
+        self.prompts.append(prompt)
+        await asyncio.sleep(LATENCY)
+        return "x" * 40
+
+    async def stream(self, prompt, model=None):
+        self.prompts.append(prompt)
+        yield "y" * 40
+
+
+class FakeNodes:
+    """
+    LLM nodes that call the shared LLM client (so the budget meters them). Reflect
+    always wants more documents; `synthesized` records the docs each synthesize saw.
+    """
+
+    def __init__(self):
+        self.synthesized = []
+        self.reflections = 0
+
+    async def generate_queries(self, question):
+        return ["q1"]
+
+    async def extract_slots(self, question):
+        await get_llm_client().generate("slots")
+        return ["winner"]
+
+    async def reflect(self, question, docs, slots=None, fold_slots=False):
+        self.reflections += 1
+        await get_llm_client().generate("reflect")
+        return {"slots": ["winner"], "filled": [], "need_more": True, "new_queries": [f"q{self.reflections + 1}"]}
+
+    async def synthesize(self, question, docs, on_token=None):
+        await get_llm_client().generate("synthesize")
+        self.synthesized.append([d.title for d in docs])
+        return {"status": "complete", "answer": "Answer [1].", "citations": [{"id": 1, "title": "q1", "url": "https://example.com/q1"}]}
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    fake = FakeNodes()
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "WebSearchTool", FakeSearchTool)
+    monkeypatch.setattr(pipeline, "generate_queries", fake.generate_queries)
+    monkeypatch.setattr(pipeline, "extract_slots_llm", fake.extract_slots)
+    monkeypatch.setattr(pipeline, "reflect", fake.reflect)
+    monkeypatch.setattr(pipeline, "synthesize", fake.synthesize)
+    monkeypatch.setattr(pipeline, "SPECULATIVE_SYNTHESIS", False)
+    monkeypatch.setattr(pipeline, "MAX_REFLECTION_ROUNDS", 3)
+
+    async def no_cached_slots(question):
+        return None
+
+    monkeypatch.setattr(pipeline, "get_cached_slots", no_cached_slots)
+    monkeypatch.setattr("agent.utils.llm._llm_client", FakeLLM())
+    # Fixed stage estimates so the scheduling decisions do not depend on earlier tests
+    monkeypatch.setattr(stage_estimates, "_seconds", {"search": LATENCY, "reflect": LATENCY, "synthesize": LATENCY})
+    monkeypatch.setattr(stage_estimates, "alpha", 0.0)
+    return fake
+
+
+def timed_run(question, **limits):
+    start = time.perf_counter()
+    result = asyncio.run(pipeline.run_pipeline(question, **limits))
+    return result, time.perf_counter() - start
+
+
+# ✅ Test ① Without limits every round runs and no budget block is returned
+def test_unlimited_run_has_no_budget_block(nodes):
+    result, _ = timed_run("Who won?")
+    assert nodes.reflections == 3
+    assert "budget" not in result
+
+
+# ✅ Test ② A reflection round that would not leave time for synthesize is skipped
+def test_deadline_skips_rounds_but_still_answers(nodes):
+    # slots (0.1s) + reflect (0.1s) leaves < 0.1s for another search before synthesize
+    result, elapsed = timed_run("Who won?", deadline=0.35)
+    assert nodes.reflections == 1
+    assert nodes.synthesized == [["q1"]]
+    assert result["answer"] == "Answer [1]."
+    assert result["budget"]["deadline_hit"] is True
+    assert result["budget"]["stopped"] == "deadline"
+    assert elapsed < 0.35 + LATENCY
+
+
+# ✅ Test ③ A slow search is cut at the deadline and keeps the results that arrived
+def test_slow_search_is_cut_with_partial_results(nodes, monkeypatch):
+    class SlowSearchTool:
+        async def run(self, queries, on_result=None):
+            on_result("fast", [Document(title="fast", snippet="fast", url="https://example.com/fast")])
+            await asyncio.sleep(1.0)
+            return []
+
+    monkeypatch.setattr(pipeline, "WebSearchTool", SlowSearchTool)
+    result, elapsed = timed_run("Who won?", deadline=0.3)
+    assert elapsed < 0.6
+    assert nodes.reflections == 0
+    assert nodes.synthesized == [["fast"]]
+    assert result["budget"]["deadline_hit"] is True
+
+
+# ✅ Test ④ The LLM call cap always keeps one call for synthesize
+def test_llm_call_cap_reserves_synthesize(nodes):
+    result, _ = timed_run("Who won?", max_llm_calls=4)
+    # slots + 2 reflects + synthesize
+    assert nodes.reflections == 2
+    assert len(nodes.synthesized) == 1
+    assert result["budget"]["llm_calls"] == 4
+    assert result["budget"]["remaining_llm_calls"] == 0
+    assert result["budget"]["stopped"] == "llm_calls"
+    assert "budget" not in pipeline.answer_cache.stored
+
+
+# ✅ Test ⑤ BudgetedLLM charges calls and estimated prompt/response tokens
+def test_budgeted_llm_charges_usage():
+    budget = Budget(max_tokens=1000)
+    llm = BudgetedLLM(FakeLLM(), budget)
+
+    async def scenario():
+        await llm.generate("p" * 400)
+        return [chunk async for chunk in llm.stream("p" * 40)]
+
+    assert asyncio.run(scenario()) == ["y" * 40]
+    assert budget.llm_calls == 2
+    assert budget.tokens == 100 + 10 + 10 + 10
+    assert budget.fits([], tokens=400)
+    assert not budget.fits([], tokens=500)
+    assert budget.stopped == "tokens"
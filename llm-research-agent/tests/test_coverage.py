@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import agent.pipeline as pipeline
+import agent.utils.coverage as coverage
+from agent.types.document import Document
+from agent.utils.coverage import estimate_coverage, heuristic_reflection
+from agent.utils.metrics import COVERAGE_PRECHECK_AGREEMENT
+
+QUESTION = "Who won the 2022 World Cup final?"
+SLOTS = ["winner", "score", "date"]
+
+COVERED = [
+    Document(
+        title="2022 FIFA World Cup final",
+        snippet="Argentina won the World Cup final on 18 December 2022, beating France 4-2 on penalties after a 3-3 draw.",
+        url="https://example.com/a"
+    ),
+    Document(
+        title="Argentina are world champions",
+        snippet="Messi's Argentina beat France in the World Cup final in Lusail on December 18, 2022; the score was 3-3.",
+        url="https://example.com/b"
+    ),
+]
+PARTIAL = [
+    Document(title="World Cup final preview", snippet="France face Argentina in the World Cup final on 18 December 2022.",
+             url="https://example.com/c"),
+]
+UNRELATED = [
+    Document(title="Best pasta recipes", snippet="Boil water, add salt and cook for ten minutes.", url="https://example.com/d"),
+]
+
+
+# ✅ Test ① Snippets that clearly cover every slot are "sufficient"
+def test_obvious_coverage():
+    result = estimate_coverage(QUESTION, COVERED, SLOTS)
+    assert result.decision == "sufficient"
+    assert result.filled == SLOTS
+    assert result.confidence >= 0.75
+
+
+# ✅ Test ② No evidence at all is "insufficient", with template follow-up queries
+def test_hopeless_coverage():
+    result = estimate_coverage(QUESTION, UNRELATED, SLOTS)
+    assert result.decision == "insufficient"
+    reflection = heuristic_reflection(QUESTION, SLOTS, result)
+    assert reflection["need_more"] is True
+    assert reflection["new_queries"] == [
+        "won 2022 World Cup final winner", "won 2022 World Cup final score", "won 2022 World Cup final date"
+    ]
+
+
+# ✅ Test ③ Partial evidence is left to the LLM
+def test_partial_coverage_is_uncertain():
+    result = estimate_coverage(QUESTION, PARTIAL, SLOTS)
+    assert result.decision == "uncertain"
+    assert "winner" in result.missing
+
+
+class CountingReflect:
+    def __init__(self, need_more):
+        self.need_more = need_more
+        self.calls = 0
+
+    async def __call__(self, question, docs, slots=None, fold_slots=False):
+        self.calls += 1
+        return {"slots": slots, "filled": slots, "need_more": self.need_more, "new_queries": []}
+
+
+class EmptyCache:
+    def key_for(self, question):
+        return question
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+class CoveredSearchTool:
+    async def run(self, queries, on_result=None):
+        return COVERED
+
+
+@pytest.fixture
+def covered_pipeline(monkeypatch):
+    async def generate_queries(question):
+        return ["world cup final"]
+
+    async def extract_slots(question):
+        return SLOTS
+
+    async def synthesize(question, docs, on_token=None):
+        return {"status": "complete", "answer": "Argentina won [1].", "citations": [{"id": 1, "title": "a", "url": "u"}]}
+
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "WebSearchTool", CoveredSearchTool)
+    monkeypatch.setattr(pipeline, "generate_queries", generate_queries)
+    monkeypatch.setattr(pipeline, "extract_slots_llm", extract_slots)
+    monkeypatch.setattr(pipeline, "synthesize", synthesize)
+
+    def install(mode, need_more=False):
+        fake = CountingReflect(need_more)
+        monkeypatch.setattr(pipeline, "reflect", fake)
+        monkeypatch.setattr(coverage, "COVERAGE_MODE", mode)
+        return fake
+    return install
+
+
+def agreement(decision, agrees):
+    return COVERAGE_PRECHECK_AGREEMENT.labels(decision, agrees)._value.get()
+
+
+# ✅ Test ④ In "on" mode a confident verdict replaces the reflect call
+def test_pipeline_skips_reflect(covered_pipeline):
+    fake = covered_pipeline("on")
+    result = asyncio.run(pipeline.run_pipeline(QUESTION))
+    assert result["answer"] == "Argentina won [1]."
+    assert fake.calls == 0
+
+
+# ✅ Test ⑤ In shadow mode reflect still runs and agreement with it is recorded
+def test_shadow_mode_records_agreement(covered_pipeline):
+    before = agreement("sufficient", "true"), agreement("sufficient", "false")
+
+    fake = covered_pipeline("shadow", need_more=False)
+    asyncio.run(pipeline.run_pipeline(QUESTION))
+    assert fake.calls == 1
+    assert agreement("sufficient", "true") == before[0] + 1
+
+    fake = covered_pipeline("shadow", need_more=True)
+    asyncio.run(pipeline.run_pipeline(QUESTION + " "))
+    assert fake.calls == 1
+    assert agreement("sufficient", "false") == before[1] + 1
@@ -0,0 +1,82 @@
+import time
+import asyncio
+
+from agent.tools.websearch import WebSearchTool
+from agent.types.document import Document
+from agent.utils.document_store import DocumentStore, match_expression
+
+FINAL = Document(title="2022 World Cup final", snippet="Argentina beat France on penalties.", url="https://example.com/final")
+REPORT = Document(title="Match report", snippet="The World Cup final in 2022 ended 3-3.", url="https://news.example.com/report")
+SCORERS = Document(title="World Cup 2022 final scorers", snippet="Messi and Mbappé scored.", url="https://example.org/scorers")
+OTHER = Document(title="Tour de France", snippet="The 2022 cycling race.", url="https://example.com/tour")
+
+
+def run(scenario, tmp_path, **kwargs):
+    async def wrapper():
+        store = DocumentStore(str(tmp_path / "documents.db"), **kwargs)
+        try:
+            return await scenario(store)
+        finally:
+            store.close()
+    return asyncio.run(wrapper())
+
+
+class CountingProvider:
+    def __init__(self, results):
+        self.results = results
+        self.sent = []
+
+    async def search(self, query):
+        self.sent.append(query)
+        return self.results.get(query, [])
+
+
+# ✅ Test ① Queries need every content word; FTS syntax in queries is harmless
+def test_full_text_search(tmp_path):
+    async def scenario(store):
+        await store.ingest([FINAL, REPORT, SCORERS, OTHER])
+        return await store.search_many(["2022 World Cup final", "what is the tour de france", "AND OR \"NEAR("])
+
+    hits = run(scenario, tmp_path, min_results=1)
+    assert [doc.url for doc in hits["2022 World Cup final"]] == [FINAL.url, SCORERS.url, REPORT.url]
+    assert hits["what is the tour de france"] == [OTHER]
+    assert match_expression("who is it") is None
+
+
+# ✅ Test ② Stale documents and too few matches fall through to CSE
+def test_freshness_and_min_results(tmp_path):
+    async def scenario(store):
+        await store.ingest([FINAL, REPORT], fetched_at=time.time() - 7200)
+        await store.ingest([SCORERS])
+        return await store.search_many(["world cup final"])
+
+    assert run(scenario, tmp_path, ttl=3600, min_results=1) == {"world cup final": [SCORERS]}
+    assert run(scenario, tmp_path, ttl=3600, min_results=2) == {}
+
+
+# ✅ Test ③ Re-fetched URLs replace the stored copy; compaction drops expired documents
+def test_upsert_and_compaction(tmp_path):
+    async def scenario(store):
+        await store.ingest([FINAL, OTHER], fetched_at=time.time() - 7200)
+        await store.ingest([FINAL._replace(snippet="Messi lifted the trophy.", url="http://www.example.com/final/")])
+        deleted = await store.compact()
+        return deleted, await store.search_many(["world cup final", "tour de france", "penalties", "messi trophy"])
+
+    deleted, hits = run(scenario, tmp_path, retention=3600, min_results=1)
+    assert deleted == 1
+    assert list(hits) == ["world cup final", "messi trophy"]
+    assert hits["messi trophy"][0].url == "http://www.example.com/final/"
+
+
+# ✅ Test ④ WebSearchTool answers from prior crawls and only sends uncovered queries to CSE
+def test_search_tool_uses_store_first(tmp_path):
+    async def scenario(store):
+        provider = CountingProvider({"2022 World Cup final": [FINAL, REPORT, SCORERS], "tour de france": [OTHER]})
+        tool = WebSearchTool(cache=None, provider=provider, store=store)
+        await tool.run(["2022 World Cup final"])
+        docs = await tool.run(["world cup 2022 final", "tour de france"])
+        return provider.sent, docs
+
+    sent, docs = run(scenario, tmp_path, min_results=3)
+    assert sent == ["2022 World Cup final", "tour de france"]
+    assert {doc.url for doc in docs} == {FINAL.url, REPORT.url, SCORERS.url, OTHER.url}
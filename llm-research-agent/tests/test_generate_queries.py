@@ -1,5 +1,6 @@
 import sys
 import os
+import asyncio
 from unittest.mock import MagicMock
 
 # ✅ Add path to src so we can import project modules
@@ -30,8 +31,10 @@ sys.modules["google.genai"] = mock_genai
 from agent.nodes.generate_queries import generate_queries
 
 # ✅ Unit test
-def test_generate_queries():
-    queries = generate_queries("Who won the 2022 World Cup and who scored in the final?")
+def test_generate_queries(monkeypatch):
+    # 🔒 agent.utils.llm may already be imported with the real genai, so patch the client getter too
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: mock_client)
+    queries = asyncio.run(generate_queries("Who won the 2022 World Cup and who scored in the final?"))
     print("🔍 Queries:", queries)
 
     assert isinstance(queries, list)
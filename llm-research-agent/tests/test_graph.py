@@ -0,0 +1,202 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import agent.pipeline as pipeline
+from agent.types.document import Document
+from agent.utils.checkpoints import RedisCheckpointSaver
+from agent.utils.singleflight import RedisLock
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class EmptyCache:
+    """
+    Answer cache stand-in that always misses.
+    """
+
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+class CountingNodes:
+    """
+    Stubs for the search tool and the LLM nodes that count their calls. reflect asks
+    for one more round with a new query, and fails the first `failures` times it is called.
+    """
+
+    def __init__(self, failures=0, reflect_delay=0):
+        self.failures = failures
+        self.reflect_delay = reflect_delay
+        self.calls = {"generate_queries": 0, "extract_slots": 0, "search": 0, "reflect": 0, "synthesize": 0}
+        self.started = []
+
+    def search_tool(self):
+        nodes = self
+
+        class Tool:
+            async def run(self, queries, on_result=None):
+                nodes.calls["search"] += 1
+                return [Document(title=q, snippet=f"About {q}", url=f"https://example.com/{q}") for q in queries]
+
+        return Tool()
+
+    async def generate_queries(self, question):
+        self.calls["generate_queries"] += 1
+        self.started.append("generate_queries")
+        await asyncio.sleep(0.05)
+        return ["q1", "q2"]
+
+    async def extract_slots(self, question):
+        self.calls["extract_slots"] += 1
+        self.started.append("extract_slots")
+        await asyncio.sleep(0.05)
+        return ["winner"]
+
+    async def reflect(self, question, docs, slots=None, fold_slots=False):
+        self.calls["reflect"] += 1
+        await asyncio.sleep(self.reflect_delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("worker crashed")
+        return {"slots": [], "filled": [], "need_more": True, "new_queries": [f"q{self.calls['reflect'] + 2}"]}
+
+    async def synthesize(self, question, docs, on_token=None):
+        self.calls["synthesize"] += 1
+        return {"status": "complete", "answer": f"Answer from {len(docs)} docs [1].",
+                "citations": [{"id": 1, "title": docs[0].title, "url": docs[0].url}]}
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    def install(failures=0, checkpoints=False, reflect_delay=0):
+        fake = CountingNodes(failures, reflect_delay)
+        monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+        monkeypatch.setattr(pipeline, "WebSearchTool", fake.search_tool)
+        monkeypatch.setattr(pipeline, "generate_queries", fake.generate_queries)
+        monkeypatch.setattr(pipeline, "extract_slots_llm", fake.extract_slots)
+        monkeypatch.setattr(pipeline, "reflect", fake.reflect)
+        monkeypatch.setattr(pipeline, "synthesize", fake.synthesize)
+        monkeypatch.setattr(pipeline, "SPECULATIVE_SYNTHESIS", False)
+        # Deterministic verdicts: always ask the LLM
+        monkeypatch.setattr(pipeline, "can_skip_reflect", lambda coverage: False)
+        if checkpoints:
+            client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+            saver = RedisCheckpointSaver(client)
+            monkeypatch.setattr(pipeline, "_checkpointed_graph", pipeline.build_graph().compile(checkpointer=saver))
+            monkeypatch.setattr(pipeline, "checkpoint_lease", RedisLock(client, prefix="llm_checkpoint_lease:", ttl_ms=5000))
+            fake.client = client
+        return fake
+    return install
+
+
+# ✅ Test ① Query generation and slot extraction run concurrently; reflection rounds loop back to search
+def test_graph_runs_rounds(nodes):
+    fake = nodes()
+    result = asyncio.run(pipeline.run_pipeline("Who won?"))
+
+    assert sorted(fake.started[:2]) == ["extract_slots", "generate_queries"]
+    assert fake.calls == {
+        "generate_queries": 1, "extract_slots": 1,
+        "search": pipeline.MAX_REFLECTION_ROUNDS + 1, "reflect": pipeline.MAX_REFLECTION_ROUNDS, "synthesize": 1
+    }
+    # q1 and q2, then one new query per round
+    assert result["answer"] == "Answer from 4 docs [1]."
+
+
+# ✅ Test ② A retry after a crash resumes from the last completed node, without redoing LLM calls
+def test_retry_resumes_from_checkpoint(nodes):
+    fake = nodes(failures=1, checkpoints=True)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await pipeline.run_pipeline("Who won?")
+        assert await fake.client.exists("graph_checkpoint:who won?:")
+        result = await pipeline.run_pipeline("Who won?")
+        # Finished runs leave nothing behind
+        assert not await fake.client.keys("graph_checkpoint:*")
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["answer"] == "Answer from 4 docs [1]."
+    assert fake.calls == {
+        "generate_queries": 1, "extract_slots": 1,
+        "search": pipeline.MAX_REFLECTION_ROUNDS + 1, "reflect": pipeline.MAX_REFLECTION_ROUNDS + 1, "synthesize": 1
+    }
+
+
+# ✅ Test ③ Without Redis the pipeline still answers, just without checkpoints
+def test_checkpoint_errors_degrade(nodes, monkeypatch):
+    fake = nodes(checkpoints=True)
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(fake.client, "pipeline", broken)
+    monkeypatch.setattr(fake.client, "delete", broken)
+    result = asyncio.run(pipeline.run_pipeline("Who won?"))
+    assert result["status"] == "complete"
+
+
+# ✅ Test ④ A round whose queries were all searched already is skipped, along with its reflect call
+def test_repeated_queries_end_the_loop(nodes, monkeypatch):
+    fake = nodes()
+
+    async def reflect(question, docs, slots=None, fold_slots=False):
+        fake.calls["reflect"] += 1
+        return {"slots": [], "filled": [], "need_more": True, "new_queries": ["Q1", "q2?"]}
+
+    monkeypatch.setattr(pipeline, "reflect", reflect)
+    result = asyncio.run(pipeline.run_pipeline("Who won?"))
+    assert fake.calls["search"] == 1
+    assert fake.calls["reflect"] == 1
+    assert result["answer"] == "Answer from 2 docs [1]."
+
+
+# ✅ Test ⑤ A run overlapping another run of the same question neither resumes nor touches its checkpoints
+def test_overlapping_runs_do_not_share_checkpoints(nodes):
+    fake = nodes(checkpoints=True, reflect_delay=0.05)
+    resumes = REGISTRY.get_sample_value("pipeline_resumes_total") or 0.0
+
+    async def scenario():
+        # Two workers answering the same question: the in-process coalescing does not apply
+        first = asyncio.create_task(pipeline._run_uncached("Who won?"))
+        # The first run has checkpointed its way into reflect
+        await asyncio.sleep(0.1)
+        assert await fake.client.exists("graph_checkpoint:who won?:")
+        second = await pipeline._run_uncached("Who won?")
+        results = [await first, second]
+        assert not await fake.client.keys("graph_checkpoint:*")
+        assert not await fake.client.keys("llm_checkpoint_lease:*")
+        return results
+
+    results = asyncio.run(scenario())
+    assert [r["answer"] for r in results] == ["Answer from 4 docs [1]."] * 2
+    assert (REGISTRY.get_sample_value("pipeline_resumes_total") or 0.0) == resumes
+    # Both ran every node: nothing was resumed
+    assert fake.calls["generate_queries"] == 2
+    assert fake.calls["synthesize"] == 2
+
+
+# ✅ Test ⑥ When every new query is pruned, the speculative answer is kept instead of synthesizing again
+def test_pruned_queries_keep_speculative_answer(nodes, monkeypatch):
+    fake = nodes()
+    monkeypatch.setattr(pipeline, "SPECULATIVE_SYNTHESIS", True)
+
+    async def reflect(question, docs, slots=None, fold_slots=False):
+        fake.calls["reflect"] += 1
+        await asyncio.sleep(0.01)
+        return {"slots": [], "filled": [], "need_more": True, "new_queries": ["Q1", "q2?"]}
+
+    monkeypatch.setattr(pipeline, "reflect", reflect)
+    result = asyncio.run(pipeline.run_pipeline("Who won?"))
+    assert fake.calls["search"] == 1
+    assert fake.calls["synthesize"] == 1
+    assert result["answer"] == "Answer from 2 docs [1]."
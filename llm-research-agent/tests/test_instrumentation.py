@@ -0,0 +1,165 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from prometheus_client import REGISTRY
+from prometheus_client.openmetrics.exposition import generate_latest
+
+import agent.pipeline as pipeline
+import agent.utils.instrumentation as instrumentation
+from agent.types.document import Document
+from agent.utils.instrumentation import InstrumentedLLM, Timings, current_timings, record_parse_failure, record_retry, stage
+from agent.utils.llm import LLMClient, get_llm_client
+
+LATENCY = 0.1
+
+
+class UsageGemini:
+    """
+    genai.Client stand-in that reports token usage like Gemini does.
+    """
+
+    def __init__(self):
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model, contents, config=None):
+        time.sleep(LATENCY)
+        usage = SimpleNamespace(prompt_token_count=123, candidates_token_count=7)
+        return SimpleNamespace(text="ok", usage_metadata=usage)
+
+
+class EmptyCache:
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+class FakeSearchTool:
+    async def run(self, queries, on_result=None):
+        return [Document(title=q, snippet=q, url=f"https://example.com/{q}") for q in queries]
+
+
+class FakeLLM:
+    async def generate(self, prompt, model=None):
+        return "x" * 40
+
+    async def stream(self, prompt, model=None):
+        yield "y" * 40
+
+
+def sample(name, stage_name):
+    return REGISTRY.get_sample_value(name, {"stage": stage_name}) or 0.0
+
+
+# ✅ Test ① The timings block breaks a request down by stage and LLM call
+def test_timings_block(monkeypatch):
+    async def generate_queries(question):
+        await get_llm_client().generate("q" * 400)
+        return ["q1"]
+
+    async def reflect(question, docs, slots=None, fold_slots=False):
+        await get_llm_client().generate("r" * 800)
+        return {"slots": ["winner"], "filled": ["winner"], "need_more": False, "new_queries": []}
+
+    async def synthesize(question, docs, on_token=None):
+        chunks = [chunk async for chunk in get_llm_client().stream("s" * 1200)]
+        return {"status": "complete", "answer": "".join(chunks) + " [1]", "citations": [{"id": 1, "title": "q1", "url": "u"}]}
+
+    async def extract_slots(question):
+        return ["winner"]
+
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "WebSearchTool", FakeSearchTool)
+    monkeypatch.setattr(pipeline, "generate_queries", generate_queries)
+    monkeypatch.setattr(pipeline, "extract_slots_llm", extract_slots)
+    monkeypatch.setattr(pipeline, "reflect", reflect)
+    monkeypatch.setattr(pipeline, "synthesize", synthesize)
+    monkeypatch.setattr(pipeline, "SPECULATIVE_SYNTHESIS", False)
+    monkeypatch.setattr("agent.utils.llm._llm_client", FakeLLM())
+
+    plain = asyncio.run(pipeline.run_pipeline("Who won?"))
+    timed = asyncio.run(pipeline.run_pipeline("Who won?", timings=True))
+
+    assert "timings" not in plain
+    stages = timed["timings"]["stages"]
+    assert set(stages) == {"generate_queries", "web_search", "extract_slots", "reflect", "synthesize"}
+    assert stages["generate_queries"]["llm_calls"] == 1
+    assert stages["generate_queries"]["prompt_tokens"] == 100
+    assert stages["generate_queries"]["prompt_bytes"] == 400
+    assert stages["reflect"]["prompt_tokens"] == 200
+    assert stages["synthesize"]["prompt_tokens"] == 300
+    assert stages["synthesize"]["response_tokens"] == 10
+    assert stages["web_search"]["llm_calls"] == 0 and stages["web_search"]["runs"] == 1
+    assert timed["timings"]["total_seconds"] >= stages["reflect"]["seconds"]
+
+
+# ✅ Test ② Provider-reported tokens and queue wait behind the concurrency cap are recorded
+def test_llm_client_reports_usage_and_queue_wait(monkeypatch):
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: UsageGemini())
+    llm = InstrumentedLLM(LLMClient(max_concurrency=1))
+    timings = Timings()
+
+    async def scenario():
+        current_timings.set(timings)
+        with stage("reflect"):
+            await asyncio.gather(llm.generate("first prompt"), llm.generate("second prompt"))
+
+    asyncio.run(scenario())
+    llm.client.shutdown()
+    reflect = timings.stages["reflect"]
+    assert reflect["llm_calls"] == 2
+    assert reflect["prompt_tokens"] == 246 and reflect["response_tokens"] == 14
+    # The second call waited for the single worker while the first one ran
+    assert LATENCY * 0.8 <= reflect["queue_wait_seconds"] < LATENCY * 2
+
+
+# ✅ Test ③ Parse failures and retries are counted against the current stage
+def test_parse_failures_and_retries_by_stage():
+    failures = sample("llm_parse_failures_total", "synthesize")
+    retries = sample("stage_retries_total", "web_search")
+    timings = Timings()
+
+    async def scenario():
+        current_timings.set(timings)
+        with stage("synthesize"):
+            record_parse_failure()
+        with stage("web_search"):
+            record_retry()
+            record_retry()
+
+    asyncio.run(scenario())
+    assert sample("llm_parse_failures_total", "synthesize") == failures + 1
+    assert sample("stage_retries_total", "web_search") == retries + 2
+    assert timings.stages["synthesize"]["parse_failures"] == 1
+    assert timings.stages["web_search"]["retries"] == 2
+
+
+# ✅ Test ④ Stage and LLM call spans carry the measurements; histograms link to them with exemplars
+def test_spans_and_exemplars(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(instrumentation, "tracer", provider.get_tracer("test"))
+
+    async def scenario():
+        with stage("generate_queries", span="generate_queries_test"):
+            await InstrumentedLLM(FakeLLM()).generate("p" * 40)
+
+    asyncio.run(scenario())
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    call, stage_span = spans["llm_call"], spans["generate_queries_test"]
+    assert call.parent.span_id == stage_span.context.span_id
+    assert call.attributes["llm.stage"] == "generate_queries"
+    assert call.attributes["llm.prompt_tokens"] == 10
+    assert stage_span.attributes["stage.seconds"] >= 0
+
+    exposition = generate_latest(REGISTRY).decode()
+    assert f'trace_id="{format(call.context.trace_id, "032x")}"' in exposition
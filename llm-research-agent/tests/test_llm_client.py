@@ -0,0 +1,89 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from agent.utils.llm import LLMClient
+
+LATENCY = 0.2
+
+
+class SlowGeminiClient:
+    """
+    Stand-in for genai.Client whose blocking generate_content sleeps like a real
+    network call and records how many calls were running at the same time.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(LATENCY)
+        with self._lock:
+            self.active -= 1
+        return SimpleNamespace(text=contents[0]["parts"][0]["text"].upper())
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    fake = SlowGeminiClient()
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: fake)
+    return fake
+
+
+async def _fan_out(llm: LLMClient, n: int):
+    return await asyncio.gather(*[llm.generate(f"prompt {i}") for i in range(n)])
+
+
+# ✅ Test ① Concurrent calls overlap instead of running one after another
+def test_generate_calls_overlap(slow_client):
+    llm = LLMClient(max_concurrency=8)
+    start = time.perf_counter()
+    results = asyncio.run(_fan_out(llm, 8))
+    elapsed = time.perf_counter() - start
+    llm.shutdown()
+
+    assert results == [f"PROMPT {i}" for i in range(8)]
+    assert elapsed < LATENCY * 3
+    assert slow_client.max_active == 8
+
+
+# ✅ Test ② The concurrency cap bounds in-flight Gemini calls
+def test_generate_respects_concurrency_cap(slow_client):
+    llm = LLMClient(max_concurrency=2)
+    asyncio.run(_fan_out(llm, 6))
+    llm.shutdown()
+
+    assert slow_client.max_active == 2
+
+
+# ✅ Test ③ The event loop keeps running while Gemini is busy
+def test_generate_does_not_block_event_loop(slow_client):
+    llm = LLMClient(max_concurrency=1)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await llm.generate("hello")
+        task.cancel()
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    llm.shutdown()
+
+    assert ticks >= 5
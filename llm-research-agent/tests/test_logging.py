@@ -0,0 +1,120 @@
+import io
+import json
+import time
+import asyncio
+import logging
+
+import httpx
+import pytest
+
+from agent.api_server import app
+from agent.utils.logging_setup import log_payload, parse_levels, request_id, setup_logging, shutdown_logging
+
+
+class SlowStream(io.StringIO):
+    """
+    Log destination that takes a while per write, like a congested pipe.
+    """
+
+    def write(self, text):
+        time.sleep(0.05)
+        return super().write(text)
+
+
+@pytest.fixture
+def log_output():
+    out = io.StringIO()
+    setup_logging(level="INFO", levels="agent.nodes=DEBUG", fmt="json", stream=out)
+    yield out
+    shutdown_logging()
+
+
+def records(out):
+    # Records are written by the listener thread; shutting down drains the queue
+    shutdown_logging()
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+# ✅ Test ① Log lines are JSON objects carrying the request ID and structured fields
+def test_json_lines_carry_request_id(log_output):
+    logger = logging.getLogger("agent.pipeline")
+
+    async def handle(rid):
+        request_id.set(rid)
+        await asyncio.sleep(0.01)
+        logger.info("🔄 Reflection round %d", 1, extra={"round": 1})
+
+    async def scenario():
+        await asyncio.gather(handle("req-a"), handle("req-b"))
+
+    asyncio.run(scenario())
+    lines = records(log_output)
+    assert sorted(line["request_id"] for line in lines) == ["req-a", "req-b"]
+    assert lines[0]["message"] == "🔄 Reflection round 1"
+    assert lines[0]["logger"] == "agent.pipeline" and lines[0]["level"] == "INFO"
+    assert lines[0]["round"] == 1
+
+
+# ✅ Test ② Per-module levels: agent.nodes logs DEBUG while the rest stays at INFO
+def test_per_module_levels(log_output):
+    assert parse_levels("agent.nodes=debug, agent.tools=WARNING,bogus,x=NOPE") == {
+        "agent.nodes": logging.DEBUG, "agent.tools": logging.WARNING
+    }
+    logging.getLogger("agent.nodes.reflect").debug("kept")
+    logging.getLogger("agent.pipeline").debug("dropped")
+
+    assert [line["message"] for line in records(log_output)] == ["kept"]
+    assert logging.getLogger("agent.nodes").level == logging.NOTSET
+
+
+# ✅ Test ③ Large payloads are sampled and truncated, and skipped entirely unless DEBUG is on
+def test_payload_sampling_and_truncation(log_output):
+    reflect_logger = logging.getLogger("agent.nodes.reflect")
+    log_payload(reflect_logger, "Raw reflect response", "x" * 5000, sample_rate=1.0, max_chars=100)
+    for _ in range(50):
+        log_payload(reflect_logger, "never", "y", sample_rate=0.0)
+    log_payload(logging.getLogger("agent.pipeline"), "not debug", "z", sample_rate=1.0)
+
+    lines = records(log_output)
+    assert len(lines) == 1
+    assert lines[0]["payload_chars"] == 5000 and lines[0]["truncated"] is True
+    assert lines[0]["message"] == "Raw reflect response (5000 chars): " + "x" * 100
+
+
+# ✅ Test ④ Logging never blocks the caller on a slow destination
+def test_queue_handler_does_not_block():
+    out = SlowStream()
+    setup_logging(level="INFO", levels="", fmt="text", stream=out)
+    try:
+        started = time.perf_counter()
+        for i in range(10):
+            logging.getLogger("agent.pipeline").info("line %d", i)
+        assert time.perf_counter() - started < 0.05
+    finally:
+        shutdown_logging()
+    assert out.getvalue().count("agent.pipeline: line") == 10
+
+
+# ✅ Test ⑤ The API echoes X-Request-ID and tags the request's logs with it
+def test_api_request_id(monkeypatch, log_output):
+    seen = []
+
+    async def fake_run_pipeline(question, **options):
+        seen.append(request_id.get())
+        logging.getLogger("agent.pipeline").info("answering")
+        return {"status": "complete", "answer": "ok", "citations": []}
+
+    monkeypatch.setattr("agent.api_server.run_pipeline", fake_run_pipeline)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            given = await client.post("/api/query", json={"question": "q"}, headers={"X-Request-ID": "abc-123"})
+            generated = await client.post("/api/query", json={"question": "q"})
+            return given, generated
+
+    given, generated = asyncio.run(scenario())
+    assert given.headers["X-Request-ID"] == "abc-123"
+    assert len(generated.headers["X-Request-ID"]) == 32
+    assert seen == ["abc-123", generated.headers["X-Request-ID"]]
+    assert [line["request_id"] for line in records(log_output) if line["logger"] == "agent.pipeline"] == seen
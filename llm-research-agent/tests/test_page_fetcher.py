@@ -0,0 +1,174 @@
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent.tools.page_fetcher import PageFetcher, TextExtractor, chunk_paragraphs
+from agent.types.document import Document
+
+FINAL_PAGE = b"""<html><head><title>Final</title><style>p { color: red }</style></head>
+<body><nav>Home | Sports | Contact</nav>
+<article><h1>2022 World Cup final</h1>
+<p>The final was played at Lusail Stadium on 18 December 2022 in front of 88,966 spectators.</p>
+<p>Argentina beat France 4&ndash;2 on penalties after a 3&ndash;3 draw. Messi scored twice and Mbapp&eacute; scored a hat-trick.</p>
+<script>trackVisitor("final");</script>
+<p>Tickets for the tournament sold out months in advance.</p></article>
+<footer>Copyright</footer></body></html>"""
+
+
+class FixtureServer:
+    """
+    Local HTTP server for result pages. `pages` maps a path to (body, headers, delay);
+    it records every request (path, If-None-Match) and the peak number of requests in flight.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+        lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body, headers, delay = fixture.pages[self.path]
+                etag = self.headers.get("If-None-Match")
+                with lock:
+                    fixture.requests.append((self.path, etag))
+                    fixture.in_flight += 1
+                    fixture.peak = max(fixture.peak, fixture.in_flight)
+                try:
+                    time.sleep(delay)
+                    if etag and etag == headers.get("ETag"):
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    for name, value in {"Content-Type": "text/html; charset=utf-8", **headers}.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    try:
+                        self.wfile.write(body)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                finally:
+                    with lock:
+                        fixture.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def pages():
+    server = FixtureServer()
+    yield server
+    server.close()
+
+
+def doc(server, path, title="Result"):
+    return Document(title=title, snippet="", url=server.url + path)
+
+
+# ✅ Test ① HTML is parsed incrementally into readable paragraphs, skipping chrome and scripts
+def test_extractor_streams_readable_text():
+    extractor = TextExtractor()
+    for i in range(0, len(FINAL_PAGE), 7):
+        extractor.feed(FINAL_PAGE[i:i + 7].decode())
+    paragraphs = extractor.paragraphs()
+
+    assert paragraphs[0] == "2022 World Cup final"
+    assert "Argentina beat France 4–2 on penalties after a 3–3 draw. Messi scored twice and Mbappé scored a hat-trick." in paragraphs
+    assert not any("Home" in p or "trackVisitor" in p or "color" in p or "Copyright" in p for p in paragraphs)
+    assert chunk_paragraphs(["one two three", "four five", "six seven eight nine"], words=4) == [
+        "one two three", "four five", "six seven eight nine"
+    ]
+
+
+# ✅ Test ② The most relevant passages are attached to the fetched documents only
+def test_enrich_attaches_best_passages(pages):
+    pages.pages["/final"] = (FINAL_PAGE, {}, 0)
+    pages.pages["/other"] = (b"<p>Unrelated cooking recipes.</p>", {}, 0)
+    docs = [doc(pages, "/other", "Recipes"), doc(pages, "/final", "World Cup final"), doc(pages, "/final#skip", "Not fetched")]
+
+    enriched = asyncio.run(PageFetcher(top_k=1, passages=2, passage_words=20).enrich("Who won the World Cup final on penalties?", docs))
+
+    assert enriched[0].content is None and enriched[2].content is None
+    assert "Argentina beat France" in enriched[1].content
+    assert "Tickets" not in enriched[1].content
+    assert pages.requests == [("/final", None)]
+
+
+# ✅ Test ③ Bodies stop at the byte budget and slow pages are dropped at the deadline
+def test_byte_and_time_budgets(pages):
+    pages.pages["/big"] = (b"<p>" + b"world cup " * 50000 + b"</p>", {}, 0)
+    pages.pages["/slow"] = (FINAL_PAGE, {}, 1.0)
+    fetcher = PageFetcher(max_bytes=4096, timeout=0.3)
+
+    async def scenario():
+        return await asyncio.gather(fetcher.fetch_text(pages.url + "/big"), fetcher.fetch_text(pages.url + "/slow"))
+
+    start = time.perf_counter()
+    big, slow = asyncio.run(scenario())
+    assert time.perf_counter() - start < 0.9
+    assert slow is None
+    assert 0 < len(" ".join(big)) <= 4096
+
+
+# ✅ Test ④ Stale cache entries are revalidated with their ETag (304 keeps the cached text)
+def test_etag_revalidation(pages):
+    pages.pages["/final"] = (FINAL_PAGE, {"ETag": '"v1"'}, 0)
+    fetcher = PageFetcher(fresh=0)
+
+    async def scenario():
+        first = await fetcher.fetch_text(pages.url + "/final")
+        second = await fetcher.fetch_text(pages.url + "/final")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second and "2022 World Cup final" in first
+    assert pages.requests == [("/final", None), ("/final", '"v1"')]
+
+
+# ✅ Test ⑤ Requests to one host never exceed the per-host limit
+def test_per_host_connection_limit(pages):
+    for i in range(6):
+        pages.pages[f"/page{i}"] = (FINAL_PAGE, {}, 0.1)
+    fetcher = PageFetcher(per_host=2, timeout=5)
+
+    async def scenario():
+        return await asyncio.gather(*[fetcher.fetch_text(f"{pages.url}/page{i}") for i in range(6)])
+
+    results = asyncio.run(scenario())
+    assert all(results)
+    assert pages.peak == 2
+
+
+# ✅ Test ⑥ Malformed result links are skipped without failing the other fetches
+def test_malformed_urls_are_skipped(pages):
+    pages.pages["/final"] = (FINAL_PAGE, {}, 0)
+    docs = [
+        Document(title="World Cup final", snippet="", url="http://[::1/final"),
+        Document(title="World Cup final", snippet="", url=pages.url + "/fin\x01al"),
+        doc(pages, "/final", "World Cup final")
+    ]
+
+    enriched = asyncio.run(PageFetcher(top_k=3).enrich("Who won the World Cup final?", docs))
+
+    assert enriched[0].content is None and enriched[1].content is None
+    assert "Argentina beat France" in enriched[2].content
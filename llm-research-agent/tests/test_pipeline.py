@@ -0,0 +1,121 @@
+import time
+import asyncio
+
+import pytest
+
+import agent.pipeline as pipeline
+from agent.types.document import Document
+
+LATENCY = 0.1
+
+
+class EmptyCache:
+    """
+    Answer cache stand-in that always misses.
+    """
+
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+class FakeSearchTool:
+    async def run(self, queries, on_result=None):
+        return [Document(title=q, snippet=q, url=f"https://example.com/{q}") for q in queries]
+
+
+class FakeNodes:
+    """
+    Stubs for the LLM nodes with a fixed latency. `verdicts` lists the reflect
+    answers (need_more) per round; `synthesized` records the docs each synthesize saw.
+    """
+
+    def __init__(self, verdicts):
+        self.verdicts = list(verdicts)
+        self.synthesized = []
+        self.cancelled = 0
+
+    async def generate_queries(self, question):
+        return ["q1"]
+
+    async def extract_slots(self, question):
+        return ["winner"]
+
+    async def reflect(self, question, docs, slots=None, fold_slots=False):
+        await asyncio.sleep(LATENCY)
+        need_more = self.verdicts.pop(0)
+        return {"slots": [], "filled": [], "need_more": need_more, "new_queries": ["q2"] if need_more else []}
+
+    async def synthesize(self, question, docs, on_token=None):
+        try:
+            await asyncio.sleep(LATENCY)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.synthesized.append([d.title for d in docs])
+        return {"status": "complete", "answer": f"Answer from {len(docs)} docs [1].",
+                "citations": [{"id": 1, "title": "q1", "url": "https://example.com/q1"}]}
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    def install(verdicts, speculative):
+        fake = FakeNodes(verdicts)
+        monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+        monkeypatch.setattr(pipeline, "WebSearchTool", FakeSearchTool)
+        monkeypatch.setattr(pipeline, "generate_queries", fake.generate_queries)
+        monkeypatch.setattr(pipeline, "extract_slots_llm", fake.extract_slots)
+        monkeypatch.setattr(pipeline, "reflect", fake.reflect)
+        monkeypatch.setattr(pipeline, "synthesize", fake.synthesize)
+        monkeypatch.setattr(pipeline, "SPECULATIVE_SYNTHESIS", speculative)
+        return fake
+    return install
+
+
+def timed_run(question):
+    start = time.perf_counter()
+    result = asyncio.run(pipeline.run_pipeline(question))
+    return result, time.perf_counter() - start
+
+
+# ✅ Test ① Serial mode: reflect then synthesize
+def test_serial_pipeline(nodes):
+    nodes([False], speculative=False)
+    result, elapsed = timed_run("Who won?")
+    assert result["citations"][0]["id"] == 1
+    assert elapsed >= 2 * LATENCY
+
+
+# ✅ Test ② Speculative mode overlaps synthesize with a sufficient reflection
+def test_speculative_answer_is_used(nodes):
+    fake = nodes([False], speculative=True)
+    result, elapsed = timed_run("Who won?")
+    assert result["answer"] == "Answer from 1 docs [1]."
+    assert elapsed < 1.8 * LATENCY
+    assert fake.synthesized == [["q1"]]
+
+
+# ✅ Test ③ Speculative answer is discarded when reflection wants more docs
+def test_speculative_answer_is_discarded(nodes):
+    fake = nodes([True, False], speculative=True)
+    result, _ = timed_run("Who won?")
+    assert result["answer"] == "Answer from 2 docs [1]."
+    assert fake.cancelled == 1
+    assert fake.synthesized == [["q1", "q2"]]
+
+
+# ✅ Test ④ Documents repeated by a later search round are sent to the LLM once
+def test_repeated_documents_are_sent_once(nodes, monkeypatch):
+    class RepeatingSearchTool(FakeSearchTool):
+        async def run(self, queries, on_result=None):
+            return [Document(title="q1", snippet="q1", url="https://example.com/q1/")] + await super().run(queries)
+
+    fake = nodes([True, False], speculative=False)
+    monkeypatch.setattr(pipeline, "WebSearchTool", RepeatingSearchTool)
+    timed_run("Who won?")
+    assert fake.synthesized == [["q1", "q2"]]
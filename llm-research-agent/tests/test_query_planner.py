@@ -0,0 +1,52 @@
+from prometheus_client import REGISTRY
+
+from agent.utils.query_planner import QueryPlanner, query_terms
+
+
+def pruned(reason):
+    return REGISTRY.get_sample_value("search_queries_pruned_total", {"reason": reason}) or 0.0
+
+
+# ✅ Test ① Reworded and repeated queries are searched once; stopwords and case do not matter
+def test_near_duplicates_collapse():
+    before = pruned("duplicate")
+    planner = QueryPlanner(max_per_round=0)
+    queries = planner.plan([
+        "2022 World Cup winner",
+        "winner of the 2022 world cup",
+        "Who won the 2022 World Cup final?",
+        "2022 World Cup final score",
+    ])
+    assert queries == ["2022 World Cup winner", "Who won the 2022 World Cup final?"]
+    assert pruned("duplicate") - before == 2
+    assert query_terms("Who is the winner?") == {"winner"}
+
+
+# ✅ Test ② Later rounds drop queries the request already searched and rank the rest by novelty
+def test_history_and_novelty():
+    before = pruned("searched")
+    planner = QueryPlanner(["2022 World Cup winner"], max_per_round=0)
+    queries = planner.plan([
+        "World Cup 2022 winner",
+        "2022 World Cup final attendance",
+        "Lionel Messi penalty shootout goals",
+    ])
+    # Only "final attendance" is new in the second query; all words of the third are
+    assert queries == ["Lionel Messi penalty shootout goals", "2022 World Cup final attendance"]
+    assert pruned("searched") - before == 1
+    assert planner.searched[0] == "2022 World Cup winner"
+    assert planner.plan(["lionel messi penalty shootout goals"]) == []
+
+
+# ✅ Test ③ Fan-out is capped per round, keeping the most novel queries
+def test_fan_out_cap():
+    before = pruned("fan_out")
+    planner = QueryPlanner(["Argentina France final"], max_per_round=2)
+    queries = planner.plan([
+        "Argentina France final penalty shootout replay",
+        "Mbappe hat trick",
+        "Emiliano Martinez saves",
+        "Messi golden ball award",
+    ])
+    assert queries == ["Mbappe hat trick", "Emiliano Martinez saves"]
+    assert pruned("fan_out") - before == 2
@@ -0,0 +1,190 @@
+import time
+import asyncio
+
+import pytest
+import redis.asyncio as aioredis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agent.utils.local_cache import LocalLRU
+from agent.utils.redis_cache import AnswerCache
+
+
+def answer(text: str) -> dict:
+    return {"status": "complete", "answer": text, "citations": []}
+
+
+def run(coro_fn):
+    """
+    Runs `coro_fn(client)` against a fresh in-memory Redis on its own event loop.
+    """
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        return await coro_fn(client)
+    return asyncio.run(scenario())
+
+
+# ✅ Test ① Keys are hashed and normalized
+def test_keys_are_hashed_and_normalized():
+    async def scenario(client):
+        cache = AnswerCache(client)
+        await cache.set("Who won the 2022 World Cup?", answer("Argentina"))
+        assert await cache.get("  who won the 2022 world cup?", local=False) == answer("Argentina")
+        return cache.key_for("Who won the 2022 World Cup?")
+
+    key = run(scenario)
+    assert key.startswith("llm_cache:") and len(key) == len("llm_cache:") + 64
+
+
+# ✅ Test ② Redis eviction follows recency, not key order
+def test_evicts_least_recently_used():
+    async def scenario(client):
+        cache = AnswerCache(client, max_entries=2)
+        await cache.set("a", answer("A"))
+        await cache.set("b", answer("B"))
+        await cache.get("a", local=False)
+        await cache.set("c", answer("C"))
+        return [await cache.get(q, local=False) for q in ["a", "b", "c"]]
+
+    assert run(scenario) == [answer("A"), None, answer("C")]
+
+
+# ✅ Test ③ The byte budget is enforced alongside the entry count
+def test_evicts_to_fit_byte_budget():
+    size = len('{"status": "complete", "answer": "xxxxxxxxxx", "citations": []}')
+
+    async def scenario(client):
+        cache = AnswerCache(client, max_entries=100, max_bytes=size * 2)
+        for name in ["a", "b", "c"]:
+            await cache.set(name, answer("x" * 10))
+        return (
+            await cache.get("a", local=False),
+            int(await client.get("llm_cache:bytes")),
+            await client.zcard("llm_cache:lru"),
+        )
+
+    assert run(scenario) == (None, size * 2, 2)
+
+
+# ✅ Test ④ Expired entries drop their bookkeeping on the next lookup
+def test_expired_entry_is_unindexed():
+    async def scenario(client):
+        cache = AnswerCache(client)
+        await cache.set("a", answer("A"))
+        await client.delete(cache.key_for("a"))
+        return (
+            await cache.get("a", local=False),
+            await client.zcard("llm_cache:lru"),
+            int(await client.get("llm_cache:bytes")),
+        )
+
+    assert run(scenario) == (None, 0, 0)
+
+
+# ✅ Test ⑤ Hot answers are served from the local tier without touching Redis
+def test_local_tier_serves_hot_hits():
+    async def scenario(client):
+        cache = AnswerCache(client)
+        await cache.set("a", answer("A"))
+        await client.flushall()
+        hit = await cache.get("a")
+        hit["timings"] = {}
+        return hit, await cache.get("a")
+
+    hit, again = run(scenario)
+    assert again == answer("A")
+    assert "timings" in hit
+
+
+# ✅ Test ⑥ A write in one worker invalidates the other workers' local copies
+def test_writes_invalidate_other_workers():
+    async def scenario(client):
+        worker_a = AnswerCache(client)
+        worker_b = AnswerCache(client)
+        ready = asyncio.Event()
+        listener = asyncio.create_task(worker_b.listen_for_invalidations(ready))
+        await ready.wait()
+
+        await worker_a.set("a", answer("old"))
+        assert await worker_b.get("a") == answer("old")
+
+        await worker_a.set("a", answer("new"))
+        for _ in range(50):
+            if len(worker_b.local) == 0:
+                break
+            await asyncio.sleep(0.01)
+        result = await worker_b.get("a")
+        listener.cancel()
+        return result
+
+    assert run(scenario) == answer("new")
+
+
+# ✅ Test ⑦ LocalLRU honours its size bound and TTL
+def test_local_lru_bounds():
+    lru = LocalLRU(max_entries=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    assert lru.set("c", 3) == 1
+    assert lru.get("b") is None and lru.get("a") == 1
+
+    lru.set("d", 4, ttl=0)
+    assert lru.get("d") is None
+
+
+# ✅ Test ⑧ Redis outages degrade to cache misses
+def test_unreachable_redis_is_a_miss():
+    async def scenario():
+        cache = AnswerCache(aioredis.Redis(port=1, socket_connect_timeout=0.1), local=LocalLRU(ttl=0))
+        await cache.set("a", answer("A"))
+        return await cache.get("a")
+
+    assert asyncio.run(scenario()) is None
+
+
+# ✅ Test ⑨ Past the soft TTL an answer is still served, and the stale hit is reported once per lookup
+def test_soft_ttl_serves_stale(monkeypatch):
+    stale = []
+
+    async def scenario(client):
+        cache = AnswerCache(client, soft_ttl=60, on_stale=stale.append)
+        other_worker = AnswerCache(client, soft_ttl=60, on_stale=stale.append)
+        await cache.set("Who won?", answer("Argentina"))
+        fresh = await cache.get("Who won?")
+        stored = await cache.stored_times(["who won?", "unknown"])
+
+        # Two minutes later: both tiers serve the stale answer and report it
+        now = time.time() + 120
+        monkeypatch.setattr("agent.utils.redis_cache.time.time", lambda: now)
+        return fresh, stored, await cache.get("Who won?"), await other_worker.get("who won?")
+
+    fresh, stored, local_hit, redis_hit = run(scenario)
+    assert fresh == local_hit == redis_hit == answer("Argentina")
+    assert stored["unknown"] is None and stored["who won?"] > 0
+    assert stale == ["Who won?", "who won?"]
+
+
+# ✅ Test ⑩ Invalidating an entry drops its bookkeeping, so the byte budget and LRU order stay exact
+def test_invalidate_unindexes_entry():
+    size = len('{"status": "complete", "answer": "B", "citations": []}')
+
+    async def scenario(client):
+        cache = AnswerCache(client)
+        await cache.set("a", answer("A"))
+        await cache.set("b", answer("B"))
+        await cache.invalidate("a")
+        # Checked before any lookup: a miss would clean up after a plain DEL too
+        return (
+            await client.zrange("llm_cache:lru", 0, -1),
+            int(await client.get("llm_cache:bytes")),
+            list(await client.hgetall("llm_cache:sizes")),
+            list(await cache.questions()),
+            cache.key_for("b"),
+            await cache.get("a")
+        )
+
+    lru, total, sized, questions, kept, missing = run(scenario)
+    assert missing is None
+    assert total == size
+    assert lru == sized == questions == [kept]
@@ -1,6 +1,7 @@
 import sys
 import os
 import json
+import asyncio
 import types
 import pytest
 from types import SimpleNamespace
@@ -10,7 +11,7 @@ from types import SimpleNamespace
 mock_genai = types.ModuleType("genai")
 mock_genai.Client = lambda api_key=None: SimpleNamespace(
     models=SimpleNamespace(
-        generate_content=lambda model, contents: SimpleNamespace(
+        generate_content=lambda model, contents, config=None: SimpleNamespace(
             text=json.dumps({
                 "need_more": False,
                 "new_queries": [],
@@ -31,15 +32,13 @@ sys.modules["google.genai"] = mock_genai
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 # ✅ Import the reflect logic and dependencies AFTER mocks are set
-from agent.nodes.reflect import reflect, get_genai_client as get_client_reflect
-from agent.utils.slot_utils import get_genai_client as get_client_slots
+from agent.nodes.reflect import reflect
 from agent.types.document import Document
 
-# 🧪 Automatically patch the Gemini client for every test to use the mock
+# 🧪 Automatically patch the shared Gemini client for every test to use the mock
 @pytest.fixture(autouse=True)
 def patch_clients(monkeypatch):
-    monkeypatch.setattr("agent.nodes.reflect.get_genai_client", lambda: mock_genai.Client())
-    monkeypatch.setattr("agent.utils.slot_utils.get_genai_client", lambda: mock_genai.Client())
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: mock_genai.Client())
 
 # ✅ Test ① Happy path — slots are correctly extracted and filled
 def test_reflect_slots():
@@ -51,7 +50,7 @@ def test_reflect_slots():
             url="https://example.com/final"
         )
     ]
-    result = reflect(question, docs)
+    result = asyncio.run(reflect(question, docs))
     assert result["need_more"] is False
     assert "winner" in result["slots"]
     assert "goal_scorers" in result["slots"]
@@ -62,7 +61,7 @@ def test_reflect_slots():
 def test_reflect_no_result():
     question = "Wingspan of a dragon in Hogwarts?"
     docs = []
-    result = reflect(question, docs)
+    result = asyncio.run(reflect(question, docs))
     assert isinstance(result, dict)
     assert "slots" in result
     assert "filled" in result
@@ -73,11 +72,10 @@ def test_reflect_http_429(monkeypatch):
         raise Exception("429: Too Many Requests")
 
     mock_error_client = lambda: SimpleNamespace(models=SimpleNamespace(generate_content=raise_429))
-    monkeypatch.setattr("agent.nodes.reflect.get_genai_client", mock_error_client)
-    monkeypatch.setattr("agent.utils.slot_utils.get_genai_client", mock_error_client)
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", mock_error_client)
 
     with pytest.raises(Exception, match="429"):
-        reflect("Who is US president?", [])
+        asyncio.run(reflect("Who is US president?", []))
 
 # ✅ Test ④ Simulate timeout — should raise TimeoutError
 def test_reflect_timeout(monkeypatch):
@@ -85,11 +83,10 @@ def test_reflect_timeout(monkeypatch):
         raise TimeoutError("Request timed out")
 
     mock_timeout_client = lambda: SimpleNamespace(models=SimpleNamespace(generate_content=raise_timeout))
-    monkeypatch.setattr("agent.nodes.reflect.get_genai_client", mock_timeout_client)
-    monkeypatch.setattr("agent.utils.slot_utils.get_genai_client", mock_timeout_client)
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", mock_timeout_client)
 
     with pytest.raises(TimeoutError):
-        reflect("What causes rainbows?", [])
+        asyncio.run(reflect("What causes rainbows?", []))
 
 # ✅ Test ⑤ Incomplete slot fill — triggers follow-up queries
 def test_reflect_two_round_supplement(monkeypatch):
@@ -102,11 +99,10 @@ def test_reflect_two_round_supplement(monkeypatch):
         }))
 
     mock_partial_client = lambda: SimpleNamespace(models=SimpleNamespace(generate_content=return_incomplete_slots))
-    monkeypatch.setattr("agent.nodes.reflect.get_genai_client", mock_partial_client)
-    monkeypatch.setattr("agent.utils.slot_utils.get_genai_client", mock_partial_client)
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", mock_partial_client)
 
     docs = [Document(title="Fitzgerald", snippet="F. Scott Fitzgerald", url="...")]
-    result = reflect("Who wrote Gatsby?", docs)
+    result = asyncio.run(reflect("Who wrote Gatsby?", docs))
     assert result["need_more"] is True
     assert "new_queries" in result
     assert result["new_queries"] == ["When was it published?"]
@@ -0,0 +1,191 @@
+import time
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import agent.pipeline as pipeline
+from agent.utils.instrumentation import current_timings
+from agent.utils.logging_setup import request_id
+from agent.utils.popularity import CountMinSketch, PopularityTracker
+from agent.utils.redis_cache import AnswerCache
+from agent.utils.singleflight import RedisLock
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def answer(text: str) -> dict:
+    return {"status": "complete", "answer": text, "citations": []}
+
+
+def refreshes(trigger, outcome):
+    return REGISTRY.get_sample_value("cache_refreshes_total", {"trigger": trigger, "outcome": outcome}) or 0.0
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """
+    Installs a soft-TTL answer cache on an in-memory Redis and a pipeline stub that
+    answers "fresh <n>" after a short delay. Returns a namespace with the cache, the
+    Redis client, the stub's call count and `later(seconds)` to move the clock.
+    """
+    class Worker:
+        runs = 0
+
+    state = Worker()
+    offset = [0.0]
+    real_time = time.time
+    monkeypatch.setattr("agent.utils.redis_cache.time.time", lambda: real_time() + offset[0])
+    state.later = lambda seconds: offset.__setitem__(0, offset[0] + seconds)
+
+    async def run_uncached(question, on_event=None, budget=None):
+        state.runs += 1
+        await asyncio.sleep(0.05)
+        output = answer(f"fresh {state.runs}")
+        await pipeline.answer_cache.set(question, output)
+        return output
+
+    def install():
+        # Clients are bound to the event loop, so this runs inside the scenario
+        state.client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        state.cache = AnswerCache(
+            state.client, soft_ttl=60, on_stale=lambda question: pipeline.schedule_refresh(question, "stale")
+        )
+        monkeypatch.setattr(pipeline, "answer_cache", state.cache)
+        monkeypatch.setattr(pipeline, "refresh_lock", RedisLock(state.client, prefix="llm_refresh:"))
+        return state
+
+    monkeypatch.setattr(pipeline, "_run_uncached", run_uncached)
+    monkeypatch.setattr(pipeline, "popularity", PopularityTracker(capacity=8))
+    monkeypatch.setattr(pipeline, "CACHE_PREWARM_TOP_N", 2)
+    return install
+
+
+# ✅ Test ① A stale answer is returned at once and refreshed once in the background
+def test_stale_answer_is_served_then_refreshed(worker):
+    before = refreshes("stale", "refreshed"), refreshes("stale", "skipped")
+
+    async def scenario():
+        w = worker()
+        await w.cache.set("Who won?", answer("old"))
+        w.later(120)
+        started = time.perf_counter()
+        served = await asyncio.gather(*[pipeline.run_pipeline("Who won?") for _ in range(3)])
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*pipeline._refreshing.values())
+        return w, served, elapsed, await pipeline.run_pipeline("Who won?")
+
+    w, served, elapsed, after = asyncio.run(scenario())
+    assert served == [answer("old")] * 3
+    assert elapsed < 0.05
+    assert after == answer("fresh 1")
+    assert w.runs == 1
+    assert refreshes("stale", "refreshed") - before[0] == 1
+    assert refreshes("stale", "skipped") - before[1] == 2
+
+
+# ✅ Test ② Another worker already refreshing the answer holds the lock: this one only serves
+def test_refresh_is_deduplicated_across_workers(worker):
+    async def scenario():
+        w = worker()
+        await w.cache.set("Who won?", answer("old"))
+        w.later(120)
+        assert await pipeline.refresh_lock.acquire(w.cache.key_for("Who won?"))
+        served = await pipeline.run_pipeline("Who won?")
+        await asyncio.gather(*pipeline._refreshing.values())
+        return w, served
+
+    w, served = asyncio.run(scenario())
+    assert served == answer("old")
+    assert w.runs == 0
+
+
+# ✅ Test ③ Prewarming refreshes the most asked questions that are about to go stale
+def test_prewarm_refreshes_popular_questions(worker):
+    async def scenario():
+        w = worker()
+        for question in ["a", "b", "c"]:
+            await w.cache.set(question, answer(question))
+        for question in ["a"] * 5 + ["b"] * 3 + ["c"]:
+            await pipeline.run_pipeline(question)
+        # 10 seconds before "a" and "b" go stale (c is not among the top 2)
+        w.later(50)
+        due = await pipeline.prewarm(top_n=2, horizon=15)
+        await asyncio.gather(*pipeline._refreshing.values())
+        return w, due
+
+    w, due = asyncio.run(scenario())
+    assert due == ["a", "b"]
+    assert w.runs == 2
+
+
+# ✅ Test ④ The count-min sketch never undercounts, and decay halves the counts
+def test_popularity_counts():
+    sketch = CountMinSketch(width=64, depth=4)
+    for i in range(500):
+        sketch.add(f"q{i % 50}")
+    assert all(sketch.estimate(f"q{i}") >= 10 for i in range(50))
+
+    tracker = PopularityTracker(capacity=3, decay_every=100)
+    for question in ["Who won?"] * 40 + ["When?"] * 30 + ["Where?"] * 20 + [f"rare {i}" for i in range(9)]:
+        tracker.record(question)
+    assert tracker.top(2) == ["Who won?", "When?"]
+    tracker.record("who won?")
+    # 100 questions recorded: counts are halved
+    assert tracker.sketch.estimate("who won?") == 20
+    assert tracker.top(1) == ["who won?"]
+
+
+# ✅ Test ⑤ With the cross-worker lock held elsewhere, the refresh is skipped instead of reading back the stale answer
+def test_refresh_skips_when_another_worker_computes(worker, monkeypatch):
+    monkeypatch.setattr(pipeline, "SINGLEFLIGHT_REDIS_LOCK", True)
+    before = refreshes("stale", "skipped"), refreshes("stale", "refreshed")
+
+    async def scenario():
+        w = worker()
+        monkeypatch.setattr(pipeline, "redis_lock", RedisLock(w.client))
+        await w.cache.set("Who won?", answer("old"))
+        w.later(120)
+        # Another worker is computing this question's answer
+        assert await pipeline.redis_lock.acquire(w.cache.key_for("Who won?"))
+        served = await pipeline.run_pipeline("Who won?")
+        await asyncio.gather(*pipeline._refreshing.values())
+        skipped = refreshes("stale", "skipped") - before[0]
+
+        # Once it is done, the next stale read refreshes here
+        await w.client.delete("llm_lock:" + w.cache.key_for("Who won?"))
+        await pipeline.run_pipeline("Who won?")
+        await asyncio.gather(*pipeline._refreshing.values())
+        return w, served, skipped
+
+    w, served, skipped = asyncio.run(scenario())
+    assert served == answer("old")
+    assert skipped == 1
+    assert w.runs == 1
+    assert refreshes("stale", "refreshed") - before[1] == 1
+
+
+# ✅ Test ⑥ The refresh runs outside the request that triggered it: no request ID, timings or budget carried over
+def test_refresh_runs_in_its_own_context(worker, monkeypatch):
+    seen = []
+
+    async def run_uncached(question, on_event=None, budget=None):
+        seen.append((request_id.get(), current_timings.get(), budget.limited))
+        output = answer("fresh")
+        await pipeline.answer_cache.set(question, output)
+        return output
+
+    monkeypatch.setattr(pipeline, "_run_uncached", run_uncached)
+
+    async def scenario():
+        w = worker()
+        await w.cache.set("Who won?", answer("old"))
+        w.later(120)
+        request_id.set("req-1")
+        served = await pipeline.run_pipeline("Who won?", timings=True, max_llm_calls=3)
+        await asyncio.gather(*pipeline._refreshing.values())
+        return served
+
+    served = asyncio.run(scenario())
+    assert served["answer"] == "old"
+    assert seen == [("-", None, False)]
@@ -0,0 +1,149 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import agent.pipeline as pipeline
+import agent.utils.llm as llm
+import agent.utils.slot_utils as slot_utils
+import agent.tools.websearch as websearch
+from agent.types.document import Document
+from agent.utils.local_cache import LocalLRU
+from agent.utils.replay import Cassette, RecordingLLM, RecordingSearch, ReplayLLM, ReplayMiss, ReplaySearch
+
+LATENCY = 0.05
+
+
+class ScriptedLLM:
+    """
+    LLM provider answering each pipeline prompt type with a canned reply, after `LATENCY`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def reply(self, prompt):
+        if "information \"slots\"" in prompt:
+            return json.dumps(["winner"])
+        if "Slots:" in prompt:
+            return json.dumps({"slots": ["winner"], "filled": ["winner"], "need_more": False, "new_queries": []})
+        if "citations" in prompt:
+            return json.dumps({
+                "answer": "Argentina won the final on penalties [2].",
+                "citations": [{"id": 2, "title": "Final", "url": "https://example.com/final"}]
+            })
+        return "world cup winner\nworld cup final"
+
+    async def generate(self, prompt, model=None, schema=None):
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+        return self.reply(prompt)
+
+    async def stream(self, prompt, model=None, schema=None):
+        self.calls += 1
+        text = self.reply(prompt)
+        for i in range(0, len(text), 10):
+            await asyncio.sleep(LATENCY / 5)
+            yield text[i:i + 10]
+
+
+class ScriptedSearch:
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, query):
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+        return [Document(title=query, snippet=query, url=f"https://example.com/{query}")]
+
+
+class EmptyCache:
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """
+    Isolates the process-wide providers and caches; returns an installer for a provider pair.
+    """
+    monkeypatch.setattr(llm, "_llm_client", None)
+    monkeypatch.setattr(websearch, "_search_provider", None)
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "WebSearchTool", lambda: websearch.WebSearchTool(cache=None))
+    monkeypatch.setattr(slot_utils, "redis_client", fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+    def install(llm_provider, search_provider):
+        llm.set_llm_client(llm_provider)
+        websearch.set_search_provider(search_provider)
+        monkeypatch.setattr(slot_utils, "_local_slots", LocalLRU())
+    return install
+
+
+# ✅ Test ① Recorded calls replay with the same output, instantly or at recorded speed
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    inner = ScriptedLLM()
+    recorder, search_recorder = RecordingLLM(inner, Cassette(path)), RecordingSearch(ScriptedSearch(), Cassette(path))
+
+    async def record():
+        text = await recorder.generate("Generate search queries")
+        chunks = [chunk async for chunk in recorder.stream("Answer with citations")]
+        docs = await search_recorder.search("World Cup")
+        return text, chunks, docs
+
+    recorded = asyncio.run(record())
+
+    async def replay(scale):
+        cassette = Cassette(path)
+        replayer, search_replayer = ReplayLLM(cassette, latency_scale=scale), ReplaySearch(cassette, latency_scale=scale)
+        start = time.perf_counter()
+        text = await replayer.generate("Generate search queries")
+        chunks = [chunk async for chunk in replayer.stream("Answer with citations")]
+        docs = await search_replayer.search("world  cup")
+        return (text, chunks, docs), time.perf_counter() - start
+
+    instant, instant_elapsed = asyncio.run(replay(0))
+    timed, timed_elapsed = asyncio.run(replay(1))
+
+    assert instant == timed == recorded
+    assert instant_elapsed < LATENCY
+    assert timed_elapsed >= 3 * LATENCY * 0.9
+
+
+# ✅ Test ② Unrecorded requests fail loudly instead of reaching the network
+def test_replay_miss(tmp_path):
+    replayer = ReplayLLM(Cassette(str(tmp_path / "empty.jsonl")))
+    with pytest.raises(ReplayMiss):
+        asyncio.run(replayer.generate("never recorded"))
+
+
+# ✅ Test ③ A recorded pipeline run replays to the same answer without calling the providers
+def test_pipeline_replay(tmp_path, providers):
+    path = str(tmp_path / "pipeline.jsonl")
+    inner_llm, inner_search = ScriptedLLM(), ScriptedSearch()
+
+    async def scenario():
+        providers(RecordingLLM(inner_llm, Cassette(path)), RecordingSearch(inner_search, Cassette(path)))
+        recorded = await pipeline.run_pipeline("Who won the World Cup?")
+        calls = (inner_llm.calls, inner_search.calls)
+
+        cassette = Cassette(path)
+        providers(ReplayLLM(cassette), ReplaySearch(cassette))
+        replayed = await pipeline.run_pipeline("Who won the World Cup?")
+        return recorded, replayed, calls
+
+    recorded, replayed, calls = asyncio.run(scenario())
+
+    assert replayed == recorded
+    assert recorded["citations"] == [{"id": 1, "title": "Final", "url": "https://example.com/final"}]
+    assert (inner_llm.calls, inner_search.calls) == calls
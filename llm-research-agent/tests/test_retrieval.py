@@ -0,0 +1,60 @@
+from agent.types.document import Document
+from agent.utils.retrieval import DocumentPool, document_tokens, pack_documents, rank_documents, select_context
+
+FINAL = Document(
+    title="2022 FIFA World Cup final - Wikipedia",
+    snippet="Argentina beat France 4-2 on penalties after a 3-3 draw in the final at Lusail Stadium on 18 December 2022.",
+    url="https://en.wikipedia.org/wiki/2022_FIFA_World_Cup_final"
+)
+MIRROR = Document(
+    title="2022 FIFA World Cup final - Wikipedia",
+    snippet="Argentina beat France 4-2 on penalties after a 3-3 draw in the final at Lusail Stadium on 18 December 2022 in Qatar.",
+    url="https://mirror.example.com/world-cup-final"
+)
+SCORERS = Document(
+    title="World Cup final goal scorers",
+    snippet="Lionel Messi scored twice and Kylian Mbappe scored a hat-trick in the final.",
+    url="https://example.com/scorers"
+)
+TICKETS = Document(
+    title="Lusail Stadium tickets",
+    snippet="Buy tickets for upcoming concerts and events at the stadium.",
+    url="https://example.com/tickets"
+)
+
+
+# ✅ Test ① URL and near-duplicate snippets are dropped across rounds
+def test_pool_deduplicates_across_rounds():
+    pool = DocumentPool()
+    assert pool.add([FINAL, SCORERS]) == [FINAL, SCORERS]
+
+    same_url = FINAL._replace(title="Other title", snippet="Different text", url="http://www.en.wikipedia.org/wiki/2022_FIFA_World_Cup_final/#Match")
+    assert pool.add([same_url, MIRROR, TICKETS]) == [TICKETS]
+    assert pool.docs == [FINAL, SCORERS, TICKETS]
+
+
+# ✅ Test ② BM25 ranks by the question and its slots
+def test_rank_documents():
+    docs = [TICKETS, SCORERS, FINAL]
+    assert rank_documents("Who won the 2022 World Cup final?", docs)[0] == FINAL
+    assert rank_documents("World Cup final", docs, slots=["goal_scorers"])[0] == SCORERS
+    # No matching terms: search order is kept
+    assert rank_documents("Who?", docs) == docs
+
+
+# ✅ Test ③ Packing fills the budget in rank order, skipping documents that do not fit
+def test_pack_documents():
+    big = Document(title="Long page", snippet="word " * 400, url="https://example.com/long")
+    docs = [FINAL, big, SCORERS, TICKETS]
+    budget = document_tokens(FINAL) + document_tokens(SCORERS)
+
+    assert pack_documents(docs, budget) == [FINAL, SCORERS]
+    assert pack_documents([big, FINAL], 10) == [big]
+    assert pack_documents(docs, 0) == docs
+
+
+# ✅ Test ④ The selected context is ranked and within budget
+def test_select_context():
+    docs = [TICKETS, SCORERS, FINAL]
+    context = select_context("Who won the 2022 World Cup final?", docs, budget=document_tokens(FINAL) + 5)
+    assert context == [FINAL]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import agent.pipeline as pipeline
+from agent.utils.local_cache import LocalLRU
+from agent.utils.redis_cache import AnswerCache
+from agent.utils.semantic_cache import SemanticCache, VectorIndex, compatible, embed
+
+
+def answer(text: str) -> dict:
+    return {"status": "complete", "answer": text, "citations": []}
+
+
+def similarity(a: str, b: str) -> float:
+    index = VectorIndex()
+    index.add("b", b)
+    hits = index.search(embed(a))
+    return hits[0][0] if hits else 0.0
+
+
+# ✅ Test ① Rewordings match; different numbers or swapped entities do not
+def test_paraphrases_match_and_guards_reject():
+    assert similarity("Who won the 2022 World Cup?", "2022 world cup winner?") >= 0.8
+    assert similarity("How do black holes form?", "how are black holes formed") == pytest.approx(1.0)
+
+    assert not compatible(embed("who won the 2022 world cup"), embed("who won the 2018 world cup"))
+    assert not compatible(
+        embed("who scored in the 2022 world cup final for argentina"),
+        embed("who scored in the 2022 world cup final for france")
+    )
+    assert compatible(embed("population of tokyo"), embed("what is the population of tokyo japan"))
+    assert similarity("What is the capital of France?", "What is the capital of Germany?") < 0.8
+
+
+# ✅ Test ② A reworded question is served with the matched question and similarity
+def test_semantic_hit_reports_similarity():
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        cache = AnswerCache(client)
+        semantic = SemanticCache(cache)
+        await cache.set("Who won the 2022 World Cup?", answer("Argentina"))
+
+        hit = await semantic.get("2022 world cup winner?")
+        miss = await semantic.get("Who won the 2018 World Cup?")
+        return hit, miss
+
+    hit, miss = asyncio.run(scenario())
+    assert hit["answer"] == "Argentina"
+    assert hit["cache"]["match"] == "semantic"
+    assert hit["cache"]["question"] == "Who won the 2022 World Cup?"
+    assert 0.8 <= hit["cache"]["similarity"] <= 1.0
+    assert miss is None
+
+
+# ✅ Test ③ Entries evicted from Redis leave the semantic index too
+def test_eviction_keeps_index_in_sync():
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        # No local tier, so evicted answers are really gone
+        cache = AnswerCache(client, max_entries=1, local=LocalLRU(ttl=0))
+        semantic = SemanticCache(cache, refresh=0)
+        await cache.set("how do black holes form", answer("Collapse"))
+        semantic.add("how do black holes form")
+        await cache.set("capital of france", answer("Paris"))
+
+        return (
+            await semantic.get("how are black holes formed"),
+            await client.hgetall("llm_cache:questions"),
+            len(semantic.index),
+        )
+
+    hit, questions, indexed = asyncio.run(scenario())
+    assert hit is None
+    assert list(questions.values()) == ["capital of france"]
+    assert indexed == 1
+
+
+# ✅ Test ④ With SEMANTIC_CACHE on, run_pipeline answers a paraphrase from the cache
+def test_pipeline_serves_paraphrase(monkeypatch):
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        cache = AnswerCache(client)
+        monkeypatch.setattr(pipeline, "answer_cache", cache)
+        monkeypatch.setattr(pipeline, "semantic_cache", SemanticCache(cache))
+        monkeypatch.setattr(pipeline, "SEMANTIC_CACHE", True)
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("pipeline should not run")
+        monkeypatch.setattr(pipeline, "_run_leader", fail)
+
+        await cache.set("What is the capital of France?", answer("Paris"))
+        return await pipeline.run_pipeline("capital of france")
+
+    result = asyncio.run(scenario())
+    assert result["answer"] == "Paris"
+    assert result["cache"]["question"] == "What is the capital of France?"
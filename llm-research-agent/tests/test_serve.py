@@ -0,0 +1,56 @@
+import os
+import sys
+import subprocess
+
+from prometheus_client import CollectorRegistry, multiprocess
+
+import serve
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+
+# One worker's lifetime: count two stale answers, hold one pipeline in flight, optionally exit
+WORKER = """
+from agent.utils.metrics import ADMISSION_IN_FLIGHT, CACHE_STALE_SERVED, mark_worker_dead
+CACHE_STALE_SERVED.labels(cache="redis").inc(2)
+ADMISSION_IN_FLIGHT.inc()
+if {exited}:
+    mark_worker_dead()
+"""
+
+
+def aggregated(path: str) -> dict:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return {
+        "stale": registry.get_sample_value("cache_stale_served_total", {"cache": "redis"}),
+        "in_flight": registry.get_sample_value("admission_in_flight")
+    }
+
+
+# ✅ Test ① API_WORKERS=0 means one worker per core
+def test_worker_count():
+    assert serve.worker_count(3) == 3
+    assert serve.worker_count(0) == (os.cpu_count() or 1)
+
+
+# ✅ Test ② The metrics directory is exported and cleared of a previous run's samples
+def test_prepare_multiprocess_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_123.db").write_bytes(b"old")
+    assert serve.prepare_multiprocess_metrics() == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR")
+    path = serve.prepare_multiprocess_metrics()
+    assert os.path.isdir(path)
+    assert os.environ["PROMETHEUS_MULTIPROC_DIR"] == path
+
+
+# ✅ Test ③ Counters add up across workers; live gauges drop workers that exited
+def test_metrics_aggregate_across_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": SRC_DIR}
+    for exited in (False, False, True):
+        subprocess.run([sys.executable, "-c", WORKER.format(exited=exited)], env=env, check=True)
+
+    # Only the worker that called mark_worker_dead is left out of the live gauge
+    assert aggregated(str(tmp_path)) == {"stale": 6.0, "in_flight": 2.0}
@@ -0,0 +1,99 @@
+import asyncio
+
+import agent.pipeline as pipeline
+from agent.utils.singleflight import SingleFlight
+
+
+class EmptyCache:
+    """
+    Answer cache stand-in that always misses.
+    """
+
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+# ✅ Test ① Concurrent callers with the same key share one execution
+def test_concurrent_calls_are_coalesced():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("q", work) for _ in range(10)])
+        # Finished work is forgotten: a later call runs it again
+        return results, await flight.do("q", work)
+
+    results, later = asyncio.run(scenario())
+    assert [r for r, _ in results] == ["answer"] * 10
+    assert [shared for _, shared in results].count(False) == 1
+    assert later == ("answer", False)
+    assert calls == 2
+
+
+# ✅ Test ② Leader failures are re-raised to every follower
+def test_leader_exception_propagates():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("gemini timed out")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(*[flight.do("q", work) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, TimeoutError) for r in results)
+
+
+# ✅ Test ③ A cancelled leader does not cancel the work for its followers
+def test_cancelled_leader_keeps_work_running():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        flight = SingleFlight()
+        leader = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ("answer", True)
+
+
+# ✅ Test ④ Identical in-flight questions run the pipeline once
+def test_run_pipeline_coalesces_identical_questions(monkeypatch):
+    calls = 0
+
+    async def fake_uncached(question, on_event=None, budget=None):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"status": "complete", "answer": question, "citations": []}
+
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "_run_uncached", fake_uncached)
+
+    async def scenario():
+        return await asyncio.gather(
+            pipeline.run_pipeline("Who won the 2022 World Cup?"),
+            pipeline.run_pipeline("  who won the 2022 world cup?"),
+            pipeline.run_pipeline("Who won the 2018 World Cup?"),
+        )
+
+    results = asyncio.run(scenario())
+    assert calls == 2
+    assert results[0] == results[1]
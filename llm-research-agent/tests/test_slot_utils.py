@@ -0,0 +1,92 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import agent.utils.slot_utils as slot_utils
+from agent.nodes.reflect import reflect
+from agent.utils.local_cache import LocalLRU
+
+
+class RecordingGemini:
+    """
+    Gemini stand-in that answers every prompt with `text` and records the prompts.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model, contents, config=None):
+        self.prompts.append(contents[0]["parts"][0]["text"])
+        return SimpleNamespace(text=self.text)
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    def install(text):
+        fake = RecordingGemini(text)
+        monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: fake)
+        # Fresh caches per test: one Redis shared by "workers", one empty local tier
+        monkeypatch.setattr(slot_utils, "redis_client", fakeredis.aioredis.FakeRedis(decode_responses=True))
+        monkeypatch.setattr(slot_utils, "_local_slots", LocalLRU())
+        return fake
+    return install
+
+
+# ✅ Test ① Slots are extracted once per normalized question
+def test_slots_are_memoized(gemini):
+    fake = gemini(json.dumps(["winner", "date"]))
+
+    async def scenario():
+        first = await slot_utils.extract_slots_llm("Who won the 2022 World Cup?")
+        second = await slot_utils.extract_slots_llm("who won the 2022 world cup? ")
+        return first, second
+
+    assert asyncio.run(scenario()) == (["winner", "date"], ["winner", "date"])
+    assert len(fake.prompts) == 1
+
+
+# ✅ Test ② Redis serves slots to workers with a cold local tier
+def test_slots_are_shared_through_redis(gemini, monkeypatch):
+    fake = gemini(json.dumps(["winner"]))
+
+    async def scenario():
+        await slot_utils.extract_slots_llm("Who won?")
+        monkeypatch.setattr(slot_utils, "_local_slots", LocalLRU())
+        return await slot_utils.extract_slots_llm("Who won?")
+
+    assert asyncio.run(scenario()) == ["winner"]
+    assert len(fake.prompts) == 1
+
+
+# ✅ Test ③ Concurrent extractions share one Gemini call; parse failures are not cached
+def test_concurrent_extractions_and_failures(gemini):
+    fake = gemini("not json")
+
+    async def scenario():
+        results = await asyncio.gather(*[slot_utils.extract_slots_llm("Who won?") for _ in range(5)])
+        return results, await slot_utils.get_cached_slots("Who won?")
+
+    results, cached = asyncio.run(scenario())
+    assert results == [[]] * 5
+    assert cached is None
+    assert len(fake.prompts) == 1
+
+
+# ✅ Test ④ Folded reflection asks for the slots in the same call
+def test_reflect_can_fold_slot_extraction(gemini):
+    fake = gemini(json.dumps({"slots": ["winner"], "filled": ["winner"], "need_more": False, "new_queries": []}))
+
+    result = asyncio.run(reflect("Who won?", [], fold_slots=True))
+    assert result["slots"] == ["winner"]
+    assert len(fake.prompts) == 1
+    assert "Slots: not provided" in fake.prompts[0]
+
+    asyncio.run(reflect("Who won?", [], slots=["winner"]))
+    assert len(fake.prompts) == 2
+    assert 'Slots: ["winner"]' in fake.prompts[1]
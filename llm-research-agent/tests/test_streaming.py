@@ -0,0 +1,117 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import agent.pipeline as pipeline
+from agent.api_server import app
+from agent.types.document import Document
+from agent.utils.json_stream import JsonFieldStreamer
+
+SYNTH_REPLY = json.dumps({
+    "answer": "Argentina won the \"final\" on penalties [3]. Café ✓ 🏆",
+    "citations": [{"id": 3, "title": "Final", "url": "https://example.com/final"}]
+})
+
+
+class StreamingGemini:
+    """
+    Gemini stand-in: plain calls answer by prompt type, streamed calls return the
+    synthesize reply in small chunks.
+    """
+
+    def __init__(self):
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream
+        )
+
+    def _generate_content(self, model, contents, config=None):
+        prompt = contents[0]["parts"][0]["text"]
+        if "information \"slots\"" in prompt:
+            text = json.dumps(["winner"])
+        elif "Slots:" in prompt:
+            text = json.dumps({"slots": ["winner"], "filled": ["winner"], "need_more": False, "new_queries": []})
+        else:
+            text = "world cup winner\nworld cup final"
+        return SimpleNamespace(text=text)
+
+    def _generate_content_stream(self, model, contents, config=None):
+        for i in range(0, len(SYNTH_REPLY), 7):
+            yield SimpleNamespace(text=SYNTH_REPLY[i:i + 7])
+
+
+class EmptyCache:
+    def key_for(self, question):
+        return question.strip().lower()
+
+    async def get(self, question, record_stats=True, local=True):
+        return None
+
+    async def set(self, question, answer):
+        pass
+
+
+class FakeSearchTool:
+    async def run(self, queries, on_result=None):
+        docs = []
+        for query in queries:
+            results = [Document(title=query, snippet=query, url=f"https://example.com/{query}")]
+            if on_result:
+                on_result(query, results)
+            docs += results
+        return docs
+
+
+@pytest.fixture
+def streaming_app(monkeypatch):
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: StreamingGemini())
+    monkeypatch.setattr(pipeline, "answer_cache", EmptyCache())
+    monkeypatch.setattr(pipeline, "WebSearchTool", FakeSearchTool)
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+# ✅ Test ① The answer field is decoded incrementally, whatever the chunking
+@pytest.mark.parametrize("size", [1, 2, 5, 64])
+def test_json_field_streamer(size):
+    raw = "```json\n" + SYNTH_REPLY + "\n```"
+    streamer = JsonFieldStreamer("answer")
+    text = "".join(streamer.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+    assert text == json.loads(SYNTH_REPLY)["answer"]
+    assert streamer.done
+
+
+# ✅ Test ② The SSE endpoint streams stage events, answer tokens and a renumbered final frame
+def test_stream_endpoint_emits_stage_events(streaming_app):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/api/query/stream", json={"question": "Who won the World Cup?"})
+            return resp.headers["content-type"], resp.text
+
+    content_type, body = asyncio.run(scenario())
+    events = parse_sse(body)
+    names = [name for name, _ in events]
+
+    assert content_type.startswith("text/event-stream")
+    assert names[0] == "started"
+    assert names[1] == "queries"
+    assert names.count("search_results") == 2
+    assert names.index("reflection") < names.index("answer_delta")
+    assert names[-1] == "final"
+
+    streamed = "".join(data["text"] for name, data in events if name == "answer_delta")
+    assert streamed == json.loads(SYNTH_REPLY)["answer"]
+
+    final = events[-1][1]
+    assert final["answer"].endswith("on penalties [1]. Café ✓ 🏆")
+    assert final["citations"] == [{"id": 1, "title": "Final", "url": "https://example.com/final"}]
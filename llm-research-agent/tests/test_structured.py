@@ -0,0 +1,105 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from agent.nodes.synthesize import ANSWER_SCHEMA, synthesize
+from agent.types.document import Document
+from agent.utils.citations import normalize_citations
+from agent.utils.instrumentation import stage
+from agent.utils.json_stream import JsonExtractor
+from agent.utils.llm import LLMClient
+from agent.utils.structured import parse_json_reply
+
+DOCS = [Document(title=f"Doc {i}", snippet="", url=f"https://example.com/{i}") for i in range(1, 5)]
+
+
+class ConfigGemini:
+    """
+    genai.Client stand-in that records the config of each call and answers with `text`.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.configs = []
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model, contents, config=None):
+        self.configs.append(config)
+        return SimpleNamespace(text=self.text)
+
+
+def replies(outcome, stage_name="synthesize"):
+    return REGISTRY.get_sample_value("llm_json_replies_total", {"stage": stage_name, "outcome": outcome}) or 0.0
+
+
+# ✅ Test ① Fences, prose, trailing commas and cut-off replies are repaired, in any chunking
+@pytest.mark.parametrize("reply, expected, repaired", [
+    ('{"a": [1, 2]}', {"a": [1, 2]}, False),
+    ('```json\n{"a": "x}y"}\n```', {"a": "x}y"}, False),
+    ('Sure! {"a": [1, 2,], "b": {"c": 3,},} Hope this helps.', {"a": [1, 2], "b": {"c": 3}}, True),
+    ('{"answer": "Argentina won [1', {"answer": "Argentina won [1"}, True),
+    ('{"slots": ["a", "b"], "need_more": tru', {"slots": ["a", "b"]}, True),
+    ('{"citations": [{"id": 1, "title": "T"}, {"id": 2, "ti', {"citations": [{"id": 1, "title": "T"}, {"id": 2}]}, True),
+])
+def test_extractor_repairs(reply, expected, repaired):
+    for size in (1, 7, len(reply)):
+        extractor = JsonExtractor("{")
+        for i in range(0, len(reply), size):
+            extractor.feed(reply[i:i + size])
+        assert extractor.value() == expected
+        assert extractor.repaired is repaired
+
+    assert parse_json_reply('Slots: ["winner", "date",]', expect="[") == ["winner", "date"]
+    with pytest.raises(ValueError):
+        parse_json_reply("I cannot answer that.")
+
+
+# ✅ Test ② Citations are renumbered in one pass; unknown ids are dropped, unlisted ones come from the docs
+def test_normalize_citations():
+    answer, citations = normalize_citations(
+        "Argentina [3] beat France [1, 3] [see note] on penalties [9].",
+        [{"id": 3, "title": "Final", "url": "https://example.com/final"}, {"id": "7", "title": "Unused", "url": "u"}],
+        DOCS
+    )
+    assert answer == "Argentina [2] beat France [1, 2] [see note] on penalties ."
+    assert citations == [
+        {"id": 1, "title": "Doc 1", "url": "https://example.com/1"},
+        {"id": 2, "title": "Final", "url": "https://example.com/final"}
+    ]
+    assert normalize_citations("No markers.", []) == ("No markers.", [])
+
+
+# ✅ Test ③ Nodes request their response schema; plain prompts are sent without a config
+def test_schema_is_sent_as_response_config(monkeypatch):
+    reply = {"answer": "Argentina won the final on penalties [2].", "citations": [{"id": 2, "title": "Doc 2", "url": "u2"}]}
+    fake = ConfigGemini(json.dumps(reply))
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: fake)
+    monkeypatch.setattr("agent.utils.llm._llm_client", LLMClient(max_concurrency=2))
+
+    result = asyncio.run(synthesize("Who won?", DOCS))
+    asyncio.run(LLMClient(max_concurrency=1).generate("plain"))
+
+    assert result["answer"] == "Argentina won the final on penalties [1]."
+    assert result["citations"] == [{"id": 1, "title": "Doc 2", "url": "u2"}]
+    structured, plain = fake.configs
+    assert structured.response_mime_type == "application/json"
+    assert structured.response_schema == ANSWER_SCHEMA
+    assert plain is None
+
+
+# ✅ Test ④ Outcomes are counted per stage, so the repair rate can be graphed
+def test_parse_outcomes_are_counted():
+    before = {outcome: replies(outcome) for outcome in ("clean", "repaired", "failed")}
+
+    async def scenario():
+        with stage("synthesize"):
+            parse_json_reply('{"answer": "ok"}')
+            parse_json_reply('{"answer": "cut off')
+            with pytest.raises(ValueError):
+                parse_json_reply("no json")
+
+    asyncio.run(scenario())
+    assert {outcome: replies(outcome) - before[outcome] for outcome in before} == {"clean": 1, "repaired": 1, "failed": 1}
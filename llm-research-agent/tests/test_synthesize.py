@@ -1,3 +1,7 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
 # ✅ Import the main synthesis function and the document type
 from agent.nodes.synthesize import synthesize
 from agent.types.document import Document
@@ -14,9 +18,23 @@ docs = [
     )
 ]
 
+# 🤖 Gemini stand-in, so the test does not depend on an API key or on other test modules
+mock_client = SimpleNamespace(models=SimpleNamespace(generate_content=lambda model, contents, config=None: SimpleNamespace(
+    text=json.dumps({
+        "answer": "A black hole is a spot in space where gravity pulls so hard that even light cannot get out [1].",
+        "citations": [{"id": 1, "title": "What Is a Black Hole?", "url": "https://example.com/black-hole"}]
+    })
+)))
+
+
 # 🧪 Run the synthesis function to generate a simple answer with citation mapping
-answer = synthesize(question, docs)
+def test_synthesize(monkeypatch):
+    monkeypatch.setattr("agent.utils.llm.get_genai_client", lambda: mock_client)
+    answer = asyncio.run(synthesize(question, docs))
+
+    # 📤 Display the final answer
+    print("\nSynthesized Answer:\n")
+    print(answer)
 
-# 📤 Display the final answer
-print("\nSynthesized Answer:\n")
-print(answer)
+    assert answer["status"] == "complete"
+    assert answer["citations"] == [{"id": 1, "title": "What Is a Black Hole?", "url": "https://example.com/black-hole"}]
@@ -0,0 +1,204 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agent.tools.websearch import WebSearchTool
+from agent.types.document import Document
+from agent.utils.rate_limit import TokenBucket
+from agent.utils.search_cache import SearchCache, normalize_query
+
+
+class CountingSearchTool(WebSearchTool):
+    """
+    WebSearchTool whose CSE call is replaced by canned results, recording each query sent.
+    """
+
+    def __init__(self, cache, results):
+        super().__init__(cache=cache)
+        self.results = results
+        self.sent = []
+
+    async def _search(self, client, query):
+        self.sent.append(query)
+        result = self.results[normalize_query(query)]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+FINAL = Document(title="Final", snippet="Argentina beat France", url="https://example.com/final")
+SCORERS = Document(title="Scorers", snippet="Messi scored twice", url="https://example.com/scorers")
+
+
+def run(scenario):
+    async def wrapper():
+        cache = SearchCache(fakeredis.aioredis.FakeRedis(decode_responses=True))
+        return await scenario(cache)
+    return asyncio.run(wrapper())
+
+
+# ✅ Test ① Repeated and near-identical queries only reach CSE once
+def test_results_are_cached_by_normalized_query():
+    async def scenario(cache):
+        tool = CountingSearchTool(cache, {
+            "2022 world cup final score": [FINAL],
+            "2022 world cup final scorers": [SCORERS],
+        })
+        first = await tool.run(["2022 World Cup final score", "2022 world cup final score?"])
+        second = await tool.run(["2022 world cup FINAL score", "2022 World Cup final scorers"])
+        return tool.sent, first, second
+
+    sent, first, second = run(scenario)
+    assert sent == ["2022 World Cup final score", "2022 World Cup final scorers"]
+    assert first == [FINAL]
+    assert second == [FINAL, SCORERS]
+
+
+# ✅ Test ② Empty results are cached under the negative TTL
+def test_empty_results_are_negatively_cached():
+    async def scenario(cache):
+        tool = CountingSearchTool(cache, {"dragon wingspan hogwarts": []})
+        await tool.run(["dragon wingspan hogwarts"])
+        await tool.run(["dragon wingspan hogwarts"])
+        return tool.sent, await cache.client.ttl(cache.key_for("dragon wingspan hogwarts"))
+
+    sent, ttl = run(scenario)
+    assert len(sent) == 1
+    assert 0 < ttl <= SearchCache().negative_ttl
+
+
+# ✅ Test ③ Failed searches are not cached
+def test_errors_are_not_cached():
+    async def scenario(cache):
+        error = httpx.HTTPStatusError("429", request=httpx.Request("GET", "https://cse"), response=httpx.Response(429))
+        tool = CountingSearchTool(cache, {"who is us president": error})
+        docs = await tool.run(["Who is US president?"])
+        await tool.run(["Who is US president?"])
+        return docs, tool.sent
+
+    docs, sent = run(scenario)
+    assert docs == []
+    assert len(sent) == 2
+
+
+# 🌐 A local stand-in for the Google CSE endpoint, for exercising the real HTTP path
+class FakeCSE:
+    """
+    Threaded HTTP server answering like Google CSE. Each request pops the next
+    scripted (status, delay, headers) from `script`; once it is empty every request
+    succeeds immediately. Client ports are recorded to observe connection reuse.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.client_ports = []
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fake.lock:
+                    fake.client_ports.append(self.client_address[1])
+                    status, delay, headers = fake.script.pop(0) if fake.script else (200, 0, {})
+                time.sleep(delay)
+                query = parse_qs(urlparse(self.path).query)["q"][0]
+                body = json.dumps({"items": [
+                    {"title": query, "snippet": f"About {query}", "link": f"https://example.com/{len(query)}"}
+                ]} if status == 200 else {"error": {"code": status}}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/customsearch/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_cse(monkeypatch):
+    # Keep back-off short so retry tests stay fast
+    monkeypatch.setattr("agent.tools.websearch.backoff_delay", lambda attempt: 0.01)
+    server = FakeCSE()
+    yield server
+    server.close()
+
+
+def live_tool(fake_cse, rate=1000.0, burst=1000.0):
+    return WebSearchTool(cache=None, endpoint=fake_cse.url, rate_limiter=TokenBucket(rate, burst))
+
+
+# ✅ Test ④ 429s and 5xx are retried, honouring Retry-After
+def test_retries_rate_limited_and_server_errors(fake_cse):
+    fake_cse.script = [(429, 0, {"Retry-After": "0"}), (503, 0, {})]
+    docs = asyncio.run(live_tool(fake_cse).run(["world cup"]))
+    assert [d.title for d in docs] == ["world cup"]
+    assert len(fake_cse.client_ports) == 3
+
+
+# ✅ Test ⑤ Persistent failures give up after SEARCH_MAX_RETRIES
+def test_gives_up_after_max_retries(fake_cse, monkeypatch):
+    monkeypatch.setattr("agent.tools.websearch.SEARCH_MAX_RETRIES", 2)
+    fake_cse.script = [(500, 0, {})] * 5
+    docs = asyncio.run(live_tool(fake_cse).run(["world cup"]))
+    assert docs == []
+    assert len(fake_cse.client_ports) == 3
+
+
+# ✅ Test ⑥ A slow query is abandoned at the deadline
+def test_deadline_bounds_slow_queries(fake_cse, monkeypatch):
+    monkeypatch.setattr("agent.tools.websearch.SEARCH_DEADLINE", 0.2)
+    fake_cse.script = [(200, 1.0, {})]
+    start = time.perf_counter()
+    docs = asyncio.run(live_tool(fake_cse).run(["world cup"]))
+    assert docs == []
+    assert time.perf_counter() - start < 0.8
+
+
+# ✅ Test ⑦ A hedged request wins when the first one stalls
+def test_hedged_request_cuts_tail_latency(fake_cse, monkeypatch):
+    monkeypatch.setattr("agent.tools.websearch.SEARCH_HEDGE_DELAY", 0.05)
+    fake_cse.script = [(200, 1.0, {})]
+    start = time.perf_counter()
+    docs = asyncio.run(live_tool(fake_cse).run(["world cup"]))
+    assert [d.title for d in docs] == ["world cup"]
+    assert time.perf_counter() - start < 0.8
+
+
+# ✅ Test ⑧ The shared client keeps connections alive across runs
+def test_connections_are_reused(fake_cse):
+    async def scenario():
+        tool = live_tool(fake_cse)
+        for query in ["a", "b", "c"]:
+            await tool.run([query])
+
+    asyncio.run(scenario())
+    assert len(set(fake_cse.client_ports)) == 1
+
+
+# ✅ Test ⑨ The token bucket paces requests once the burst is spent
+def test_rate_limiter_paces_requests(fake_cse):
+    start = time.perf_counter()
+    asyncio.run(live_tool(fake_cse, rate=20, burst=1).run(["a", "b", "c", "d", "e"]))
+    assert time.perf_counter() - start >= 0.18
+    assert len(fake_cse.client_ports) == 5
@@ -1,6 +1,6 @@
 // src/App.jsx
 import { useState } from "react";
-import { queryLLM } from "./api/queryLLM";
+import { streamLLM } from "./api/queryLLM";
 import Result from "./components/Result";
 import "./App.css";
 
@@ -8,18 +8,37 @@ function App() {
   const [question, setQuestion] = useState("");
   const [result, setResult] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [stage, setStage] = useState("");
 
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (!question.trim()) return;
     setLoading(true);
+    setResult(null);
+    setStage("Generating search queries...");
     try {
-      const res = await queryLLM(question);
-      setResult(res);
+      let answer = "";
+      await streamLLM(question, (event, data) => {
+        if (event === "queries") {
+          setStage(`Searching ${data.queries.length} queries...`);
+        } else if (event === "search_results") {
+          setStage(`Got results for "${data.query}"`);
+        } else if (event === "reflection") {
+          setStage(data.need_more ? "Looking for more sources..." : "Writing answer...");
+        } else if (event === "answer_delta") {
+          answer += data.text;
+          setResult({ status: "streaming", answer });
+        } else if (event === "final") {
+          setResult(data);
+        } else if (event === "error") {
+          throw new Error(data.message);
+        }
+      });
     } catch (err) {
       alert("Error fetching answer: " + err.message);
     } finally {
       setLoading(false);
+      setStage("");
     }
   };
 
@@ -37,6 +56,7 @@ function App() {
           {loading ? "Processing..." : "Submit"}
         </button>
       </form>
+      {stage && <p className="stage">{stage}</p>}
       <Result result={result} />
     </div>
   );
@@ -21,6 +21,15 @@ export default function Result({ result }) {
     );
   }
 
+  if (result.status === "streaming") {
+    return (
+      <div>
+        <h2>Answer</h2>
+        <p>{result.answer}</p>
+      </div>
+    );
+  }
+
   if (result.status === "need_more_info") {
     return (
       <div>